@@ -0,0 +1,147 @@
+# benchmarks/fk_index_benchmark.py
+"""
+Сравнение планов запросов к метаданным приложения без индексов по внешним ключам и с ними.
+
+Запуск из корня проекта (берет настройки подключения из .env):
+    python -m benchmarks.fk_index_benchmark --columns 100000
+
+Данные создаются в отдельной схеме PostgreSQL и по окончании удаляются (если не указан --keep).
+"""
+
+import argparse
+import json
+import statistics
+
+from sqlalchemy import text
+
+from models import Base
+from models import *  # регистрируем все модели в метаданных
+from models.base import engine
+from models.migrations import MIGRATIONS
+
+BENCH_SCHEMA = "fk_index_bench"
+FK_INDEX_MIGRATION = 2
+
+SEED_SQL = [
+    "INSERT INTO \"user\" (user_id, username, email, hash_password) VALUES (1, 'bench', 'bench@example.com', '-')",
+    "INSERT INTO projects (project_id, project_name, user_id) "
+    "SELECT p, 'bench ' || p, 1 FROM generate_series(1, :projects) p",
+    "INSERT INTO schemas (schema_id, schema_name, project_id) "
+    "SELECT p, 'public', p FROM generate_series(1, :projects) p",
+    "INSERT INTO diagrams (diagram_id, diagram_name, project_id) "
+    "SELECT p, 'Main Diagram', p FROM generate_series(1, :projects) p",
+    "INSERT INTO tables (table_id, table_name, schema_id) "
+    "SELECT t, 'table_' || t, (t - 1) / :tpp + 1 FROM generate_series(1, :tables) t",
+    "INSERT INTO columns (column_id, column_name, data_type, is_primary_key, is_unique, is_nullable, col_num, table_id) "
+    "SELECT c, 'col_' || c, 'INT', (c - 1) % :cpt = 0, false, true, (c - 1) % :cpt, (c - 1) / :cpt + 1 "
+    "FROM generate_series(1, :columns) c",
+    "INSERT INTO diagramobjects (object_id, pos_x, pos_y, diagram_id, table_id) "
+    "SELECT t, 0, 0, (t - 1) / :tpp + 1, t FROM generate_series(1, :tables) t",
+    # Каждая таблица ссылается на предыдущую таблицу своего проекта: PK -> вторая колонка
+    "INSERT INTO relationships (relationship_id, project_id, start_table_id, end_table_id) "
+    "SELECT t, (t - 1) / :tpp + 1, t - 1, t FROM generate_series(1, :tables) t WHERE (t - 1) % :tpp <> 0",
+    "INSERT INTO \"relationshipsColumns\" (relationship_id, start_column_id, end_column_id) "
+    "SELECT t, (t - 2) * :cpt + 1, (t - 1) * :cpt + 2 FROM generate_series(1, :tables) t WHERE (t - 1) % :tpp <> 0",
+]
+
+# (название, запрос) - фильтры, которыми пользуются контроллеры
+BENCH_QUERIES = [
+    ("Колонки таблицы", "SELECT * FROM columns WHERE table_id = :table_id"),
+    ("is_column_foreign_key", "SELECT count(*) FROM \"relationshipsColumns\" WHERE end_column_id = :column_id"),
+    ("Удаление: объекты диаграмм", "SELECT object_id FROM diagramobjects WHERE table_id = :table_id"),
+    ("Удаление: связи таблицы",
+     "SELECT relationship_id FROM relationships WHERE start_table_id = :table_id OR end_table_id = :table_id"),
+    ("Схема проекта", "SELECT schema_id FROM schemas WHERE project_id = :project_id"),
+    ("Таблицы проекта", "SELECT table_id, table_name FROM tables WHERE schema_id = :project_id"),
+    ("Связи проекта", "SELECT * FROM relationships WHERE project_id = :project_id"),
+    ("Объекты диаграммы", "SELECT * FROM diagramobjects WHERE diagram_id = :project_id"),
+]
+
+
+def _plan_nodes(plan: dict) -> list[str]:
+    nodes = [plan["Node Type"]]
+    for child in plan.get("Plans", []):
+        nodes.extend(_plan_nodes(child))
+    return nodes
+
+
+def _explain(conn, sql: str, params: dict, repeats: int) -> tuple[float, str]:
+    """Медиана времени выполнения (мс) и типы узлов плана."""
+    times, nodes = [], []
+    for _ in range(repeats):
+        result = conn.execute(text(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}"), params).scalar()
+        report = result if isinstance(result, list) else json.loads(result)
+        times.append(report[0]["Execution Time"])
+        nodes = _plan_nodes(report[0]["Plan"])
+    scans = [n for n in nodes if "Scan" in n] or nodes
+    return statistics.median(times), ", ".join(dict.fromkeys(scans))
+
+
+def _run_queries(conn, params: dict, repeats: int) -> dict:
+    return {name: _explain(conn, sql, params, repeats) for name, sql in BENCH_QUERIES}
+
+
+def _drop_fk_indexes(conn):
+    rows = conn.execute(text(
+        "SELECT indexname FROM pg_indexes WHERE schemaname = :schema "
+        "AND (indexname LIKE 'ix\\_%' OR indexname LIKE 'ux\\_%') AND tablename <> 'user'"
+    ), {"schema": BENCH_SCHEMA}).scalars().all()
+    for name in rows:
+        conn.execute(text(f'DROP INDEX "{BENCH_SCHEMA}"."{name}"'))
+
+
+def run(columns: int, columns_per_table: int, tables_per_project: int, repeats: int, keep: bool):
+    tables = max(1, columns // columns_per_table)
+    projects = max(1, -(-tables // tables_per_project))
+    seed_params = {"columns": tables * columns_per_table, "cpt": columns_per_table,
+                   "tables": tables, "tpp": tables_per_project, "projects": projects}
+    # Объекты из середины данных, чтобы ни один план не выиграл на первых страницах таблицы
+    middle_table = tables // 2 + 1
+    query_params = {"table_id": middle_table, "column_id": (middle_table - 1) * columns_per_table + 2,
+                    "project_id": (middle_table - 1) // tables_per_project + 1}
+
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {BENCH_SCHEMA}"))
+    bench_engine = engine.execution_options(schema_translate_map={None: BENCH_SCHEMA})
+    Base.metadata.create_all(bind=bench_engine)
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"SET LOCAL search_path TO {BENCH_SCHEMA}"))
+            print(f"Заполнение: {projects} проектов, {tables} таблиц, {seed_params['columns']} колонок...")
+            for sql in SEED_SQL:
+                conn.execute(text(sql), seed_params)
+            _drop_fk_indexes(conn)
+            conn.execute(text("ANALYZE"))
+            before = _run_queries(conn, query_params, repeats)
+
+            statements = next(s for v, _, s in MIGRATIONS if v == FK_INDEX_MIGRATION)
+            for sql in statements:
+                conn.execute(text(sql))
+            after = _run_queries(conn, query_params, repeats)
+
+        print()
+        print(f"{'Запрос':<28} {'без индексов':>14} {'с индексами':>14}  план до -> после")
+        for name, _ in BENCH_QUERIES:
+            (before_ms, before_plan), (after_ms, after_plan) = before[name], after[name]
+            print(f"{name:<28} {before_ms:>11.3f} мс {after_ms:>11.3f} мс  {before_plan} -> {after_plan}")
+    finally:
+        if not keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк индексов по внешним ключам метаданных")
+    parser.add_argument("--columns", type=int, default=100_000, help="сколько колонок создать")
+    parser.add_argument("--columns-per-table", type=int, default=20)
+    parser.add_argument("--tables-per-project", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5, help="повторов EXPLAIN ANALYZE на запрос")
+    parser.add_argument("--keep", action="store_true", help=f"не удалять схему {BENCH_SCHEMA}")
+    args = parser.parse_args()
+    run(args.columns, args.columns_per_table, args.tables_per_project, args.repeats, args.keep)
+
+
+if __name__ == "__main__":
+    main()
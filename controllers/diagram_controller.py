@@ -1,13 +1,73 @@
 # controllers/diagram_controller.py
 
 from models.base import SessionLocal
-from models.diagram import Diagram, DiagramObject
-from models.table import Table, TableColumn
+import json
+
+from models.diagram import Diagram, DiagramObject, LAYOUT_MODE_ROWS, LAYOUT_MODE_DOCUMENT, LAYOUT_DOCUMENT_VERSION
+from models.table import Table, TableColumn, DbIndex, IndexColumn, column_order_by
 from models.project import Project, Schema
 from models.relationships import Relationship, RelationshipColumn
 from sqlalchemy.orm import joinedload, Session, selectinload
+from sqlalchemy import text, select, delete
 from sqlalchemy.sql import func
 
+# Слияние правок раскладки в JSONB-документ диаграммы одним оператором:
+# поля каждого объекта из :patch дописываются поверх уже сохраненных
+_MERGE_LAYOUT_SQL = text("""
+    UPDATE diagrams
+    SET layout = jsonb_build_object(
+            'version', :doc_version,
+            'objects', COALESCE(layout->'objects', '{}'::jsonb) || (
+                SELECT COALESCE(jsonb_object_agg(p.key, COALESCE(layout->'objects'->p.key, '{}'::jsonb) || p.value),
+                                '{}'::jsonb)
+                FROM jsonb_each(CAST(:patch AS jsonb)) AS p)),
+        layout_version = layout_version + 1
+    WHERE diagram_id = :diagram_id
+""")
+
+# Удаление записей объектов из документов раскладки диаграмм
+_DROP_LAYOUT_OBJECTS_SQL = text("""
+    UPDATE diagrams
+    SET layout = jsonb_set(layout, '{objects}', (layout->'objects') - CAST(:keys AS text[]))
+    WHERE diagram_id = ANY(:diagram_ids) AND layout->'objects' IS NOT NULL
+""")
+
+# Удаление объекта с диаграммы вместе с его записью в документе раскладки - одним запросом
+_DELETE_DIAGRAM_OBJECT_SQL = text("""
+    WITH removed AS (
+        DELETE FROM diagramobjects WHERE object_id = :object_id RETURNING object_id, diagram_id
+    )
+    UPDATE diagrams d
+    SET layout = jsonb_set(d.layout, '{objects}', (d.layout->'objects') - removed.object_id::text)
+    FROM removed
+    WHERE d.diagram_id = removed.diagram_id AND d.layout->'objects' IS NOT NULL
+""")
+
+# Перенос позиций и цветов из строк diagramobjects в документ диаграммы
+_ROWS_TO_DOCUMENT_SQL = text("""
+    UPDATE diagrams
+    SET layout = jsonb_build_object(
+            'version', :doc_version,
+            'objects', COALESCE((
+                SELECT jsonb_object_agg(o.object_id::text,
+                                        jsonb_build_object('x', o.pos_x, 'y', o.pos_y, 'color', o.color))
+                FROM diagramobjects o WHERE o.diagram_id = diagrams.diagram_id), '{}'::jsonb)),
+        layout_mode = 'document',
+        layout_version = layout_version + 1
+    WHERE diagram_id = :diagram_id
+""")
+
+# Обратный перенос: документ раскладывается по строкам diagramobjects
+_DOCUMENT_TO_ROWS_SQL = text("""
+    UPDATE diagramobjects o
+    SET pos_x = COALESCE((d.layout->'objects'->(o.object_id::text)->>'x')::integer, o.pos_x),
+        pos_y = COALESCE((d.layout->'objects'->(o.object_id::text)->>'y')::integer, o.pos_y),
+        color = CASE WHEN d.layout->'objects'->(o.object_id::text) ? 'color'
+                     THEN d.layout->'objects'->(o.object_id::text)->>'color' ELSE o.color END
+    FROM diagrams d
+    WHERE d.diagram_id = o.diagram_id AND d.diagram_id = :diagram_id
+""")
+
 
 class DiagramController:
     # --- VVV --- НОВЫЙ МЕТОД --- VVV ---
@@ -66,6 +126,111 @@ class DiagramController:
         finally:
             session.close()
 
+    def get_diagram_snapshot(self, diagram_id: int, project_id: int) -> dict:
+        """
+        Возвращает все данные для построения диаграммы простыми словарями
+        за фиксированное число запросов (объекты, колонки, индексы, связи),
+        независимо от количества таблиц.
+        {
+            'diagram_id', 'project_id',
+            'tables': [{'object_id', 'table_id', 'name', 'x', 'y', 'color',
+                        'columns': [{'id', 'name', 'type', 'pk', 'nn', 'fk'}, ...],
+                        'indexes': [{'id', 'name', 'columns': [column_id, ...]}, ...]}, ...],
+            'relationships': [см. get_relationships_snapshot]
+        }
+        """
+        session = SessionLocal()
+        try:
+            # 1. Размещения таблиц вместе с именами
+            object_rows = session.query(
+                DiagramObject.object_id, DiagramObject.table_id, DiagramObject.pos_x, DiagramObject.pos_y,
+                DiagramObject.color, Table.table_name
+            ).join(Table, Table.table_id == DiagramObject.table_id).filter(
+                DiagramObject.diagram_id == diagram_id).all()
+
+            # В документном режиме позиции и цвета берутся из diagrams.layout, а строки задают только состав
+            layout_mode, layout = session.query(Diagram.layout_mode, Diagram.layout).filter(
+                Diagram.diagram_id == diagram_id).one()
+            placed = (layout or {}).get('objects', {}) if layout_mode == LAYOUT_MODE_DOCUMENT else {}
+
+            tables = {}
+            for row in object_rows:
+                placement = placed.get(str(row.object_id), {})
+                tables[row.table_id] = {
+                    'object_id': row.object_id, 'table_id': row.table_id, 'name': row.table_name,
+                    'x': placement.get('x', row.pos_x) or 0, 'y': placement.get('y', row.pos_y) or 0,
+                    'color': placement.get('color', row.color),
+                    'columns': [], 'indexes': [],
+                }
+            table_ids = session.query(DiagramObject.table_id).filter(
+                DiagramObject.diagram_id == diagram_id).scalar_subquery()
+
+            # 2. Связи проекта (нужны и для признака FK у колонок)
+            relationships = self._query_relationships_snapshot(session, project_id)
+            fk_column_ids = {col_id for rel in relationships for col_id in rel['end_column_ids']}
+
+            # 3. Колонки всех таблиц диаграммы одним запросом
+            column_rows = session.query(
+                TableColumn.column_id, TableColumn.table_id, TableColumn.column_name, TableColumn.data_type,
+                TableColumn.is_primary_key, TableColumn.is_nullable
+            ).filter(TableColumn.table_id.in_(table_ids)).order_by(TableColumn.table_id, *column_order_by()).all()
+            for row in column_rows:
+                tables[row.table_id]['columns'].append({
+                    'id': row.column_id, 'name': row.column_name, 'type': row.data_type,
+                    'pk': row.is_primary_key, 'nn': not row.is_nullable, 'fk': row.column_id in fk_column_ids,
+                })
+
+            # 4. Индексы с их колонками
+            index_rows = session.query(
+                DbIndex.index_id, DbIndex.table_id, DbIndex.index_name, IndexColumn.column_id
+            ).outerjoin(IndexColumn, IndexColumn.index_id == DbIndex.index_id).filter(
+                DbIndex.table_id.in_(table_ids)).order_by(DbIndex.index_id, IndexColumn.order).all()
+            indexes = {}
+            for row in index_rows:
+                index = indexes.get(row.index_id)
+                if index is None:
+                    index = indexes[row.index_id] = {'id': row.index_id, 'name': row.index_name, 'columns': []}
+                    tables[row.table_id]['indexes'].append(index)
+                if row.column_id is not None:
+                    index['columns'].append(row.column_id)
+
+            return {'diagram_id': diagram_id, 'project_id': project_id,
+                    'tables': list(tables.values()), 'relationships': relationships}
+        finally:
+            session.close()
+
+    def get_relationships_snapshot(self, project_id: int) -> list[dict]:
+        """Связи проекта простыми словарями (одним запросом), для отрисовки на диаграмме."""
+        session = SessionLocal()
+        try:
+            return self._query_relationships_snapshot(session, project_id)
+        finally:
+            session.close()
+
+    @staticmethod
+    def _query_relationships_snapshot(session: Session, project_id: int) -> list[dict]:
+        rows = session.query(
+            Relationship.relationship_id, Relationship.constraint_name,
+            Relationship.start_table_id, Relationship.end_table_id,
+            RelationshipColumn.start_column_id, RelationshipColumn.end_column_id,
+            RelationshipColumn.start_port_side, RelationshipColumn.end_port_side
+        ).join(RelationshipColumn, RelationshipColumn.relationship_id == Relationship.relationship_id).filter(
+            Relationship.project_id == project_id).order_by(Relationship.relationship_id).all()
+        relationships = {}
+        for row in rows:
+            # На диаграмме связь рисуется по первой паре колонок; FK - все колонки составного ключа
+            if row.relationship_id in relationships:
+                relationships[row.relationship_id]['end_column_ids'].append(row.end_column_id)
+                continue
+            relationships[row.relationship_id] = {
+                'id': row.relationship_id, 'name': row.constraint_name,
+                'start_table_id': row.start_table_id, 'start_column_id': row.start_column_id,
+                'start_side': row.start_port_side,
+                'end_table_id': row.end_table_id, 'end_column_id': row.end_column_id,
+                'end_side': row.end_port_side, 'end_column_ids': [row.end_column_id],
+            }
+        return list(relationships.values())
+
     def add_existing_table_to_diagram(self, diagram_id: int, table_id: int, x: int, y: int,
                                       session: Session = None) -> DiagramObject:
         should_close_session = False
@@ -110,12 +275,52 @@ class DiagramController:
             session.close()
 
     def update_table_position(self, diagram_object_id: int, x: int, y: int):
+        # Через apply_write_batch, чтобы учитывался режим хранения раскладки диаграммы
+        try:
+            self.apply_write_batch({diagram_object_id: (x, y)}, {}, {}, set())
+        except Exception:
+            pass
+
+    def apply_write_batch(self, positions: dict, colors: dict, column_types: dict, project_ids: set):
+        """
+        Записывает накопленные правки диаграммы одной транзакцией (вызывается из WriteBehindQueue).
+        positions: {object_id: (x, y)}, colors: {object_id: color}, column_types: {column_id: data_type}.
+        В отличие от остальных методов, ошибку не глотает - очередь сообщает о ней в UI.
+        """
         session = SessionLocal()
         try:
-            obj = session.get(DiagramObject, diagram_object_id)
-            if obj: obj.pos_x = x; obj.pos_y = y; session.commit()
+            objects = {object_id: {'object_id': object_id, 'pos_x': x, 'pos_y': y}
+                       for object_id, (x, y) in positions.items()}
+            for object_id, color in colors.items():
+                objects.setdefault(object_id, {'object_id': object_id})['color'] = color
+
+            # Объекты диаграмм в документном режиме пишутся одним оператором на диаграмму
+            if objects:
+                document_objects = session.query(DiagramObject.object_id, DiagramObject.diagram_id).join(
+                    Diagram, Diagram.diagram_id == DiagramObject.diagram_id).filter(
+                    DiagramObject.object_id.in_(list(objects)), Diagram.layout_mode == LAYOUT_MODE_DOCUMENT).all()
+                patches = {}
+                for object_id, diagram_id in document_objects:
+                    values = objects.pop(object_id)
+                    entry = {'x': values['pos_x'], 'y': values['pos_y']} if 'pos_x' in values else {}
+                    if 'color' in values:
+                        entry['color'] = values['color']
+                    patches.setdefault(diagram_id, {})[str(object_id)] = entry
+                for diagram_id, patch in patches.items():
+                    session.execute(_MERGE_LAYOUT_SQL, {'diagram_id': diagram_id, 'patch': json.dumps(patch),
+                                                        'doc_version': LAYOUT_DOCUMENT_VERSION})
+            if objects:
+                session.bulk_update_mappings(DiagramObject, list(objects.values()))
+            if column_types:
+                session.bulk_update_mappings(TableColumn, [{'column_id': column_id, 'data_type': data_type}
+                                                           for column_id, data_type in column_types.items()])
+            if project_ids:
+                session.query(Project).filter(Project.project_id.in_(project_ids)).update(
+                    {Project.updated_at: func.now()}, synchronize_session=False)
+            session.commit()
         except Exception:
             session.rollback()
+            raise
         finally:
             session.close()
 
@@ -130,20 +335,44 @@ class DiagramController:
             session.close()
 
     def update_table_color(self, diagram_object_id: int, color_hex: str):
+        try:
+            self.apply_write_batch({}, {diagram_object_id: color_hex}, {}, set())
+        except Exception:
+            pass
+
+    def set_layout_mode(self, diagram_id: int, mode: str) -> bool:
+        """
+        Переключает режим хранения раскладки диаграммы ('rows' или 'document'),
+        перенося текущие позиции и цвета на месте, одной транзакцией.
+        """
+        if mode not in (LAYOUT_MODE_ROWS, LAYOUT_MODE_DOCUMENT):
+            raise ValueError(f"Неизвестный режим раскладки: {mode}")
         session = SessionLocal()
         try:
-            obj = session.get(DiagramObject, diagram_object_id)
-            if obj: obj.color = color_hex; session.commit()
+            diagram = session.get(Diagram, diagram_id, with_for_update=True)
+            if not diagram: return False
+            if diagram.layout_mode == mode: return True
+            if mode == LAYOUT_MODE_DOCUMENT:
+                session.execute(_ROWS_TO_DOCUMENT_SQL, {'diagram_id': diagram_id,
+                                                        'doc_version': LAYOUT_DOCUMENT_VERSION})
+            else:
+                session.execute(_DOCUMENT_TO_ROWS_SQL, {'diagram_id': diagram_id})
+                diagram.layout_mode = LAYOUT_MODE_ROWS
+                diagram.layout = None
+            session.commit()
+            return True
         except Exception as e:
             session.rollback()
+            print(f"Ошибка при смене режима раскладки диаграммы {diagram_id}: {e}")
+            return False
         finally:
             session.close()
 
     def delete_table_from_diagram(self, diagram_object_id: int):
         session = SessionLocal()
         try:
-            obj = session.get(DiagramObject, diagram_object_id)
-            if obj: session.delete(obj); session.commit()
+            session.execute(_DELETE_DIAGRAM_OBJECT_SQL, {"object_id": diagram_object_id})
+            session.commit()
         except Exception:
             session.rollback()
         finally:
@@ -231,52 +460,76 @@ class DiagramController:
     # ... код класса ...
 
     def delete_table_completely(self, table_id: int) -> bool:
+        """Полное удаление одной таблицы (см. delete_tables_completely)."""
+        result = self.delete_tables_completely([table_id])
+        return bool(result and result['table_ids'])
+
+    def delete_tables_completely(self, table_ids) -> dict | None:
         """
-        Полное удаление таблицы.
-        Порядок удаления (от зависимых к главным):
-        1. DiagramObject (визуальное представление)
-        2. RelationshipColumn (детали связей - какие колонки связаны)
-        3. Relationship (сами связи между таблицами)
-        4. Table (сама таблица)
+        Полное удаление набора таблиц одной транзакцией.
+        Каждая зависимая сущность удаляется одним оператором по всему набору
+        (от зависимых к главным): объекты диаграмм, колонки связей, связи,
+        колонки индексов, индексы, колонки, таблицы.
+        Возвращает {'table_ids', 'relationship_ids', 'cleared_fk_columns'}, где
+        cleared_fk_columns - пары (table_id, column_id) оставшихся таблиц, которые
+        больше не являются FK; None при ошибке.
         """
+        table_ids = sorted(set(table_ids))
+        result = {'table_ids': [], 'relationship_ids': [], 'cleared_fk_columns': []}
+        if not table_ids: return result
         session = SessionLocal()
         try:
-            # 1. Удаляем визуальные объекты (DiagramObject)
-            session.query(DiagramObject).filter(DiagramObject.table_id == table_id).delete()
-
-            # 2. Находим ID всех связей, где участвует эта таблица
-            # (как родительская или как дочерняя)
-            rels_to_delete = session.query(Relationship).filter(
-                (Relationship.start_table_id == table_id) |
-                (Relationship.end_table_id == table_id)
-            ).all()
+            table_ids = session.execute(
+                select(Table.table_id).where(Table.table_id.in_(table_ids))).scalars().all()
+            if not table_ids: return result
 
-            # Собираем список ID этих связей
-            rel_ids = [r.relationship_id for r in rels_to_delete]
+            rel_ids = session.execute(select(Relationship.relationship_id).where(
+                Relationship.start_table_id.in_(table_ids) | Relationship.end_table_id.in_(table_ids)
+            )).scalars().all()
+            # FK-колонки уцелевших таблиц, чьи связи уходят вместе с удаляемыми таблицами
+            fk_candidates = session.execute(
+                select(Relationship.end_table_id, RelationshipColumn.end_column_id)
+                .join(RelationshipColumn, RelationshipColumn.relationship_id == Relationship.relationship_id)
+                .where(Relationship.relationship_id.in_(rel_ids), Relationship.end_table_id.not_in(table_ids))
+            ).all() if rel_ids else []
 
+            removed_objects = session.execute(
+                select(DiagramObject.object_id, DiagramObject.diagram_id)
+                .where(DiagramObject.table_id.in_(table_ids))).all()
+            no_sync = {"synchronize_session": False}
+            session.execute(delete(DiagramObject).where(DiagramObject.table_id.in_(table_ids)),
+                            execution_options=no_sync)
+            if removed_objects:
+                # В документах раскладки тоже убираем записи удаленных объектов
+                session.execute(_DROP_LAYOUT_OBJECTS_SQL, {
+                    "keys": [str(object_id) for object_id, _ in removed_objects],
+                    "diagram_ids": sorted({diagram_id for _, diagram_id in removed_objects})})
             if rel_ids:
-                # 3. Сначала удаляем детали связей (RelationshipColumn).
-                # Именно это вызывало вашу ошибку.
-                session.query(RelationshipColumn).filter(
-                    RelationshipColumn.relationship_id.in_(rel_ids)
-                ).delete(synchronize_session=False)
-
-                # 4. Теперь безопасно удаляем сами связи (Relationship)
-                session.query(Relationship).filter(
-                    Relationship.relationship_id.in_(rel_ids)
-                ).delete(synchronize_session=False)
-
-            # 5. И наконец, удаляем саму таблицу
-            table = session.get(Table, table_id)
-            if table:
-                session.delete(table)
-                session.commit()
-                return True
-            return False
+                session.execute(delete(RelationshipColumn).where(RelationshipColumn.relationship_id.in_(rel_ids)),
+                                execution_options=no_sync)
+                session.execute(delete(Relationship).where(Relationship.relationship_id.in_(rel_ids)),
+                                execution_options=no_sync)
+            index_ids = select(DbIndex.index_id).where(DbIndex.table_id.in_(table_ids))
+            session.execute(delete(IndexColumn).where(IndexColumn.index_id.in_(index_ids)),
+                            execution_options=no_sync)
+            session.execute(delete(DbIndex).where(DbIndex.table_id.in_(table_ids)), execution_options=no_sync)
+            session.execute(delete(TableColumn).where(TableColumn.table_id.in_(table_ids)),
+                            execution_options=no_sync)
+            session.execute(delete(Table).where(Table.table_id.in_(table_ids)), execution_options=no_sync)
 
+            if fk_candidates:
+                still_fk = set(session.execute(
+                    select(RelationshipColumn.end_column_id).where(
+                        RelationshipColumn.end_column_id.in_([col for _, col in fk_candidates]))
+                ).scalars())
+                result['cleared_fk_columns'] = sorted({(t, c) for t, c in fk_candidates if c not in still_fk})
+            session.commit()
+            result['table_ids'] = list(table_ids)
+            result['relationship_ids'] = list(rel_ids)
+            return result
         except Exception as e:
             session.rollback()
-            print(f"Критическая ошибка при удалении таблицы ID {table_id}: {e}")
-            return False
+            print(f"Критическая ошибка при удалении таблиц {table_ids}: {e}")
+            return None
         finally:
             session.close()
\ No newline at end of file
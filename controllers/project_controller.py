@@ -1,14 +1,36 @@
 # controllers/project_controller.py
 
-from models.base import SessionLocal
+from models.base import SessionLocal, session_scope
 from models.project import Project, Schema
 from models.table import Table, TableColumn, DbIndex, IndexColumn
 from models.relationships import Relationship, RelationshipColumn
+from models.diagram import Diagram, DiagramObject
 from models.user import Connection
-from sqlalchemy import desc, select
+from sqlalchemy import desc, select, insert, update, delete, func, text
 from sqlalchemy.orm import joinedload, selectinload
-from utils.schema_inspector import inspect_mysql_database
+from contextlib import closing
+from itertools import islice
+
+from utils.schema_inspector import inspect_mysql_database, iter_mysql_database, fingerprint_mysql_database
+from utils.task_runner import TaskCancelled
 from .diagram_controller import DiagramController
+from .table_controller import TableController
+
+# Сколько строк вставляется одним пакетом при импорте
+IMPORT_BATCH_SIZE = 1000
+# Сетка, которой импортированные таблицы раскладываются на диаграмме
+IMPORT_GRID_X, IMPORT_GRID_Y = 50, 50
+IMPORT_GRID_STEP_X, IMPORT_GRID_STEP_Y = 350, 250
+IMPORT_GRID_COLUMNS = 4
+
+# Нижняя занятая высота диаграммы: в документном режиме актуальные позиции лежат в diagrams.layout
+_DIAGRAM_BOTTOM_SQL = text("""
+    SELECT MAX(CASE WHEN d.layout_mode = 'document'
+                    THEN COALESCE((d.layout->'objects'->(o.object_id::text)->>'y')::integer, o.pos_y)
+                    ELSE o.pos_y END)
+    FROM diagramobjects o JOIN diagrams d ON d.diagram_id = o.diagram_id
+    WHERE o.diagram_id = :diagram_id
+""")
 
 
 class ProjectController:
@@ -57,65 +79,386 @@ class ProjectController:
         finally:
             session.close()
 
-    def import_project_from_db(self, user_id: int, connection: Connection, db_name: str) -> (Project | None, str):
-        schema_data, error = inspect_mysql_database(connection, db_name)
-        if error: return None, error
+    def delete_project(self, project_id: int) -> bool:
+        """Удаляет проект вместе со схемами, таблицами, диаграммами и связями."""
+        session = SessionLocal()
+        try:
+            project = session.get(Project, project_id)
+            if not project: return False
+            session.delete(project)
+            session.commit()
+            return True
+        except Exception as e:
+            session.rollback()
+            print(f"Ошибка при удалении проекта {project_id}: {e}")
+            return False
+        finally:
+            session.close()
+
+    def import_project_from_db(self, user_id: int, connection: Connection, db_name: str,
+                               progress=None, cancel_token=None) -> (Project | None, str):
+        """
+        Импортирует схему MySQL в новый проект.
+        Структура читается потоком (iter_mysql_database) и вставляется порциями по IMPORT_BATCH_SIZE
+        таблиц (INSERT ... RETURNING) в одной транзакции: в памяти держится одна порция, ключевые
+        колонки и внешние ключи; при ошибке или отмене в БД не остается ничего.
+        progress(done, total, message) - необязательный отчет о ходе импорта (в таблицах);
+        cancel_token - необязательный CancelToken, проверяется между пакетами.
+        """
+        def check_cancel():
+            if cancel_token: cancel_token.raise_if_cancelled()
+
+        total, done = 0, 0
+
+        def set_total(count):
+            nonlocal total
+            total = count
+
+        def advance(count, message):
+            nonlocal done
+            done += count
+            if progress: progress(done, total, message)
+            check_cancel()
+
+        if progress: progress(0, 0, f"Чтение структуры '{db_name}'...")
         session = SessionLocal()
         try:
-            project_name = f"Импорт MySQL: {db_name}"
-            new_project = Project(project_name=project_name, user_id=user_id)
+            new_project = Project(project_name=f"Импорт MySQL: {db_name}", user_id=user_id,
+                                  source_connection_id=connection.connection_id, source_db_name=db_name)
             new_schema = Schema(schema_name="public")
             new_project.schemas.append(new_schema)
-            session.add(new_project);
-            session.commit();
-            session.refresh(new_project)
+            main_diagram = Diagram(diagram_name="Main Diagram")
+            new_project.diagrams.append(main_diagram)
+            session.add(new_project)
+            session.flush()
 
-            diagram_ctrl = DiagramController()
-            main_diagram = diagram_ctrl.get_or_create_diagram_for_project(new_project.project_id)
-
-            created_tables = {};
-            created_columns = {}
-            for table_info in schema_data['tables']:
-                new_table = Table(table_name=table_info['name'], schema_id=new_schema.schema_id)
-                session.add(new_table);
-                created_tables[table_info['name']] = new_table
-                for col_info in table_info['columns']:
-                    new_col = TableColumn(
-                        column_name=col_info['name'], data_type=col_info['type'],
-                        is_primary_key=col_info['is_pk'], is_nullable=col_info['nullable'])
-                    new_table.columns.append(new_col)
-                    created_columns[f"{table_info['name']}.{col_info['name']}"] = new_col
-            session.commit()
+            # Для связей нужны id только колонок ключей и индексов (на них ссылаются FK) -
+            # остальные колонки порции после вставки забываются
+            table_ids, key_column_ids, fk_infos = {}, {}, []
+            # closing() закрывает соединение с источником и при ошибке или отмене посреди чтения
+            with closing(iter_mysql_database(connection, db_name, on_count=set_total)) as stream:
+                for chunk in iter(lambda: list(islice(stream, IMPORT_BATCH_SIZE)), []):
+                    chunk_table_ids = _insert_tables(session, new_schema.schema_id, chunk)
+                    column_ids = _insert_columns(session, chunk, chunk_table_ids)
+                    _insert_indexes(session, chunk, chunk_table_ids, column_ids)
+                    _place_tables(session, main_diagram.diagram_id, [chunk_table_ids[t['name']] for t in chunk],
+                                  IMPORT_GRID_Y, start=len(table_ids))
+                    table_ids.update(chunk_table_ids)
+                    key_column_ids.update((key, column_ids[key]) for key in _key_columns(chunk) if key in column_ids)
+                    fk_infos.extend(fk for t in chunk for fk in t['foreign_keys'])
+                    advance(len(chunk), f"Импорт таблиц: {done + len(chunk)} из {total}...")
+
+            _insert_relationships(session, new_project.project_id, fk_infos, table_ids, key_column_ids,
+                                  lambda count, message: advance(0, message))
 
-            x, y, col_count = 50, 50, 0
-            for table_name, table_obj in created_tables.items():
-                diagram_ctrl.add_existing_table_to_diagram(main_diagram.diagram_id, table_obj.table_id, x, y)
-                x += 350;
-                col_count += 1
-                if col_count % 4 == 0: x = 50; y += 250
-
-            for table_info in schema_data['tables']:
-                for fk_info in table_info['foreign_keys']:
-                    start_table = created_tables.get(fk_info['target_table'])
-                    end_table = created_tables.get(fk_info['source_table'])
-                    if not start_table or not end_table: continue
-                    start_col = created_columns.get(f"{fk_info['target_table']}.{fk_info['target_column']}")
-                    end_col = created_columns.get(f"{fk_info['source_table']}.{fk_info['source_column']}")
-                    if not start_col or not end_col: continue
-                    session.refresh(start_col);
-                    session.refresh(end_col)
-                    new_rel = Relationship(
-                        project_id=new_project.project_id, start_table_id=start_table.table_id,
-                        end_table_id=end_table.table_id, constraint_name=fk_info.get('CONSTRAINT_NAME'))
-                    new_rel.relationship_columns.append(
-                        RelationshipColumn(start_column_id=start_col.column_id, end_column_id=end_col.column_id))
-                    session.add(new_rel)
             session.commit()
+            session.refresh(new_project)
+            if progress: progress(total, total, "Готово")
             return new_project, "Проект успешно импортирован!"
+        except TaskCancelled:
+            session.rollback()
+            raise
         except Exception as e:
             session.rollback();
             import traceback;
             traceback.print_exc();
             return None, f"Ошибка во время импорта: {e}"
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+    def refresh_project_from_source(self, project_id: int, progress=None, cancel_token=None) -> (dict | None, str):
+        """
+        Обновляет импортированный проект по живой базе-источнику, сохраняя раскладку, цвета и заметки.
+        Отпечатки таблиц сравниваются с сохраненными; заново читаются только новые и изменившиеся
+        таблицы, и к метаданным применяется минимальный дифф одной транзакцией:
+        исчезнувшие таблицы удаляются, колонки изменившихся синхронизируются по имени,
+        новые таблицы добавляются под существующими, связи дочерних таблиц строятся по FK источника.
+        Таблицы, созданные в приложении (без отпечатка), не трогаются.
+        Таблица приложения с тем же именем, что у таблицы источника, тоже не трогается и
+        попадает в список конфликтов.
+        Возвращает ({'added', 'removed', 'changed', 'unchanged', 'conflicts': [имена]}, сообщение)
+        или (None, ошибка).
+        """
+        def report(step, message):
+            if progress: progress(step, 4, message)
+            if cancel_token: cancel_token.raise_if_cancelled()
+
+        session = SessionLocal()
+        try:
+            project = session.get(Project, project_id)
+            connection = session.get(Connection, project.source_connection_id) \
+                if project and project.source_connection_id else None
+            db_name = project.source_db_name if project else None
+        finally:
+            session.close()
+        if not connection or not db_name:
+            return None, "Проект не связан с базой данных-источником."
+
+        report(0, f"Сравнение таблиц '{db_name}'...")
+        remote_fingerprints, error = fingerprint_mysql_database(connection, db_name)
+        if error: return None, error
+
+        try:
+            with session_scope() as session:
+                schema_id = session.execute(
+                    select(Schema.schema_id).filter_by(project_id=project_id)).scalars().first()
+                local = {row.table_name: row for row in session.execute(
+                    select(Table.table_id, Table.table_name, Table.source_fingerprint).filter_by(schema_id=schema_id))}
+                added = [name for name in remote_fingerprints if name not in local]
+                # Таблица приложения (без отпечатка) с именем таблицы источника - конфликт, ее не трогаем
+                conflicts = sorted(name for name in remote_fingerprints
+                                   if name in local and local[name].source_fingerprint is None)
+                changed = [name for name, fingerprint in remote_fingerprints.items()
+                           if name in local and local[name].source_fingerprint is not None
+                           and local[name].source_fingerprint != fingerprint]
+                removed_ids = [row.table_id for name, row in local.items()
+                               if name not in remote_fingerprints and row.source_fingerprint is not None]
+                summary = {'added': len(added), 'removed': len(removed_ids), 'changed': len(changed),
+                           'unchanged': len(remote_fingerprints) - len(added) - len(changed) - len(conflicts),
+                           'conflicts': conflicts}
+                if not (added or changed or removed_ids):
+                    return summary, "Схема источника не изменилась."
+
+                report(1, f"Чтение изменившихся таблиц: {len(added) + len(changed)}...")
+                tables_info = []
+                if added or changed:
+                    schema_data, error = inspect_mysql_database(connection, db_name, added + changed)
+                    if error: raise RuntimeError(error)
+                    tables_info = schema_data['tables']
+                new_infos = [t for t in tables_info if t['name'] not in local]
+                changed_infos = [t for t in tables_info if t['name'] in local]
+
+                report(2, "Применение изменений...")
+                if removed_ids and DiagramController().delete_tables_completely(removed_ids) is None:
+                    raise RuntimeError("Не удалось удалить таблицы, исчезнувшие из источника.")
+                self._sync_changed_tables(session, {local[t['name']].table_id: t for t in changed_infos})
+
+                table_ids = _insert_tables(session, schema_id, new_infos)
+                _insert_columns(session, new_infos, table_ids)
+                if new_infos:
+                    diagram = DiagramController().get_or_create_diagram_for_project(project_id, session=session)
+                    bottom = session.execute(_DIAGRAM_BOTTOM_SQL, {"diagram_id": diagram.diagram_id}).scalar()
+                    _place_tables(session, diagram.diagram_id, [table_ids[t['name']] for t in new_infos],
+                                  IMPORT_GRID_Y if bottom is None else bottom + IMPORT_GRID_STEP_Y)
+
+                report(3, "Обновление индексов и связей...")
+                self._sync_source_indexes_and_relationships(session, project_id, schema_id, tables_info,
+                                                            skip_tables=set(conflicts))
+                session.execute(update(Project).where(Project.project_id == project_id)
+                                .values(updated_at=func.now()))
+            report(4, "Готово")
+            return summary, "Проект обновлен из источника."
+        except TaskCancelled:
+            raise
+        except Exception as e:
+            import traceback;
+            traceback.print_exc();
+            return None, f"Ошибка при обновлении из источника: {e}"
+
+    def _sync_changed_tables(self, session, changed: dict):
+        """Колонки изменившихся таблиц приводятся к источнику; changed - {table_id: table_info}."""
+        if not changed: return
+        # Индексы изменившихся таблиц пересоздаются из источника целиком
+        no_sync = {"synchronize_session": False}
+        index_ids = select(DbIndex.index_id).where(DbIndex.table_id.in_(list(changed)))
+        session.execute(delete(IndexColumn).where(IndexColumn.index_id.in_(index_ids)), execution_options=no_sync)
+        session.execute(delete(DbIndex).where(DbIndex.table_id.in_(list(changed))), execution_options=no_sync)
+        existing = {}
+        for row in session.execute(select(TableColumn.column_id, TableColumn.table_id, TableColumn.column_name,
+                                          TableColumn.is_unique, TableColumn.default_value)
+                                   .where(TableColumn.table_id.in_(list(changed)))):
+            existing.setdefault(row.table_id, {})[row.column_name] = row
+        deleted_ids = [row.column_id for table_id, columns in existing.items() for name, row in columns.items()
+                       if name not in {col['name'] for col in changed[table_id]['columns']}]
+        if deleted_ids:
+            # Ссылки на исчезающие колонки убираем до самих колонок
+            rel_ids = session.execute(select(RelationshipColumn.relationship_id).where(
+                RelationshipColumn.start_column_id.in_(deleted_ids) | RelationshipColumn.end_column_id.in_(deleted_ids)
+            )).scalars().all()
+            if rel_ids:
+                session.execute(delete(RelationshipColumn).where(RelationshipColumn.relationship_id.in_(rel_ids)),
+                                execution_options=no_sync)
+                session.execute(delete(Relationship).where(Relationship.relationship_id.in_(rel_ids)),
+                                execution_options=no_sync)
+
+        table_ctrl = TableController()
+        size_updates = []
+        for table_id, table_info in changed.items():
+            columns = existing.get(table_id, {})
+            rows = [{'id': columns[col['name']].column_id if col['name'] in columns else None,
+                     'name': col['name'], 'type': col['type'], 'pk': col['is_pk'], 'nn': not col['nullable'],
+                     'uq': col.get('is_unique', False), 'default': _column_fields(col)['default_value']}
+                    for col in table_info['columns']]
+            diff = table_ctrl.sync_columns_for_table(table_id, rows)
+            if diff is None:
+                raise RuntimeError(f"Не удалось обновить колонки таблицы '{table_info['name']}'.")
+            # Размерность типа редактор не правит - переносим ее отдельным пакетом
+            for synced, col in zip(diff['columns'], table_info['columns']):
+                size_updates.append({'column_id': synced['id'], 'char_length': col.get('length'),
+                                     'numeric_precision': col.get('precision'), 'numeric_scale': col.get('scale')})
+        if size_updates:
+            session.execute(update(TableColumn), size_updates)
+        session.execute(update(Table), [{'table_id': table_id, 'source_fingerprint': info.get('fingerprint')}
+                                        for table_id, info in changed.items()])
+
+    def _sync_source_indexes_and_relationships(self, session, project_id: int, schema_id: int, tables_info: list,
+                                               skip_tables: set = frozenset()):
+        """
+        Для перечитанных из источника таблиц: создаются их индексы (старые уже удалены),
+        а связи, где таблица дочерняя, приводятся к ее внешним ключам.
+        Внешние ключи на таблицы из skip_tables (конфликтующие таблицы приложения) пропускаются.
+        """
+        if not tables_info: return
+        table_ids = {row.table_name: row.table_id for row in session.execute(
+            select(Table.table_name, Table.table_id).filter_by(schema_id=schema_id))}
+        column_ids = {(row.table_name, row.column_name): row.column_id for row in session.execute(
+            select(Table.table_name, TableColumn.column_name, TableColumn.column_id)
+            .join(TableColumn, TableColumn.table_id == Table.table_id).where(Table.schema_id == schema_id))}
+        _insert_indexes(session, tables_info, table_ids, column_ids)
+        child_ids = [table_ids[t['name']] for t in tables_info if t['name'] in table_ids]
+
+        # Связь сравнивается по набору пар колонок (составной ключ - несколько пар)
+        pairs_by_rel = {}
+        for row in session.execute(
+                select(Relationship.relationship_id, RelationshipColumn.start_column_id,
+                       RelationshipColumn.end_column_id)
+                .join(RelationshipColumn, RelationshipColumn.relationship_id == Relationship.relationship_id)
+                .where(Relationship.end_table_id.in_(child_ids))):
+            pairs_by_rel.setdefault(row.relationship_id, set()).add((row.start_column_id, row.end_column_id))
+        existing = {frozenset(pairs): rel_id for rel_id, pairs in pairs_by_rel.items()}
+        wanted, fk_infos = set(), []
+        for fk_info in (fk for t in tables_info for fk in t['foreign_keys']):
+            if fk_info['target_table'] in skip_tables: continue
+            pairs = _fk_column_pairs(fk_info, column_ids)
+            if not pairs: continue
+            key = frozenset(pairs)
+            wanted.add(key)
+            if key not in existing: fk_infos.append(fk_info)
+
+        stale_ids = [rel_id for key, rel_id in existing.items() if key not in wanted]
+        if stale_ids:
+            no_sync = {"synchronize_session": False}
+            session.execute(delete(RelationshipColumn).where(RelationshipColumn.relationship_id.in_(stale_ids)),
+                            execution_options=no_sync)
+            session.execute(delete(Relationship).where(Relationship.relationship_id.in_(stale_ids)),
+                            execution_options=no_sync)
+        _insert_relationships(session, project_id, fk_infos, table_ids, column_ids)
+
+
+def _batches(rows: list, size: int = None):
+    size = size or IMPORT_BATCH_SIZE
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _insert_tables(session, schema_id: int, tables_info: list, advance=None) -> dict:
+    """Вставляет таблицы пакетами; возвращает {имя таблицы: table_id}."""
+    table_ids = {}
+    rows = [{'table_name': t['name'], 'schema_id': schema_id, 'source_fingerprint': t.get('fingerprint')}
+            for t in tables_info]
+    for batch in _batches(rows):
+        result = session.execute(insert(Table).returning(Table.table_id, Table.table_name), batch)
+        table_ids.update((name, table_id) for table_id, name in result)
+        if advance: advance(len(batch), "Создание таблиц...")
+    return table_ids
+
+
+def _insert_columns(session, tables_info: list, table_ids: dict, advance=None) -> dict:
+    """Вставляет колонки пакетами; возвращает {(имя таблицы, имя колонки): column_id}."""
+    column_ids = {}
+    table_names = {table_id: name for name, table_id in table_ids.items()}
+    rows = [{'table_id': table_ids[t['name']], 'col_num': position, **_column_fields(col)}
+            for t in tables_info for position, col in enumerate(t['columns'])]
+    for batch in _batches(rows):
+        result = session.execute(
+            insert(TableColumn).returning(TableColumn.column_id, TableColumn.table_id, TableColumn.column_name), batch)
+        column_ids.update(((table_names[table_id], name), column_id) for column_id, table_id, name in result)
+        if advance: advance(len(batch), "Создание колонок...")
+    return column_ids
+
+
+def _column_fields(col: dict) -> dict:
+    """Колонка из инспектора -> поля TableColumn (кроме table_id и col_num)."""
+    default = col.get('default')
+    return {'column_name': col['name'], 'data_type': col['type'], 'is_primary_key': col['is_pk'],
+            'is_nullable': col['nullable'], 'is_unique': col.get('is_unique', False),
+            'default_value': str(default)[:255] if default is not None else None,
+            'char_length': col.get('length'), 'numeric_precision': col.get('precision'),
+            'numeric_scale': col.get('scale')}
+
+
+def _insert_indexes(session, tables_info: list, table_ids: dict, column_ids: dict, advance=None):
+    """Вставляет индексы таблиц и их колонки пакетами."""
+    indexes = []
+    for t in tables_info:
+        for index in t.get('indexes', []):
+            index_columns = [column_ids.get((t['name'], name)) for name in index['columns']]
+            if None in index_columns: continue
+            indexes.append(({'table_id': table_ids[t['name']], 'index_name': index['name'],
+                             'is_unique': index['unique'], 'is_primary_key': index['primary']}, index_columns))
+    for batch in _batches(indexes):
+        result = session.execute(
+            insert(DbIndex).returning(DbIndex.index_id, sort_by_parameter_order=True), [row for row, _ in batch])
+        session.execute(insert(IndexColumn), [
+            {'index_id': index_id, 'column_id': column_id, 'order': order}
+            for index_id, (_, index_columns) in zip(result.scalars(), batch)
+            for order, column_id in enumerate(index_columns)])
+        if advance: advance(len(batch), "Создание индексов...")
+
+
+def _place_tables(session, diagram_id: int, table_ids: list, top: int, advance=None, start: int = 0):
+    """
+    Размещает таблицы на диаграмме сеткой по IMPORT_GRID_COLUMNS в ряд, начиная с высоты top;
+    start - сколько ячеек сетки уже занято (продолжение при импорте порциями).
+    """
+    rows = [{'diagram_id': diagram_id, 'table_id': table_id,
+             'pos_x': IMPORT_GRID_X + (i % IMPORT_GRID_COLUMNS) * IMPORT_GRID_STEP_X,
+             'pos_y': top + (i // IMPORT_GRID_COLUMNS) * IMPORT_GRID_STEP_Y}
+            for i, table_id in enumerate(table_ids, start=start)]
+    for batch in _batches(rows):
+        session.execute(insert(DiagramObject), batch)
+        if advance: advance(len(batch), "Размещение таблиц на диаграмме...")
+
+
+def _key_columns(tables_info: list):
+    """(таблица, колонка) для колонок, которые могут участвовать во внешних ключах: PK, UNIQUE, индексы, FK."""
+    for t in tables_info:
+        for col in t['columns']:
+            if col['is_pk'] or col['is_fk'] or col.get('is_unique'):
+                yield t['name'], col['name']
+        for index in t.get('indexes', []):
+            for name in index['columns']:
+                yield t['name'], name
+
+
+def _fk_column_pairs(fk_info: dict, column_ids: dict) -> list | None:
+    """Пары (колонка родителя, колонка потомка) внешнего ключа; None, если какой-то колонки нет."""
+    pairs = [(column_ids.get((fk_info['target_table'], target)), column_ids.get((fk_info['source_table'], source)))
+             for source, target in fk_info['columns']]
+    return None if any(None in pair for pair in pairs) else pairs
+
+
+def _insert_relationships(session, project_id: int, fk_infos: list, table_ids: dict, column_ids: dict,
+                          advance=None):
+    """
+    Связи по внешним ключам: родительская (target) таблица - начало, дочерняя (source) - конец.
+    Составной ключ дает одну связь с несколькими парами колонок.
+    """
+    links = []
+    for fk_info in fk_infos:
+        start_table = table_ids.get(fk_info['target_table'])
+        end_table = table_ids.get(fk_info['source_table'])
+        pairs = _fk_column_pairs(fk_info, column_ids)
+        if not (start_table and end_table and pairs): continue
+        links.append(({'project_id': project_id, 'start_table_id': start_table,
+                       'end_table_id': end_table, 'constraint_name': fk_info.get('CONSTRAINT_NAME')}, pairs))
+    for batch in _batches(links):
+        result = session.execute(
+            insert(Relationship).returning(Relationship.relationship_id, sort_by_parameter_order=True),
+            [rel for rel, _ in batch])
+        rel_columns = [{'relationship_id': rel_id, 'start_column_id': start_col, 'end_column_id': end_col}
+                       for rel_id, (_, pairs) in zip(result.scalars(), batch) for start_col, end_col in pairs]
+        session.execute(insert(RelationshipColumn), rel_columns)
+        if advance: advance(len(batch), "Создание связей...")
+    skipped = len(fk_infos) - len(links)
+    if skipped and advance: advance(skipped, "Создание связей...")
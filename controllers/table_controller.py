@@ -1,8 +1,21 @@
 # controllers/table_controller.py
 from models.base import SessionLocal
-from models.table import Table, TableColumn, DbIndex, IndexColumn
+from models.table import Table, TableColumn, DbIndex, IndexColumn, column_order_by
+from sqlalchemy import select, insert, update, delete
 from sqlalchemy.orm import joinedload, selectinload
 
+# Поля колонки, которые правит редактор таблицы
+_COLUMN_FIELDS = ('column_name', 'data_type', 'is_primary_key', 'is_nullable', 'is_unique',
+                  'default_value', 'col_num')
+
+
+def _column_values(data: dict, position: int) -> dict:
+    """Строка редактора ('name', 'type', 'pk', 'nn', 'uq', 'default') -> значения полей TableColumn."""
+    return {'column_name': data['name'], 'data_type': data['type'], 'is_primary_key': data['pk'],
+            'is_nullable': not data['nn'], 'is_unique': data.get('uq', False),
+            'default_value': data.get('default') or None, 'col_num': position}
+
+
 class TableController:
     def get_table_details(self, table_id: int) -> Table | None:
         session = SessionLocal()
@@ -40,28 +53,61 @@ class TableController:
 
     def get_columns_for_table(self, table_id: int) -> list[TableColumn]:
         session = SessionLocal()
-        try: return session.query(TableColumn).filter_by(table_id=table_id).order_by(TableColumn.column_id).all()
+        try: return session.query(TableColumn).filter_by(table_id=table_id).order_by(*column_order_by()).all()
         finally: session.close()
 
-    def sync_columns_for_table(self, table_id: int, columns_data: list[dict]):
+    def sync_columns_for_table(self, table_id: int, columns_data: list[dict]) -> dict | None:
+        """
+        Приводит колонки таблицы к columns_data (в порядке следования строк редактора).
+        Сначала вычисляется явный дифф с тем, что лежит в БД, затем он применяется
+        пакетными операторами: один DELETE, один пакетный UPDATE, один INSERT ... RETURNING.
+        Позиция колонки сохраняется в col_num.
+        Возвращает {'inserted', 'updated', 'deleted', 'reordered'} (списки column_id)
+        и 'columns' - итоговые колонки в порядке следования; None при ошибке.
+        """
         session = SessionLocal()
         try:
-            existing_columns = {c.column_id: c for c in session.query(TableColumn).filter_by(table_id=table_id)}
-            data_ids = {d['id'] for d in columns_data if d.get('id')}
-            for col_id, col_obj in existing_columns.items():
-                if col_id not in data_ids: session.delete(col_obj)
-            for data in columns_data:
-                col_id = data.get('id')
-                if col_id in existing_columns:
-                    col = existing_columns[col_id]
-                    col.column_name = data['name']; col.data_type = data['type']; col.is_primary_key = data['pk']
-                    col.is_nullable = not data['nn']; col.is_unique = data.get('uq', False); col.default_value = data.get('default')
-                else:
-                    col = TableColumn(table_id=table_id, column_name=data['name'], data_type=data['type'], is_primary_key=data['pk'], is_nullable=not data['nn'], is_unique=data.get('uq', False), default_value=data.get('default'))
-                    session.add(col)
+            existing = {row.column_id: row for row in session.execute(
+                select(TableColumn.column_id, *(getattr(TableColumn, field) for field in _COLUMN_FIELDS))
+                .where(TableColumn.table_id == table_id))}
+            diff = {'inserted': [], 'updated': [], 'deleted': [], 'reordered': [], 'columns': []}
+            updates, inserts = [], []
+            for position, data in enumerate(columns_data):
+                values = _column_values(data, position)
+                old = existing.get(data.get('id'))
+                if old is None:
+                    inserts.append({'table_id': table_id, **values})
+                    continue
+                changed = any(getattr(old, field) != values[field] for field in _COLUMN_FIELDS if field != 'col_num')
+                moved = old.col_num != position
+                if changed: diff['updated'].append(old.column_id)
+                if moved: diff['reordered'].append(old.column_id)
+                if changed or moved: updates.append({'column_id': old.column_id, **values})
+            kept_ids = {data.get('id') for data in columns_data}
+            diff['deleted'] = [col_id for col_id in existing if col_id not in kept_ids]
+
+            if diff['deleted']:
+                session.execute(delete(TableColumn).where(TableColumn.column_id.in_(diff['deleted'])),
+                                execution_options={"synchronize_session": False})
+            if updates:
+                session.execute(update(TableColumn), updates)
+            if inserts:
+                diff['inserted'] = session.execute(
+                    insert(TableColumn).returning(TableColumn.column_id, sort_by_parameter_order=True), inserts
+                ).scalars().all()
             session.commit()
+
+            new_ids = iter(diff['inserted'])
+            for position, data in enumerate(columns_data):
+                col_id = data['id'] if data.get('id') in existing else next(new_ids)
+                values = _column_values(data, position)
+                diff['columns'].append({'id': col_id, 'name': values['column_name'], 'type': values['data_type'],
+                                        'pk': values['is_primary_key'], 'nn': not values['is_nullable'],
+                                        'uq': values['is_unique'], 'default': values['default_value']})
+            return diff
         except Exception as e:
             session.rollback(); print(f"Ошибка: {e}")
+            return None
         finally: session.close()
 
     def get_indexes_for_table(self, table_id: int) -> list[DbIndex]:
@@ -5,6 +5,7 @@ from dotenv import load_dotenv
 # Импортируем базовый класс и все модели, чтобы они были зарегистрированы в метаданных Base
 from models import Base
 from models import * # Это нужно, чтобы Python "увидел" все ваши классы моделей
+from models.migrations import run_migrations
 
 def create_tables():
     load_dotenv()
@@ -16,6 +17,7 @@ def create_tables():
 
     print("Создание таблиц в базе данных...")
     Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
     print("Таблицы успешно созданы.")
 
 if __name__ == "__main__":
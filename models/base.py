@@ -1,10 +1,17 @@
 # models/base.py
 
 import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker, declarative_base
 
+from utils.sql_instrumentation import install_query_hooks
+
 # 1. Загружаем переменные из файла .env
 load_dotenv()
 
@@ -15,16 +22,162 @@ DB_NAME = os.getenv("DB_NAME", "visual_db")
 DB_USER = os.getenv("DB_USER", "visual_db_user")
 DB_PASSWORD = os.getenv("DB_PASSWORD", "HUREHURE123hu")
 
+# Настройки пула соединений
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))      # секунды; -1 - не пересоздавать
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))  # 0 - без ограничения
+
 # Формируем строку подключения
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+connect_args = {}
+if DB_STATEMENT_TIMEOUT_MS > 0:
+    connect_args["options"] = f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"
+
 # Создаем движок
 # echo=False, чтобы не засорять консоль SQL-логами
-engine = create_engine(DATABASE_URL, echo=False)
+engine = create_engine(
+    DATABASE_URL, echo=False,
+    pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+    pool_recycle=DB_POOL_RECYCLE, pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args=connect_args,
+)
+
+# Учет запросов по действиям пользователя и журнал медленных запросов
+install_query_hooks(engine)
+
+# --- МЕТРИКИ ПУЛА ---
+_pool_lock = threading.Lock()
+_pool_metrics = {
+    "connects": 0,          # новых физических соединений
+    "checkouts": 0,         # выдач соединения из пула
+    "checkins": 0,
+    "checked_out": 0,       # выдано сейчас
+    "max_checked_out": 0,
+    "total_hold_ms": 0.0,   # суммарное время удержания соединений
+}
+
+
+@event.listens_for(engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    with _pool_lock:
+        _pool_metrics["connects"] += 1
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+@event.listens_for(engine, "checkout")
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    connection_record.info["checkout_time"] = time.perf_counter()
+    with _pool_lock:
+        _pool_metrics["checkouts"] += 1
+        _pool_metrics["checked_out"] += 1
+        _pool_metrics["max_checked_out"] = max(_pool_metrics["max_checked_out"], _pool_metrics["checked_out"])
+
+
+@event.listens_for(engine, "checkin")
+def _on_checkin(dbapi_connection, connection_record):
+    started = connection_record.info.pop("checkout_time", None)
+    with _pool_lock:
+        _pool_metrics["checkins"] += 1
+        _pool_metrics["checked_out"] = max(0, _pool_metrics["checked_out"] - 1)
+        if started is not None:
+            _pool_metrics["total_hold_ms"] += (time.perf_counter() - started) * 1000
+
+
+def pool_metrics() -> dict:
+    """Счетчики пула соединений и текущее состояние пула."""
+    with _pool_lock:
+        metrics = dict(_pool_metrics)
+    metrics["pool_status"] = engine.pool.status()
+    return metrics
+
+
+_SessionFactory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# --- ОБЩАЯ СЕССИЯ ДЛЯ ОДНОГО ДЕЙСТВИЯ ПОЛЬЗОВАТЕЛЯ ---
+_current_scope: ContextVar = ContextVar("session_scope", default=None)
+
+
+class SessionScopeFailed(Exception):
+    """Внутри session_scope() контроллер откатил транзакцию; действие не зафиксировано целиком."""
+
+
+class ScopedSession:
+    """
+    Сессия, общая для всех контроллеров внутри session_scope().
+    Методы контроллеров работают с ней как с обычной сессией, но их commit()
+    лишь сбрасывает изменения в БД (flush), а close() ничего не делает:
+    транзакцию фиксирует и соединение возвращает в пул сам session_scope.
+    rollback() откатывает всю транзакцию действия и помечает область неудачной:
+    по выходе session_scope откатывает и то, что было сделано после отката,
+    и выбрасывает SessionScopeFailed - частичная фиксация невозможна.
+    """
+
+    def __init__(self, session):
+        self._session = session
+        self.failed = False
+
+    def commit(self):
+        self._session.flush()
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        self._session.rollback()
+        self.failed = True
+
+    def __getattr__(self, name):
+        return getattr(self._session, name)
+
+
+@contextmanager
+def session_scope():
+    """
+    Одна сессия и одна транзакция на действие пользователя:
+
+        with session_scope():
+            validator.validate()
+            tables = project_ctrl.get_all_tables_for_project(project_id)
+
+    Если контроллер внутри области вызвал rollback(), ничего не фиксируется,
+    а по выходе выбрасывается SessionScopeFailed.
+    Вложенные session_scope() используют внешнюю сессию. Область действует в текущем
+    потоке/контексте; задачи в других потоках открывают свои сессии.
+    """
+    current = _current_scope.get()
+    if current is not None:
+        yield current
+        return
+    session = _SessionFactory(expire_on_commit=False)
+    scoped = ScopedSession(session)
+    token = _current_scope.set(scoped)
+    try:
+        yield scoped
+        if scoped.failed:
+            raise SessionScopeFailed("Операция не выполнена: изменения действия отменены из-за ошибки.")
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        _current_scope.reset(token)
+        session.close()
+
+
+def SessionLocal():
+    """
+    Фабрика сессий для контроллеров (прежнее имя sessionmaker сохранено).
+    Внутри session_scope() возвращает общую сессию действия, иначе - новую.
+    """
+    scoped = _current_scope.get()
+    return scoped if scoped is not None else _SessionFactory()
+
+
 def init_db():
-    """Создает все таблицы в базе данных, если их еще нет."""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    """Создает все таблицы в базе данных, если их еще нет, и применяет миграции."""
+    from .migrations import run_migrations
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
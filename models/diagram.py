@@ -1,8 +1,14 @@
 # models/diagram.py
-from sqlalchemy import Column, Integer, String, ForeignKey
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship, deferred
 from .base import Base
 
+# Режимы хранения раскладки диаграммы
+LAYOUT_MODE_ROWS = 'rows'          # позиции и цвета в строках diagramobjects
+LAYOUT_MODE_DOCUMENT = 'document'  # позиции и цвета одним JSONB-документом в diagrams.layout
+LAYOUT_DOCUMENT_VERSION = 1
+
 
 class Diagram(Base):
     __tablename__ = 'diagrams'
@@ -10,7 +16,15 @@ class Diagram(Base):
     diagram_id = Column(Integer, primary_key=True)
     diagram_name = Column(String(100), nullable=False)
 
-    project_id = Column(Integer, ForeignKey('projects.project_id'), nullable=False)
+    project_id = Column(Integer, ForeignKey('projects.project_id'), nullable=False, index=True)
+
+    # Раскладка в режиме 'document': {"version": 1, "objects": {"<object_id>": {"x", "y", "color"}}}
+    # Строки diagramobjects при этом остаются и задают состав диаграммы.
+    # Документ может быть большим, поэтому колонка отложена: списки диаграмм его не читают,
+    # а снимок раскладки запрашивает Diagram.layout явно.
+    layout_mode = Column(String(10), nullable=False, default=LAYOUT_MODE_ROWS, server_default=LAYOUT_MODE_ROWS)
+    layout = deferred(Column(JSONB, nullable=True))
+    layout_version = Column(Integer, nullable=False, default=0, server_default='0')  # растет при каждом сохранении
 
     project = relationship("Project", back_populates="diagrams")
     objects = relationship("DiagramObject", back_populates="diagram", cascade="all, delete-orphan")
@@ -18,6 +32,8 @@ class Diagram(Base):
 
 class DiagramObject(Base):
     __tablename__ = 'diagramobjects'
+    # Таблица входит в диаграмму не более одного раза; индекс же обслуживает выборки по diagram_id
+    __table_args__ = (Index('ux_diagramobjects_diagram_table', 'diagram_id', 'table_id', unique=True),)
 
     object_id = Column(Integer, primary_key=True)
     pos_x = Column(Integer, default=0)
@@ -25,7 +41,7 @@ class DiagramObject(Base):
     color = Column(String(20), nullable=True)
 
     diagram_id = Column(Integer, ForeignKey('diagrams.diagram_id'), nullable=False)
-    table_id = Column(Integer, ForeignKey('tables.table_id'), nullable=False)  # Связь с конкретной таблицей
+    table_id = Column(Integer, ForeignKey('tables.table_id'), nullable=False, index=True)  # Связь с конкретной таблицей
 
     diagram = relationship("Diagram", back_populates="objects")
     table = relationship("Table")  # Однонаправленная связь с таблицей, которую представляет объект
\ No newline at end of file
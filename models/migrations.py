@@ -0,0 +1,68 @@
+# models/migrations.py
+
+from sqlalchemy import text
+
+# Версионированные изменения схемы, которые create_all не умеет применять к уже существующим таблицам.
+# Каждая миграция - (версия, описание, список SQL-операторов); операторы должны быть идемпотентны,
+# так как на новой базе create_all уже создает актуальные таблицы.
+MIGRATIONS = [
+    (1, "diagram layout document", [
+        "ALTER TABLE diagrams ADD COLUMN IF NOT EXISTS layout_mode VARCHAR(10) NOT NULL DEFAULT 'rows'",
+        "ALTER TABLE diagrams ADD COLUMN IF NOT EXISTS layout JSONB",
+        "ALTER TABLE diagrams ADD COLUMN IF NOT EXISTS layout_version INTEGER NOT NULL DEFAULT 0",
+    ]),
+    (2, "foreign key indexes", [
+        # Дубликаты таблицы на одной диаграмме мешают уникальному индексу - оставляем самый ранний объект
+        "DELETE FROM diagramobjects d USING diagramobjects k "
+        "WHERE d.diagram_id = k.diagram_id AND d.table_id = k.table_id AND d.object_id > k.object_id",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_diagramobjects_diagram_table ON diagramobjects (diagram_id, table_id)",
+        "CREATE INDEX IF NOT EXISTS ix_diagramobjects_table_id ON diagramobjects (table_id)",
+        "CREATE INDEX IF NOT EXISTS ix_diagrams_project_id ON diagrams (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_projects_user_id ON projects (user_id)",
+        "CREATE INDEX IF NOT EXISTS ix_schemas_project_id ON schemas (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_tables_schema_id ON tables (schema_id)",
+        "CREATE INDEX IF NOT EXISTS ix_columns_table_id ON columns (table_id)",
+        "CREATE INDEX IF NOT EXISTS ix_indexes_table_id ON indexes (table_id)",
+        'CREATE INDEX IF NOT EXISTS "ix_indexColumns_column_id" ON "indexColumns" (column_id)',
+        "CREATE INDEX IF NOT EXISTS ix_relationships_project_id ON relationships (project_id)",
+        "CREATE INDEX IF NOT EXISTS ix_relationships_start_table_id ON relationships (start_table_id)",
+        "CREATE INDEX IF NOT EXISTS ix_relationships_end_table_id ON relationships (end_table_id)",
+        'CREATE INDEX IF NOT EXISTS "ix_relationshipsColumns_start_column_id" ON "relationshipsColumns" (start_column_id)',
+        'CREATE INDEX IF NOT EXISTS "ix_relationshipsColumns_end_column_id" ON "relationshipsColumns" (end_column_id)',
+        "ANALYZE diagramobjects, diagrams, projects, schemas, tables, columns, indexes, "
+        '"indexColumns", relationships, "relationshipsColumns"',
+    ]),
+    (3, "source database tracking", [
+        "ALTER TABLE projects ADD COLUMN IF NOT EXISTS source_connection_id INTEGER "
+        "REFERENCES connections (connection_id) ON DELETE SET NULL",
+        "ALTER TABLE projects ADD COLUMN IF NOT EXISTS source_db_name VARCHAR(64)",
+        "ALTER TABLE tables ADD COLUMN IF NOT EXISTS source_fingerprint VARCHAR(40)",
+    ]),
+    (4, "index flags and column type size", [
+        "ALTER TABLE indexes ADD COLUMN IF NOT EXISTS is_unique BOOLEAN NOT NULL DEFAULT false",
+        "ALTER TABLE indexes ADD COLUMN IF NOT EXISTS is_primary_key BOOLEAN NOT NULL DEFAULT false",
+        "ALTER TABLE columns ADD COLUMN IF NOT EXISTS char_length INTEGER",
+        "ALTER TABLE columns ADD COLUMN IF NOT EXISTS numeric_precision INTEGER",
+        "ALTER TABLE columns ADD COLUMN IF NOT EXISTS numeric_scale INTEGER",
+    ]),
+]
+
+
+def run_migrations(engine):
+    """Применяет еще не примененные миграции, каждую в своей транзакции."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, description VARCHAR(200), applied_at TIMESTAMP DEFAULT now())"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+    for version, description, statements in MIGRATIONS:
+        if version in applied:
+            continue
+        with engine.begin() as conn:
+            for statement in statements:
+                conn.execute(text(statement))
+            conn.execute(text("INSERT INTO schema_migrations (version, description) VALUES (:v, :d)"),
+                         {"v": version, "d": description})
+        print(f"Применена миграция {version}: {description}")
@@ -14,7 +14,12 @@ class Project(Base):
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
-    user_id = Column(Integer, ForeignKey('user.user_id'), nullable=False)
+    user_id = Column(Integer, ForeignKey('user.user_id'), nullable=False, index=True)
+
+    # Источник импорта (для обновления схемы из живой БД); у созданных вручную проектов пусто
+    source_connection_id = Column(Integer, ForeignKey('connections.connection_id', ondelete='SET NULL'),
+                                  nullable=True)
+    source_db_name = Column(String(64), nullable=True)
 
     user = relationship("User", back_populates="projects")
 
@@ -33,7 +38,7 @@ class Schema(Base):
     schema_id = Column(Integer, primary_key=True)
     schema_name = Column(String(100), nullable=False)
 
-    project_id = Column(Integer, ForeignKey('projects.project_id'), nullable=False)
+    project_id = Column(Integer, ForeignKey('projects.project_id'), nullable=False, index=True)
 
     project = relationship("Project", back_populates="schemas")
     tables = relationship("Table", back_populates="schema", cascade="all, delete-orphan")
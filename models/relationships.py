@@ -10,9 +10,9 @@ class Relationship(Base):
     relationship_id = Column(Integer, primary_key=True)
     constraint_name = Column(String(100), nullable=True)
 
-    project_id = Column(Integer, ForeignKey('projects.project_id'), nullable=False)
-    start_table_id = Column(Integer, ForeignKey('tables.table_id'), nullable=False)
-    end_table_id = Column(Integer, ForeignKey('tables.table_id'), nullable=False)
+    project_id = Column(Integer, ForeignKey('projects.project_id'), nullable=False, index=True)
+    start_table_id = Column(Integer, ForeignKey('tables.table_id'), nullable=False, index=True)
+    end_table_id = Column(Integer, ForeignKey('tables.table_id'), nullable=False, index=True)
 
     project = relationship("Project", back_populates="relationships")
 
@@ -31,8 +31,8 @@ class RelationshipColumn(Base):
     )
 
     relationship_id = Column(Integer, ForeignKey('relationships.relationship_id'))
-    start_column_id = Column(Integer, ForeignKey('columns.column_id'))
-    end_column_id = Column(Integer, ForeignKey('columns.column_id'))
+    start_column_id = Column(Integer, ForeignKey('columns.column_id'), index=True)
+    end_column_id = Column(Integer, ForeignKey('columns.column_id'), index=True)
 
     # V-- ДОБАВЬТЕ ЭТИ ДВА СТОЛБЦА --V
     start_port_side = Column(String(5), nullable=False, server_default='right')  # 'left' or 'right'
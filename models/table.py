@@ -12,7 +12,9 @@ class Table(Base):
     table_id = Column(Integer, primary_key=True)
     table_name = Column(String(100), nullable=False)
     notes = Column(Text, nullable=True)
-    schema_id = Column(Integer, ForeignKey('schemas.schema_id'), nullable=False)
+    schema_id = Column(Integer, ForeignKey('schemas.schema_id'), nullable=False, index=True)
+    # Отпечаток структуры таблицы в источнике импорта; None - таблица создана в приложении
+    source_fingerprint = Column(String(40), nullable=True)
 
     schema = relationship("Schema", back_populates="tables")
     columns = relationship("TableColumn", back_populates="table", cascade="all, delete-orphan")
@@ -32,18 +34,33 @@ class TableColumn(Base):
     is_unique = Column(Boolean, default=False, nullable=False)
     is_nullable = Column(Boolean, default=True, nullable=False)
     default_value = Column(String(255), nullable=True)
-
+    # Размерность типа из источника: VARCHAR(char_length), DECIMAL(numeric_precision, numeric_scale)
+    char_length = Column(Integer, nullable=True)
+    numeric_precision = Column(Integer, nullable=True)
+    numeric_scale = Column(Integer, nullable=True)
 
     col_num = Column(Integer)
-    table_id = Column(Integer, ForeignKey('tables.table_id'), nullable=False)
+    table_id = Column(Integer, ForeignKey('tables.table_id'), nullable=False, index=True)
     table = relationship("Table", back_populates="columns")
 
 
+def column_sort_key(column) -> tuple:
+    """Порядок колонок: по сохраненной позиции col_num; колонки без позиции - в конце, по column_id."""
+    return (column.col_num is None, column.col_num or 0, column.column_id)
+
+
+def column_order_by():
+    """Тот же порядок колонок для ORDER BY."""
+    return (TableColumn.col_num.asc().nulls_last(), TableColumn.column_id)
+
+
 class DbIndex(Base):
     __tablename__ = 'indexes'
     index_id = Column(Integer, primary_key=True)
     index_name = Column(String(100), nullable=False)
-    table_id = Column(Integer, ForeignKey('tables.table_id'), nullable=False)
+    is_unique = Column(Boolean, default=False, nullable=False)
+    is_primary_key = Column(Boolean, default=False, nullable=False)
+    table_id = Column(Integer, ForeignKey('tables.table_id'), nullable=False, index=True)
     table = relationship("Table", back_populates="indexes")
     index_columns = relationship("IndexColumn", back_populates="index", cascade="all, delete-orphan")
 
@@ -52,7 +69,7 @@ class IndexColumn(Base):
     __tablename__ = 'indexColumns'
     __table_args__ = (PrimaryKeyConstraint('index_id', 'column_id'),)
     index_id = Column(Integer, ForeignKey('indexes.index_id'))
-    column_id = Column(Integer, ForeignKey('columns.column_id'))
+    column_id = Column(Integer, ForeignKey('columns.column_id'), index=True)
     order = Column(Integer)
     index = relationship("DbIndex", back_populates="index_columns")
     column = relationship("TableColumn")
\ No newline at end of file
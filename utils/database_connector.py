@@ -1,7 +1,8 @@
 # utils/database_connector.py
-import pymysql
 from typing import List
 
+from utils.mysql_pool import mysql_connections, MySqlConnectionError
+
 
 class DatabaseConnector:
     """Класс для управления подключением к MySQL и получения списка БД."""
@@ -16,18 +17,9 @@ class DatabaseConnector:
         :raises Exception: Если соединение не удалось.
         """
         try:
-            # Попытка подключения к серверу без выбора конкретной БД
-            # Используем local_infile=True для совместимости с некоторыми версиями MySQL/MariaDB
-            self.connection = pymysql.connect(
-                host=host,
-                port=port,
-                user=user,
-                password=password,
-                cursorclass=pymysql.cursors.DictCursor,
-                connect_timeout=5  # Устанавливаем таймаут подключения
-            )
-
-            with self.connection.cursor() as cursor:
+            # Параметры не сохранены в Connection - менеджер закроет соединение сразу после запроса
+            params = {"host": host, "port": port, "user": user, "password": password}
+            with mysql_connections().connection(params) as self.connection, self.connection.cursor() as cursor:
                 # SQL-запрос для получения списка баз данных
                 sql = "SHOW DATABASES;"
                 cursor.execute(sql)
@@ -37,12 +29,10 @@ class DatabaseConnector:
                 db_list = [row['Database'] for row in result]
                 return db_list
 
-        except pymysql.err.OperationalError as e:
+        except MySqlConnectionError as e:
             # Преобразуем ошибку pymysql в более понятное сообщение
             raise Exception(f"Ошибка подключения к базе данных. Проверьте хост, порт, логин и пароль. Детали: {e}")
         except Exception as e:
             raise Exception(f"Произошла непредвиденная ошибка: {e}")
         finally:
-            if self.connection:
-                self.connection.close()
-                self.connection = None
\ No newline at end of file
+            self.connection = None
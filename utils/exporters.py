@@ -1,9 +1,15 @@
 # utils/exporters.py
 
 from models.project import Project
-from models.table import Table, TableColumn, DbIndex
+from models.table import Table, TableColumn, DbIndex, column_sort_key
 from models.relationships import Relationship
 
+# Значения по умолчанию, которые в DDL пишутся без кавычек
+DEFAULT_EXPRESSIONS = ("CURRENT_TIMESTAMP", "CURRENT_TIMESTAMP()", "NOW()", "NULL", "CURRENT_DATE", "CURRENT_TIME")
+# Типы MySQL, у которых размер указывается длиной / точностью и масштабом
+LENGTH_TYPES = ("varchar", "char", "varbinary", "binary")
+PRECISION_TYPES = ("decimal", "numeric")
+
 
 class MySqlExporter:
     """
@@ -33,10 +39,10 @@ class MySqlExporter:
             columns_sql = []
             primary_keys = []
 
-            sorted_columns = sorted(table.columns, key=lambda c: c.column_id)
+            sorted_columns = sorted(table.columns, key=column_sort_key)
 
             for col in sorted_columns:
-                col_def = f"  `{col.column_name}` {self._map_type(col.data_type)}"
+                col_def = f"  `{col.column_name}` {self._column_type(col)}"
 
                 if not col.is_nullable:
                     col_def += " NOT NULL"
@@ -51,7 +57,7 @@ class MySqlExporter:
 
                 default_val = col.default_value
                 if default_val is not None:
-                    if default_val.isnumeric():
+                    if default_val.isnumeric() or default_val.upper() in DEFAULT_EXPRESSIONS:
                         col_def += f" DEFAULT {default_val}"
                     else:
                         escaped_val = default_val.replace("'", "''")
@@ -82,16 +88,18 @@ class MySqlExporter:
             if not rel.relationship_columns:
                 continue
 
-            rel_col = rel.relationship_columns[0]
-
-            start_table = rel_col.start_column.table
-            end_table = rel_col.end_column.table
+            # Составной ключ - несколько пар колонок в одной связи
+            rel_cols = rel.relationship_columns
+            start_table = rel_cols[0].start_column.table
+            end_table = rel_cols[0].end_column.table
+            source_names = ", ".join(f"`{rc.end_column.column_name}`" for rc in rel_cols)
+            target_names = ", ".join(f"`{rc.start_column.column_name}`" for rc in rel_cols)
 
-            target_column = rel_col.start_column
-            if not target_column.is_primary_key and not target_column.is_unique:
+            target_columns = [rc.start_column for rc in rel_cols]
+            if not self._is_unique_key(start_table, target_columns):
                 statements.append(
-                    f"-- ПРЕДУПРЕЖДЕНИЕ: Невозможно создать FK, так как целевая колонка `{start_table.table_name}`.`{target_column.column_name}` не является UNIQUE или PRIMARY KEY.\n"
-                    f"-- ALTER TABLE `{end_table.table_name}` ADD CONSTRAINT `fk_{end_table.table_name}_{start_table.table_name}` FOREIGN KEY (`{rel_col.end_column.column_name}`) REFERENCES `{start_table.table_name}` (`{target_column.column_name}`);\n"
+                    f"-- ПРЕДУПРЕЖДЕНИЕ: Невозможно создать FK, так как целевые колонки `{start_table.table_name}` ({target_names}) не являются UNIQUE или PRIMARY KEY.\n"
+                    f"-- ALTER TABLE `{end_table.table_name}` ADD CONSTRAINT `fk_{end_table.table_name}_{start_table.table_name}` FOREIGN KEY ({source_names}) REFERENCES `{start_table.table_name}` ({target_names});\n"
                 )
                 continue
 
@@ -100,13 +108,33 @@ class MySqlExporter:
             sql = (
                 f"ALTER TABLE `{end_table.table_name}` "
                 f"ADD CONSTRAINT `{constraint_name}` "
-                f"FOREIGN KEY (`{rel_col.end_column.column_name}`) "
-                f"REFERENCES `{start_table.table_name}` (`{target_column.column_name}`);"
+                f"FOREIGN KEY ({source_names}) "
+                f"REFERENCES `{start_table.table_name}` ({target_names});"
             )
             statements.append(sql)
 
         return "\n".join(statements)
 
+    @staticmethod
+    def _is_unique_key(table: Table, columns: list[TableColumn]) -> bool:
+        """Колонки образуют первичный ключ, UNIQUE-колонку или уникальный индекс таблицы."""
+        column_ids = {col.column_id for col in columns}
+        if len(columns) == 1 and (columns[0].is_primary_key or columns[0].is_unique):
+            return True
+        if column_ids == {col.column_id for col in table.columns if col.is_primary_key}:
+            return True
+        return any(index.is_unique and column_ids == {ic.column_id for ic in index.index_columns}
+                   for index in table.indexes)
+
+    def _column_type(self, col: TableColumn) -> str:
+        """Тип колонки с размером, если он известен из источника."""
+        base_type = col.data_type.lower()
+        if base_type in LENGTH_TYPES and col.char_length:
+            return f"{base_type.upper()}({col.char_length})"
+        if base_type in PRECISION_TYPES and col.numeric_precision:
+            return f"{base_type.upper()}({col.numeric_precision},{col.numeric_scale or 0})"
+        return self._map_type(col.data_type)
+
     def _map_type(self, internal_type: str) -> str:
         if 'varchar' in internal_type:
             return "VARCHAR(255)"
@@ -0,0 +1,186 @@
+# utils/mysql_pool.py
+
+import atexit
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+
+# Сколько простаивающих соединений хранится на одно подключение (Connection)
+MYSQL_POOL_SIZE = int(os.getenv("MYSQL_POOL_SIZE", "4"))
+# Простаивающее дольше (сек) соединение закрывается
+MYSQL_IDLE_TIMEOUT_S = float(os.getenv("MYSQL_IDLE_TIMEOUT_S", "300"))
+# Соединение, простоявшее дольше (сек), перед выдачей проверяется ping-ом
+MYSQL_PING_AFTER_S = float(os.getenv("MYSQL_PING_AFTER_S", "10"))
+MYSQL_CONNECT_TIMEOUT_S = 5
+
+
+class MySqlConnectionError(Exception):
+    """Не удалось подключиться к серверу MySQL."""
+
+
+class _Pool:
+    """Простаивающие соединения одного подключения: [(соединение, время возврата)], последнее - самое свежее."""
+    __slots__ = ('params', 'idle')
+
+    def __init__(self, params: tuple):
+        self.params = params
+        self.idle = []
+
+
+def _connection_params(connection_obj) -> tuple:
+    """(host, port, user, password) из сохраненного Connection или словаря формы подключения."""
+    if isinstance(connection_obj, dict):
+        return (connection_obj['host'], int(connection_obj['port']),
+                connection_obj['user'], connection_obj.get('password'))
+    return (connection_obj.host, int(connection_obj.port),
+            connection_obj.db_username, connection_obj.db_password_hash)
+
+
+def _open(params: tuple):
+    # autocommit: повторно выданное соединение не должно держать снимок данных прошлого владельца
+    host, port, user, password = params
+    try:
+        return pymysql.connect(host=host, port=port, user=user, password=password or "",
+                               cursorclass=pymysql.cursors.DictCursor, autocommit=True,
+                               connect_timeout=MYSQL_CONNECT_TIMEOUT_S)
+    except pymysql.err.OperationalError as e:
+        raise MySqlConnectionError(f"Ошибка подключения к серверу {host}:{port}: {e}") from e
+
+
+def _close(conn):
+    try:
+        conn.close()
+    except Exception:
+        pass  # соединение уже разорвано
+
+
+class MySqlConnectionManager:
+    """
+    Соединения с серверами MySQL, переиспользуемые между просмотром списка БД,
+    сверкой отпечатков и импортом, чтобы не платить за TLS/авторизацию каждый раз.
+
+        with mysql_connections().connection(connection, db_name) as conn:
+            ...
+
+    Пул ведется по Connection.connection_id и живет до конца процесса. Параметры
+    сверяются при каждой выдаче и возврате: после смены хоста/логина/пароля старые
+    соединения не выдаются и закрываются, а простаивающие соединения удаленного
+    подключения закрываются по MYSQL_IDLE_TIMEOUT_S или при выходе.
+    Соединение, на котором выполнение прервалось исключением (или брошен незавершенный
+    небуферизованный запрос), в пул не возвращается, а закрывается. Несохраненные
+    параметры (словарь формы подключения) пулом не обслуживаются - соединение
+    закрывается сразу после использования.
+    """
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "MySqlConnectionManager":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, pool_size: int = MYSQL_POOL_SIZE, idle_timeout_s: float = MYSQL_IDLE_TIMEOUT_S):
+        self.pool_size = pool_size
+        self.idle_timeout_s = idle_timeout_s
+        self._lock = threading.Lock()
+        self._pools = {}    # connection_id -> _Pool
+        self.stats = {"opened": 0, "reused": 0, "closed": 0}
+
+    @contextmanager
+    def connection(self, connection_obj, db_name: str = None):
+        """Выдает соединение (с выбранной БД db_name, если задана) и гарантированно возвращает или закрывает его."""
+        params = _connection_params(connection_obj)
+        key = None if isinstance(connection_obj, dict) else connection_obj.connection_id
+        conn = self._checkout(key, params)
+        try:
+            if db_name:
+                conn.select_db(db_name)
+            yield conn
+        except BaseException:
+            self._discard(conn)
+            raise
+        else:
+            self._checkin(key, params, conn)
+
+    def _checkout(self, key, params: tuple):
+        while key is not None:
+            with self._lock:
+                self._reap_locked()
+                pool = self._pools.get(key)
+                if pool is None or pool.params != params or not pool.idle:
+                    break
+                conn, returned_at = pool.idle.pop()
+            if time.monotonic() - returned_at < MYSQL_PING_AFTER_S or self._is_alive(conn):
+                with self._lock:
+                    self.stats["reused"] += 1
+                return conn
+            self._discard(conn)
+        conn = _open(params)
+        with self._lock:
+            self.stats["opened"] += 1
+        return conn
+
+    def _checkin(self, key, params: tuple, conn):
+        if key is None:
+            self._discard(conn)
+            return
+        stale = []
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None or pool.params != params:
+                # Параметры подключения изменились - старые соединения больше не нужны
+                if pool is not None:
+                    stale = [c for c, _ in pool.idle]
+                pool = self._pools[key] = _Pool(params)
+            if len(pool.idle) < self.pool_size:
+                pool.idle.append((conn, time.monotonic()))
+                conn = None
+            self.stats["closed"] += len(stale)
+        for old in stale:
+            _close(old)
+        if conn is not None:
+            self._discard(conn)
+
+    @staticmethod
+    def _is_alive(conn) -> bool:
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        _close(conn)
+        with self._lock:
+            self.stats["closed"] += 1
+
+    def _reap_locked(self):
+        """Закрывает соединения, простоявшие дольше idle_timeout_s (вызывается под блокировкой)."""
+        deadline = time.monotonic() - self.idle_timeout_s
+        for pool in self._pools.values():
+            expired = [conn for conn, returned_at in pool.idle if returned_at < deadline]
+            if expired:
+                pool.idle = [(conn, t) for conn, t in pool.idle if t >= deadline]
+                self.stats["closed"] += len(expired)
+                for conn in expired:
+                    _close(conn)
+
+    def close_all(self):
+        with self._lock:
+            idle = [conn for pool in self._pools.values() for conn, _ in pool.idle]
+            self._pools.clear()
+            self.stats["closed"] += len(idle)
+        for conn in idle:
+            _close(conn)
+
+
+def mysql_connections() -> MySqlConnectionManager:
+    return MySqlConnectionManager.instance()
+
+
+# Простаивающие соединения закрываются при выходе из приложения
+atexit.register(lambda: MySqlConnectionManager._instance and MySqlConnectionManager._instance.close_all())
@@ -1,19 +1,15 @@
 # utils/schema_inspector.py
 
+import hashlib
 import pymysql
 from typing import List, Dict, Any
 from models.user import Connection
+from utils.mysql_pool import mysql_connections, MySqlConnectionError
 
 def list_databases_on_server(connection_obj: Connection) -> (List[str] | None, str | None):
     """Подключается к серверу MySQL и возвращает список баз данных."""
     try:
-        password = connection_obj.db_password_hash
-        conn = pymysql.connect(
-            host=connection_obj.host, port=connection_obj.port,
-            user=connection_obj.db_username, password=password,
-            cursorclass=pymysql.cursors.DictCursor, connect_timeout=5
-        )
-        with conn.cursor() as cursor:
+        with mysql_connections().connection(connection_obj) as conn, conn.cursor() as cursor:
             cursor.execute("SHOW DATABASES;")
             # Исключаем системные базы данных из списка
             system_dbs = ['information_schema', 'mysql', 'performance_schema', 'sys']
@@ -22,70 +18,100 @@ def list_databases_on_server(connection_obj: Connection) -> (List[str] | None, s
     except Exception as e:
         return None, f"Не удалось получить список БД: {e}"
 
-def inspect_mysql_database(connection_obj: Connection, db_name: str) -> (dict | None, str | None):
-    """Принимает объект Connection и ИМЯ БД, создает инспектор и возвращает структуру."""
+def _create_inspector(connection_obj: Connection, db_name: str) -> "SchemaInspector":
+    return SchemaInspector(connection_obj, db_name)
+
+def inspect_mysql_database(connection_obj: Connection, db_name: str,
+                           table_names=None) -> (dict | None, str | None):
+    """
+    Принимает объект Connection и ИМЯ БД, создает инспектор и возвращает структуру:
+    {'tables': [{'name', 'columns', 'indexes', 'foreign_keys', 'primary_key', 'fingerprint'}]}.
+    table_names - необязательный набор таблиц: читаются только они (повторная синхронизация).
+    """
+    try:
+        return {'tables': list(iter_mysql_database(connection_obj, db_name, table_names))}, None
+    except Exception as e:
+        return None, str(e)
+
+def iter_mysql_database(connection_obj: Connection, db_name: str, table_names=None, on_count=None):
+    """
+    Потоковый вариант inspect_mysql_database: генератор записей таблиц в том же формате,
+    по одной, в порядке имен. В памяти держатся колонки только текущей таблицы.
+    on_count(число таблиц) вызывается до первой записи. Ошибки выбрасываются исключением.
+    """
+    yield from _create_inspector(connection_obj, db_name).iter_tables(table_names, on_count)
+
+def fingerprint_mysql_database(connection_obj: Connection, db_name: str) -> (Dict[str, str] | None, str | None):
+    """Возвращает отпечатки структуры всех таблиц БД {имя таблицы: отпечаток}, не читая их колонки."""
     try:
-        password = connection_obj.db_password_hash
-        inspector = SchemaInspector(
-            host=connection_obj.host, port=connection_obj.port, user=connection_obj.db_username,
-            password=password, db_name=db_name
-        )
-        raw_data = inspector.inspect_schema()
-        schema_data = {'tables': []}
-        for table_name in raw_data.get('tables', []):
-            table_info = {
-                'name': table_name,
-                'columns': raw_data.get('columns', {}).get(table_name, []),
-                'foreign_keys': [fk for fk in raw_data.get('foreign_keys', []) if fk.get('source_table') == table_name]
-            }
-            primary_keys = [col['name'] for col in table_info['columns'] if col.get('is_pk')]
-            table_info['primary_key'] = primary_keys
-            schema_data['tables'].append(table_info)
-        return schema_data, None
+        inspector = _create_inspector(connection_obj, db_name)
+        with inspector._connect() as inspector.connection:
+            return inspector.fetch_fingerprints(), None
     except Exception as e:
         return None, str(e)
 
 def test_mysql_connection(data: dict) -> (bool, str):
     """Проверяет, можно ли установить соединение с СЕРВЕРОМ MySQL (без выбора БД)."""
     try:
-        pymysql.connect(
-            host=data['host'], port=data['port'], user=data['user'],
-            password=data['password'], connect_timeout=5
-        )
-        return True, "Соединение с сервером успешно установлено!"
-    except pymysql.err.OperationalError as e:
+        # Несохраненные параметры: соединение не попадает в пул и закрывается сразу
+        with mysql_connections().connection(data):
+            return True, "Соединение с сервером успешно установлено!"
+    except MySqlConnectionError as e:
         return False, f"Ошибка подключения: Неверные данные или сервер недоступен.\n({e})"
     except Exception as e:
         return False, f"Произошла непредвиденная ошибка: {e}"
 
 
 class SchemaInspector:
-    # ... (Этот класс остается без изменений, как в вашем файле)
-    def __init__(self, host: str, port: int, user: str, password: str, db_name: str):
-        self.host = host; self.port = port; self.user = user; self.password = password;
+    def __init__(self, connection_obj: Connection, db_name: str):
+        self.connection_obj = connection_obj
         self.db_name = db_name; self.connection = None
     def _connect(self):
-        try:
-            self.connection = pymysql.connect(
-                host=self.host, port=self.port, user=self.user, password=self.password,
-                database=self.db_name, cursorclass=pymysql.cursors.DictCursor, connect_timeout=5)
-        except pymysql.err.OperationalError as e:
-            raise Exception(f"Ошибка подключения к БД '{self.db_name}': {e}")
-    def inspect_schema(self) -> Dict[str, Any]:
-        self._connect();
-        if not self.connection: return {}
-        try:
+        """Соединение из пула (контекстный менеджер): по выходе возвращается в пул или закрывается."""
+        return mysql_connections().connection(self.connection_obj, self.db_name)
+    def iter_tables(self, table_names=None, on_count=None):
+        """
+        Читает структуру фиксированным числом запросов к information_schema (независимо от
+        числа таблиц). Индексы и внешние ключи заранее группируются в словари по таблицам,
+        а колонки - самая объемная часть - читаются небуферизованным курсором (SSDictCursor)
+        и отдаются по таблице за раз.
+        """
+        # Брошенный посреди чтения генератор завершает блок исключением GeneratorExit -
+        # соединение с недочитанным небуферизованным запросом закрывается, а не уходит в пул
+        with self._connect() as self.connection:
             tables = self._fetch_tables()
-            columns = self._fetch_columns()
-            foreign_keys = self._fetch_foreign_keys()
-            for fk in foreign_keys:
-                src_table = fk['source_table']; src_column = fk['source_column']
-                if src_table in columns:
-                    for col in columns[src_table]:
-                        if col['name'] == src_column: col['is_fk'] = True
-            return {'tables': tables, 'columns': columns, 'foreign_keys': foreign_keys}
-        finally:
-            if self.connection: self.connection.close()
+            if table_names is not None:
+                wanted = set(table_names); tables = [t for t in tables if t in wanted]
+            if on_count: on_count(len(tables))
+            if not tables: return
+            subset = tables if table_names is not None else None
+            fingerprints = self.fetch_fingerprints(subset)
+            constraints = self._fetch_constraints(subset)
+            indexes = self._fetch_indexes(subset, constraints)
+            foreign_keys = self._fetch_foreign_keys(subset)
+            for table_name, columns in self._stream_columns(subset):
+                yield self._table_info(table_name, columns, indexes.pop(table_name, []),
+                                       foreign_keys.pop(table_name, []), fingerprints.pop(table_name, None),
+                                       constraints['UNIQUE'])
+    @staticmethod
+    def _table_info(table_name: str, columns: List[Dict], indexes: List[Dict], foreign_keys: List[Dict],
+                    fingerprint: str | None, unique_constraints: set) -> Dict[str, Any]:
+        by_name = {col['name']: col for col in columns}
+        # Колонка с собственным UNIQUE-ограничением отмечается флагом, а не отдельным индексом -
+        # так же уникальность колонки задается в редакторе таблицы
+        table_indexes = []
+        for index in indexes:
+            if index['primary']: continue
+            if index['unique'] and len(index['columns']) == 1 and (table_name, index['name']) in unique_constraints \
+                    and index['columns'][0] in by_name:
+                by_name[index['columns'][0]]['is_unique'] = True
+                continue
+            table_indexes.append(index)
+        for fk in foreign_keys:
+            for source_column, _ in fk['columns']:
+                if source_column in by_name: by_name[source_column]['is_fk'] = True
+        return {'name': table_name, 'columns': columns, 'indexes': table_indexes, 'foreign_keys': foreign_keys,
+                'fingerprint': fingerprint, 'primary_key': [col['name'] for col in columns if col['is_pk']]}
     def _fetch_tables(self) -> List[str]:
         with self.connection.cursor() as cursor:
             cursor.execute("SHOW TABLES;");
@@ -93,22 +119,101 @@ class SchemaInspector:
                 table_key = list(cursor.fetchone().keys())[0]; cursor.scroll(0)
                 return [row[table_key] for row in cursor.fetchall()]
             return []
-    def _fetch_columns(self) -> Dict[str, List[Dict]]:
-        columns_data = {}
+    @staticmethod
+    def _table_filter(table_names, alias: str = "") -> (str, tuple):
+        """Условие 'AND TABLE_NAME IN (...)' для выборки из information_schema по части таблиц."""
+        if table_names is None: return "", ()
+        return f" AND {alias}TABLE_NAME IN %s", (tuple(table_names),)
+    def fetch_fingerprints(self, table_names=None) -> Dict[str, str]:
+        """
+        Отпечаток таблицы: CREATE_TIME (меняется при перестройке таблицы ALTER-ом) и контрольные
+        суммы колонок, индексов и внешних ключей, посчитанные сервером. Сами колонки по сети не передаются.
+        """
+        where, params = self._table_filter(table_names)
+        checksum_queries = [
+            "SELECT TABLE_NAME, MD5(GROUP_CONCAT(CONCAT_WS(':', COLUMN_NAME, COLUMN_TYPE, IS_NULLABLE, COLUMN_KEY, IFNULL(COLUMN_DEFAULT, '')) ORDER BY ORDINAL_POSITION SEPARATOR '|')) AS checksum FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s" + where + " GROUP BY TABLE_NAME;",
+            "SELECT TABLE_NAME, MD5(GROUP_CONCAT(CONCAT_WS(':', INDEX_NAME, NON_UNIQUE, COLUMN_NAME) ORDER BY INDEX_NAME, SEQ_IN_INDEX SEPARATOR '|')) AS checksum FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = %s" + where + " GROUP BY TABLE_NAME;",
+            "SELECT TABLE_NAME, MD5(GROUP_CONCAT(CONCAT_WS(':', CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME) ORDER BY CONSTRAINT_NAME, ORDINAL_POSITION SEPARATOR '|')) AS checksum FROM information_schema.KEY_COLUMN_USAGE WHERE TABLE_SCHEMA = %s AND REFERENCED_TABLE_NAME IS NOT NULL" + where + " GROUP BY TABLE_NAME;",
+        ]
+        parts = {}
+        with self.connection.cursor() as cursor:
+            cursor.execute("SET SESSION group_concat_max_len = 16777216;")
+            cursor.execute("SELECT TABLE_NAME, CREATE_TIME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s" + where + ";", (self.db_name, *params))
+            for row in cursor.fetchall(): parts[row['TABLE_NAME']] = [str(row['CREATE_TIME'])] + [''] * len(checksum_queries)
+            for i, sql in enumerate(checksum_queries, start=1):
+                cursor.execute(sql, (self.db_name, *params))
+                for row in cursor.fetchall():
+                    if row['TABLE_NAME'] in parts: parts[row['TABLE_NAME']][i] = row['checksum']
+        return {name: hashlib.sha1("|".join(p).encode('utf-8')).hexdigest() for name, p in parts.items()}
+    def _stream_columns(self, table_names=None):
+        """Генератор (имя таблицы, [колонки]) по порядку имен; строки читаются с сервера по мере обхода."""
+        where, params = self._table_filter(table_names)
+        sql = "SELECT TABLE_NAME, COLUMN_NAME, ORDINAL_POSITION, DATA_TYPE, IS_NULLABLE, COLUMN_KEY, COLUMN_DEFAULT, CHARACTER_MAXIMUM_LENGTH, NUMERIC_PRECISION, NUMERIC_SCALE FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s" + where + " ORDER BY TABLE_NAME, ORDINAL_POSITION;"
+        cursor = self.connection.cursor(pymysql.cursors.SSDictCursor)
+        cursor.execute(sql, (self.db_name, *params))
+        table_name, columns = None, []
+        for row in cursor:
+            if row['TABLE_NAME'] != table_name:
+                if columns: yield table_name, columns
+                table_name, columns = row['TABLE_NAME'], []
+            columns.append({
+                'name': row['COLUMN_NAME'], 'type': row['DATA_TYPE'], 'position': row['ORDINAL_POSITION'],
+                'nullable': row['IS_NULLABLE'] == 'YES', 'not_null': row['IS_NULLABLE'] == 'NO',
+                'is_pk': row['COLUMN_KEY'] == 'PRI', 'is_fk': False, 'is_unique': False,
+                'default': row['COLUMN_DEFAULT'], 'length': row['CHARACTER_MAXIMUM_LENGTH'],
+                'precision': row['NUMERIC_PRECISION'], 'scale': row['NUMERIC_SCALE'] })
+        if columns: yield table_name, columns
+        cursor.close()
+    def _fetch_constraints(self, table_names=None) -> Dict[str, set]:
+        """{тип ограничения: {(таблица, имя ограничения)}} для PRIMARY KEY, UNIQUE и FOREIGN KEY."""
+        constraints = {'PRIMARY KEY': set(), 'UNIQUE': set(), 'FOREIGN KEY': set()}
+        where, params = self._table_filter(table_names)
         with self.connection.cursor() as cursor:
-            sql = "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, IS_NULLABLE, COLUMN_KEY FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s ORDER BY TABLE_NAME, ORDINAL_POSITION;"
-            cursor.execute(sql, (self.db_name,))
+            sql = "SELECT TABLE_NAME, CONSTRAINT_NAME, CONSTRAINT_TYPE FROM information_schema.TABLE_CONSTRAINTS WHERE TABLE_SCHEMA = %s" + where + ";"
+            cursor.execute(sql, (self.db_name, *params))
             for row in cursor.fetchall():
-                table_name = row['TABLE_NAME']
-                col_info = {
-                    'name': row['COLUMN_NAME'], 'type': row['DATA_TYPE'],
-                    'nullable': row['IS_NULLABLE'] == 'YES', 'not_null': row['IS_NULLABLE'] == 'NO',
-                    'is_pk': row['COLUMN_KEY'] == 'PRI', 'is_fk': False }
-                if table_name not in columns_data: columns_data[table_name] = []
-                columns_data[table_name].append(col_info)
-        return columns_data
-    def _fetch_foreign_keys(self) -> List[Dict]:
+                constraints.setdefault(row['CONSTRAINT_TYPE'], set()).add((row['TABLE_NAME'], row['CONSTRAINT_NAME']))
+        return constraints
+    def _fetch_indexes(self, table_names, constraints: Dict[str, set]) -> Dict[str, List[Dict]]:
+        """Индексы таблиц: {таблица: [{'name', 'unique', 'primary', 'columns': [имена по порядку]}]}."""
+        indexes = {}
+        where, params = self._table_filter(table_names)
         with self.connection.cursor() as cursor:
-            sql = "SELECT kcu.CONSTRAINT_NAME, kcu.TABLE_NAME AS source_table, kcu.COLUMN_NAME AS source_column, kcu.REFERENCED_TABLE_NAME AS target_table, kcu.REFERENCED_COLUMN_NAME AS target_column FROM information_schema.KEY_COLUMN_USAGE AS kcu WHERE kcu.TABLE_SCHEMA = %s AND kcu.REFERENCED_TABLE_NAME IS NOT NULL;"
-            cursor.execute(sql, (self.db_name,))
-            return cursor.fetchall()
\ No newline at end of file
+            sql = "SELECT TABLE_NAME, INDEX_NAME, NON_UNIQUE, SEQ_IN_INDEX, COLUMN_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = %s" + where + " ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX;"
+            cursor.execute(sql, (self.db_name, *params))
+            current = None
+            for row in cursor.fetchall():
+                key = (row['TABLE_NAME'], row['INDEX_NAME'])
+                if current is None or current[0] != key:
+                    index = {'name': row['INDEX_NAME'], 'unique': not int(row['NON_UNIQUE']),
+                             'primary': key in constraints['PRIMARY KEY'] or row['INDEX_NAME'] == 'PRIMARY',
+                             'columns': []}
+                    indexes.setdefault(row['TABLE_NAME'], []).append(index)
+                    current = (key, index)
+                # COLUMN_NAME пуст у функциональных индексов - такие части пропускаем
+                if row['COLUMN_NAME']: current[1]['columns'].append(row['COLUMN_NAME'])
+        for table_name in indexes:
+            indexes[table_name] = [i for i in indexes[table_name] if i['columns']]
+        return indexes
+    def _fetch_foreign_keys(self, table_names=None) -> Dict[str, List[Dict]]:
+        """
+        Внешние ключи, сгруппированные по ограничению (составные - одной записью):
+        {дочерняя таблица: [{'CONSTRAINT_NAME', 'source_table', 'target_table', 'columns': [(source, target)],
+        'source_column', 'target_column'}]}, где source_column/target_column - первая пара.
+        """
+        foreign_keys = {}
+        where, params = self._table_filter(table_names, alias="kcu.")
+        with self.connection.cursor() as cursor:
+            sql = "SELECT kcu.CONSTRAINT_NAME, kcu.TABLE_NAME AS source_table, kcu.COLUMN_NAME AS source_column, kcu.REFERENCED_TABLE_NAME AS target_table, kcu.REFERENCED_COLUMN_NAME AS target_column FROM information_schema.KEY_COLUMN_USAGE AS kcu WHERE kcu.TABLE_SCHEMA = %s AND kcu.REFERENCED_TABLE_NAME IS NOT NULL" + where + " ORDER BY kcu.TABLE_NAME, kcu.CONSTRAINT_NAME, kcu.ORDINAL_POSITION;"
+            cursor.execute(sql, (self.db_name, *params))
+            current = None
+            for row in cursor.fetchall():
+                key = (row['source_table'], row['CONSTRAINT_NAME'])
+                if current is None or current[0] != key:
+                    fk = {'CONSTRAINT_NAME': row['CONSTRAINT_NAME'], 'source_table': row['source_table'],
+                          'target_table': row['target_table'], 'source_column': row['source_column'],
+                          'target_column': row['target_column'], 'columns': []}
+                    foreign_keys.setdefault(row['source_table'], []).append(fk)
+                    current = (key, fk)
+                current[1]['columns'].append((row['source_column'], row['target_column']))
+        return foreign_keys
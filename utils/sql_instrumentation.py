@@ -0,0 +1,201 @@
+# utils/sql_instrumentation.py
+
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from logging.handlers import RotatingFileHandler
+
+from sqlalchemy import event
+
+# Запрос медленнее этого порога (мс) пишется в журнал медленных запросов
+SLOW_QUERY_MS = float(os.getenv("SQL_SLOW_QUERY_MS", "200"))
+# Одна и та же форма запроса, повторенная больше N раз за действие, - признак N+1
+N_PLUS_ONE_THRESHOLD = int(os.getenv("SQL_N_PLUS_ONE_THRESHOLD", "10"))
+SLOW_LOG_PATH = os.getenv("SQL_SLOW_LOG_PATH", os.path.join("logs", "slow_queries.log"))
+SLOW_LOG_MAX_BYTES = 1024 * 1024
+SLOW_LOG_BACKUPS = 3
+# Сколько последних предупреждений N+1 хранить
+MAX_N_PLUS_ONE_WARNINGS = 50
+
+# Имена действий, которыми помечаются запросы
+ACTION_DIAGRAM_LOAD = "Загрузка диаграммы"
+ACTION_TABLE_EDIT = "Редактирование таблицы"
+ACTION_EXPORT = "Экспорт SQL"
+ACTION_IMPORT = "Импорт из MySQL"
+ACTION_REFRESH_SOURCE = "Обновление из источника"
+NO_ACTION = "Вне действий"
+
+_PARAM_RE = re.compile(r"%\(\w+\)s|%s")
+_NUMBER_RE = re.compile(r"\b\d+(\.\d+)?\b")
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_PARAM_LIST_RE = re.compile(r"\(\s*\?(\s*,\s*\?)+\s*\)")
+_SPACES_RE = re.compile(r"\s+")
+
+_current_run: ContextVar = ContextVar("sql_ui_action", default=None)
+
+
+def statement_shape(statement: str) -> str:
+    """Форма запроса: литералы и параметры заменены на '?', списки IN схлопнуты."""
+    shape = _STRING_RE.sub("?", statement)
+    shape = _PARAM_RE.sub("?", shape)
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _PARAM_LIST_RE.sub("(?...)", shape)
+    return _SPACES_RE.sub(" ", shape).strip()
+
+
+class _ActionRun:
+    """Запросы одного выполнения действия пользователя."""
+    __slots__ = ('name', 'queries', 'total_ms', 'max_ms', 'slow', 'shapes')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.queries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.shapes = Counter()
+
+
+class QueryStats:
+    """
+    Сводка запросов по действиям пользователя: сколько запусков, запросов,
+    общее и максимальное время, медленные запросы и найденные N+1.
+    Пополняется из любых потоков.
+    """
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "QueryStats":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.actions = {}
+        self.n_plus_one = deque(maxlen=MAX_N_PLUS_ONE_WARNINGS)
+        self._slow_logger = None
+
+    def reset(self):
+        with self._lock:
+            self.actions.clear()
+            self.n_plus_one.clear()
+
+    def _action_entry(self, name: str) -> dict:
+        entry = self.actions.get(name)
+        if entry is None:
+            entry = {"runs": 0, "queries": 0, "total_ms": 0.0, "max_ms": 0.0,
+                     "max_queries_per_run": 0, "slow": 0}
+            self.actions[name] = entry
+        return entry
+
+    def record_query(self, run: _ActionRun | None, statement: str, elapsed_ms: float):
+        slow = elapsed_ms >= SLOW_QUERY_MS
+        if run is not None:
+            # Выполнение действия принадлежит одному потоку - блокировка не нужна
+            run.queries += 1
+            run.total_ms += elapsed_ms
+            run.max_ms = max(run.max_ms, elapsed_ms)
+            run.shapes[statement_shape(statement)] += 1
+            if slow:
+                run.slow += 1
+        else:
+            with self._lock:
+                entry = self._action_entry(NO_ACTION)
+                entry["queries"] += 1
+                entry["total_ms"] += elapsed_ms
+                entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+                if slow:
+                    entry["slow"] += 1
+        if slow:
+            self._log_slow(run.name if run else NO_ACTION, statement, elapsed_ms)
+
+    def finish_run(self, run: _ActionRun):
+        with self._lock:
+            entry = self._action_entry(run.name)
+            entry["runs"] += 1
+            entry["queries"] += run.queries
+            entry["total_ms"] += run.total_ms
+            entry["max_ms"] = max(entry["max_ms"], run.max_ms)
+            entry["max_queries_per_run"] = max(entry["max_queries_per_run"], run.queries)
+            entry["slow"] += run.slow
+            for shape, count in run.shapes.items():
+                if count > N_PLUS_ONE_THRESHOLD:
+                    self.n_plus_one.append({
+                        "timestamp": time.strftime("%H:%M:%S"),
+                        "action": run.name, "count": count, "shape": shape,
+                    })
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "actions": {name: dict(entry) for name, entry in self.actions.items()},
+                "n_plus_one": list(self.n_plus_one),
+            }
+
+    def _log_slow(self, action: str, statement: str, elapsed_ms: float):
+        if self._slow_logger is None:
+            self._slow_logger = _create_slow_logger()
+        self._slow_logger.warning("%.1f ms [%s] %s", elapsed_ms, action, _SPACES_RE.sub(" ", statement).strip())
+
+
+def _create_slow_logger() -> logging.Logger:
+    logger = logging.getLogger("visual_db.slow_sql")
+    logger.propagate = False
+    if not logger.handlers:
+        try:
+            os.makedirs(os.path.dirname(SLOW_LOG_PATH) or ".", exist_ok=True)
+            handler = RotatingFileHandler(SLOW_LOG_PATH, maxBytes=SLOW_LOG_MAX_BYTES,
+                                          backupCount=SLOW_LOG_BACKUPS, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+        except OSError as e:
+            print(f"Не удалось открыть журнал медленных запросов: {e}")
+            handler = logging.NullHandler()
+        logger.addHandler(handler)
+    return logger
+
+
+@contextmanager
+def ui_action(name: str):
+    """
+    Помечает все запросы внутри блока именем действия пользователя.
+    Метка действует в текущем потоке; вложенные действия учитываются во внешнем.
+    """
+    if _current_run.get() is not None:
+        yield
+        return
+    run = _ActionRun(name)
+    token = _current_run.set(run)
+    try:
+        yield
+    finally:
+        _current_run.reset(token)
+        QueryStats.instance().finish_run(run)
+
+
+def install_query_hooks(engine):
+    """Подключает учет запросов к событиям движка."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("query_start_time")
+        if not starts:
+            return
+        elapsed_ms = (time.perf_counter() - starts.pop()) * 1000
+        QueryStats.instance().record_query(_current_run.get(), statement, elapsed_ms)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("query_start_time"):
+            conn.info["query_start_time"].pop()
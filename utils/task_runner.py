@@ -0,0 +1,130 @@
+# utils/task_runner.py
+
+import inspect
+import threading
+import traceback
+
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from utils.sql_instrumentation import ui_action
+
+# Сколько контроллерных задач может выполняться одновременно
+MAX_TASK_THREADS = 4
+
+
+class TaskCancelled(Exception):
+    """Выбрасывается задачей, заметившей отмену через CancelToken."""
+
+
+class CancelToken:
+    """Флаг кооперативной отмены; задача сама проверяет его между шагами."""
+
+    def __init__(self):
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise TaskCancelled()
+
+
+class TaskSignals(QObject):
+    # Сигналы живут в GUI-потоке, поэтому слоты вызываются в нем же
+    finished = Signal(object)
+    failed = Signal(str)
+    progress = Signal(int, int, str)  # сделано, всего, сообщение
+    cancelled = Signal()
+
+
+class TaskHandle(QRunnable):
+    """
+    Задача для пула потоков. Функция выполняется вне GUI-потока и сама открывает
+    себе сессии (как и любой метод контроллера). Если функция принимает аргументы
+    progress и/или cancel_token, они передаются ей автоматически.
+    action - имя действия пользователя, которым помечаются SQL-запросы задачи.
+    """
+
+    def __init__(self, fn, *args, action: str = None, **kwargs):
+        super().__init__()
+        self.setAutoDelete(False)
+        self.fn, self.args, self.kwargs = fn, args, kwargs
+        self.action = action
+        self.signals = TaskSignals()
+        self.token = CancelToken()
+
+        params = inspect.signature(fn).parameters
+        if 'progress' in params:
+            self.kwargs['progress'] = self._report_progress
+        if 'cancel_token' in params:
+            self.kwargs['cancel_token'] = self.token
+
+    def cancel(self):
+        """Просит задачу остановиться; ее результат в любом случае больше не доставляется."""
+        self.token.cancel()
+
+    def _report_progress(self, done: int, total: int, message: str = ""):
+        if not self.token.cancelled:
+            self.signals.progress.emit(done, total, message)
+
+    def _call(self):
+        if self.action is None:
+            return self.fn(*self.args, **self.kwargs)
+        with ui_action(self.action):
+            return self.fn(*self.args, **self.kwargs)
+
+    def run(self):
+        try:
+            result = self._call()
+        except TaskCancelled:
+            self.signals.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            if self.token.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.failed.emit(str(e))
+        else:
+            if self.token.cancelled:
+                self.signals.cancelled.emit()
+            else:
+                self.signals.finished.emit(result)
+
+
+class TaskRunner:
+    """Общий пул потоков для долгих вызовов контроллеров и инспектора схем."""
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "TaskRunner":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, max_threads: int = MAX_TASK_THREADS):
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        # Держим ссылки на задачи до завершения, иначе их сигналы может собрать GC
+        self._active = set()
+
+    def submit(self, fn, *args, on_result=None, on_error=None, on_progress=None, on_cancel=None,
+               action: str = None, **kwargs) -> TaskHandle:
+        task = TaskHandle(fn, *args, action=action, **kwargs)
+        if on_result: task.signals.finished.connect(on_result)
+        if on_error: task.signals.failed.connect(on_error)
+        if on_progress: task.signals.progress.connect(on_progress)
+        if on_cancel: task.signals.cancelled.connect(on_cancel)
+        for signal in (task.signals.finished, task.signals.failed, task.signals.cancelled):
+            signal.connect(lambda *_, t=task: self._active.discard(t))
+        self._active.add(task)
+        self.pool.start(task)
+        return task
+
+    def wait_for_done(self, timeout_ms: int = -1) -> bool:
+        return self.pool.waitForDone(timeout_ms)
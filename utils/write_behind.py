@@ -0,0 +1,198 @@
+# utils/write_behind.py
+
+import queue
+import threading
+import time
+
+from PySide6.QtCore import QObject, QTimer, Signal, QEventLoop, QThread, Qt
+from PySide6.QtWidgets import QProgressDialog, QWidget
+
+# Через сколько мс после последней правки изменения уходят в БД
+WRITE_BEHIND_DELAY_MS = 500
+# Сколько ждать записи при явном сохранении/закрытии окна
+FLUSH_TIMEOUT_S = 15.0
+# Сколько GUI-поток ждет записи молча, прежде чем показать окно прогресса
+FLUSH_QUIET_WAIT_S = 0.2
+# Повтор неудавшейся записи: первая пауза и предел, пауза удваивается после каждой неудачи
+RETRY_BASE_MS = 1000
+RETRY_MAX_MS = 60000
+
+
+class WriteBatch:
+    """Накопленные изменения диаграммы; повторные правки одного объекта схлопываются."""
+    __slots__ = ('positions', 'colors', 'column_types', 'project_ids')
+
+    def __init__(self):
+        self.positions = {}      # object_id -> (x, y)
+        self.colors = {}         # object_id -> '#rrggbb'
+        self.column_types = {}   # column_id -> data_type
+        self.project_ids = set()  # проекты, у которых нужно обновить updated_at
+
+    def __len__(self):
+        return len(self.positions) + len(self.colors) + len(self.column_types) + len(self.project_ids)
+
+    def merge_older(self, older: "WriteBatch"):
+        """Возвращает в пакет неудачно записанные изменения, не перетирая более свежие."""
+        for target, source in ((self.positions, older.positions), (self.colors, older.colors),
+                               (self.column_types, older.column_types)):
+            for key, value in source.items():
+                target.setdefault(key, value)
+        self.project_ids |= older.project_ids
+
+
+class WriteBehindQueue(QObject):
+    """
+    Отложенная запись правок диаграммы (позиции, цвета, типы колонок).
+    Правки копятся в памяти и после паузы одним пакетом и одной транзакцией
+    записываются в фоновом потоке, поэтому перетаскивание не ждет сети.
+    Ошибки записи возвращаются в UI сигналом flush_failed, а изменения
+    остаются в очереди и записываются повторно с растущей паузой (RETRY_BASE_MS..RETRY_MAX_MS).
+    """
+
+    flushed = Signal(int)
+    flush_failed = Signal(str)
+    # Внутренние: из рабочего потока в GUI-поток
+    _retry_requested = Signal()
+    _job_finished = Signal()
+
+    def __init__(self, controller, delay_ms: int = WRITE_BEHIND_DELAY_MS, parent=None):
+        super().__init__(parent)
+        self.controller = controller
+        self._lock = threading.Lock()
+        self._pending = WriteBatch()
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay_ms)
+        self._timer.timeout.connect(self.flush)
+
+        self._retry_delay_ms = RETRY_BASE_MS
+        self._closed = False
+        self._retry_timer = QTimer(self)
+        self._retry_timer.setSingleShot(True)
+        self._retry_timer.timeout.connect(self.flush)
+        self._retry_requested.connect(self._schedule_retry)
+
+        self._jobs = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._worker.start()
+
+    # --- ПОСТАНОВКА В ОЧЕРЕДЬ ---
+
+    def update_position(self, object_id: int, x: int, y: int):
+        with self._lock:
+            self._pending.positions[object_id] = (int(x), int(y))
+        self._timer.start()
+
+    def update_color(self, object_id: int, color_hex: str):
+        with self._lock:
+            self._pending.colors[object_id] = color_hex
+        self._timer.start()
+
+    def update_column_type(self, column_id: int, data_type: str):
+        with self._lock:
+            self._pending.column_types[column_id] = data_type
+        self._timer.start()
+
+    def touch_project(self, project_id: int):
+        with self._lock:
+            self._pending.project_ids.add(project_id)
+        self._timer.start()
+
+    def discard_object(self, object_id: int):
+        """Убирает из очереди правки объекта, который удаляется с диаграммы."""
+        with self._lock:
+            self._pending.positions.pop(object_id, None)
+            self._pending.colors.pop(object_id, None)
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return len(self._pending) > 0
+
+    # --- ЗАПИСЬ ---
+
+    def flush(self, wait: bool = False, timeout: float = FLUSH_TIMEOUT_S) -> bool:
+        """
+        Отправляет накопленные правки на запись.
+        При wait=True дожидается окончания записи (явное сохранение, закрытие окна,
+        перезагрузка диаграммы из БД) и возвращает ее успешность. В GUI-потоке ожидание
+        идет в локальном цикле событий под модальным окном прогресса - окно не замирает.
+        """
+        self._timer.stop()
+        self._retry_timer.stop()
+        with self._lock:
+            batch, self._pending = self._pending, WriteBatch()
+        if not batch and not wait:
+            return True
+        job = {'batch': batch, 'done': threading.Event(), 'ok': True}
+        self._jobs.put(job)
+        if not wait:
+            return True
+        if QThread.currentThread() is not self.thread():
+            return job['done'].wait(timeout) and job['ok']
+        return self._wait_in_event_loop(job, timeout)
+
+    def _wait_in_event_loop(self, job: dict, timeout: float) -> bool:
+        if job['done'].wait(FLUSH_QUIET_WAIT_S):
+            return job['ok']
+        parent = self.parent() if isinstance(self.parent(), QWidget) else None
+        progress = QProgressDialog("Сохранение изменений диаграммы...", None, 0, 0, parent)
+        progress.setWindowTitle("Сохранение")
+        progress.setWindowModality(Qt.ApplicationModal)
+        progress.setMinimumDuration(0)
+        progress.show()
+        loop = QEventLoop()
+        deadline_timer = QTimer()
+        deadline_timer.setSingleShot(True)
+        deadline_timer.timeout.connect(loop.quit)
+        # _job_finished приходит по окончании любой записи (в том числе более ранней
+        # автоматической), поэтому цикл возобновляется, пока не записан именно этот пакет
+        self._job_finished.connect(loop.quit)
+        deadline = time.monotonic() + timeout
+        while not job['done'].is_set():
+            remaining_ms = int((deadline - time.monotonic()) * 1000)
+            if remaining_ms <= 0:
+                break
+            deadline_timer.start(remaining_ms)
+            loop.exec()
+        deadline_timer.stop()
+        self._job_finished.disconnect(loop.quit)
+        progress.close()
+        return job['done'].is_set() and job['ok']
+
+    def _schedule_retry(self):
+        if self._closed:
+            return
+        if not self._retry_timer.isActive():
+            self._retry_timer.start(self._retry_delay_ms)
+        self._retry_delay_ms = min(self._retry_delay_ms * 2, RETRY_MAX_MS)
+
+    def shutdown(self, timeout: float = FLUSH_TIMEOUT_S) -> bool:
+        ok = self.flush(wait=True, timeout=timeout)
+        self._closed = True
+        self._retry_timer.stop()
+        self._jobs.put(None)
+        self._worker.join(timeout)
+        return ok
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            batch = job['batch']
+            try:
+                if batch:
+                    self.controller.apply_write_batch(batch.positions, batch.colors,
+                                                      batch.column_types, batch.project_ids)
+                    self.flushed.emit(len(batch))
+                self._retry_delay_ms = RETRY_BASE_MS
+            except Exception as e:
+                job['ok'] = False
+                with self._lock:
+                    self._pending.merge_older(batch)
+                self.flush_failed.emit(str(e))
+                self._retry_requested.emit()
+            finally:
+                job['done'].set()
+                self._job_finished.emit()
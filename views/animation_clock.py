@@ -0,0 +1,201 @@
+# views/animation_clock.py
+
+import time
+
+from PySide6.QtCore import QObject, QTimer, QEvent, QSettings, Qt
+from PySide6.QtWidgets import QApplication
+
+from .frame_profiler import FrameProfiler
+
+# --- ПРОФИЛИ АНИМАЦИИ ---
+# fps               - целевая частота кадров
+# large_scene_fps   - потолок частоты для больших сцен
+# idle_timeout_ms   - через сколько мс без действий пользователя фоновая анимация засыпает
+# frame_budget      - доля интервала кадра, которую может занять один тик
+# animate_background - двигать ли звезды и сетку
+ANIMATION_PROFILES = {
+    "performance": {
+        "title": "Производительность", "fps": 15, "large_scene_fps": 8,
+        "idle_timeout_ms": 3000, "frame_budget": 0.3, "animate_background": False,
+    },
+    "balanced": {
+        "title": "Баланс", "fps": 30, "large_scene_fps": 15,
+        "idle_timeout_ms": 10000, "frame_budget": 0.5, "animate_background": True,
+    },
+    "eye_candy": {
+        "title": "Максимум эффектов", "fps": 60, "large_scene_fps": 30,
+        "idle_timeout_ms": 60000, "frame_budget": 0.7, "animate_background": True,
+    },
+}
+DEFAULT_ANIMATION_PROFILE = "balanced"
+
+# Начиная с этого количества элементов сцены частота ограничивается large_scene_fps
+LARGE_SCENE_ITEM_COUNT = 2000
+
+# Максимальный множитель интервала при постоянном превышении бюджета кадра
+MAX_BUDGET_PENALTY = 8
+
+_ACTIVITY_EVENTS = (
+    QEvent.MouseMove, QEvent.MouseButtonPress, QEvent.MouseButtonRelease,
+    QEvent.KeyPress, QEvent.Wheel,
+)
+
+
+class AnimationClock(QObject):
+    """
+    Единые часы для всех анимаций приложения.
+    Один таймер вместо таймера на каждый элемент; засыпает, когда окно неактивно,
+    свернуто или пользователь ничего не делает.
+    """
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "AnimationClock":
+        if cls._instance is None:
+            cls._instance = AnimationClock(QApplication.instance())
+        return cls._instance
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        # callback -> [interval_ms, накопленное время, ambient]
+        self._subscribers = {}
+        self._timer = QTimer(self)
+        self._timer.setTimerType(Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+        self._last_tick = None
+        self._last_activity = time.monotonic()
+        self._app_active = True
+        self._minimized = False
+        self._scene_item_count = 0
+        self._budget_penalty = 1
+        self.last_tick_cost_ms = 0.0
+
+        self.profile_name = self.load_profile_name()
+        self.profile = ANIMATION_PROFILES[self.profile_name]
+
+        app = QApplication.instance()
+        if app:
+            app.installEventFilter(self)
+            app.applicationStateChanged.connect(self._on_application_state_changed)
+
+    # --- НАСТРОЙКИ ---
+
+    @staticmethod
+    def load_profile_name() -> str:
+        settings = QSettings("MyCompany", "VisualDBDesigner")
+        name = settings.value("animation_profile", DEFAULT_ANIMATION_PROFILE)
+        return name if name in ANIMATION_PROFILES else DEFAULT_ANIMATION_PROFILE
+
+    def set_profile(self, name: str):
+        if name not in ANIMATION_PROFILES:
+            return
+        settings = QSettings("MyCompany", "VisualDBDesigner")
+        settings.setValue("animation_profile", name)
+        self.profile_name = name
+        self.profile = ANIMATION_PROFILES[name]
+        self._budget_penalty = 1
+        self._reschedule()
+
+    @property
+    def animate_background(self) -> bool:
+        return self.profile["animate_background"]
+
+    def set_scene_size(self, item_count: int):
+        """Сообщает часам размер сцены, чтобы ограничить частоту для больших диаграмм."""
+        self._scene_item_count = item_count
+        self._reschedule()
+
+    # --- ПОДПИСКА ---
+
+    def subscribe(self, callback, interval_ms: int = 0, ambient: bool = False):
+        """
+        Подписывает callback(dt_ms) на тики часов.
+        interval_ms - минимальный интервал между вызовами (0 - каждый кадр).
+        ambient - фоновая анимация, которая останавливается при простое пользователя.
+        """
+        self._subscribers[callback] = [interval_ms, 0.0, ambient]
+        self._reschedule()
+
+    def unsubscribe(self, callback):
+        if self._subscribers.pop(callback, None) is not None:
+            self._reschedule()
+
+    # --- ВНУТРЕННЯЯ ЛОГИКА ---
+
+    def _frame_interval_ms(self) -> int:
+        fps = self.profile["fps"]
+        if self._scene_item_count > LARGE_SCENE_ITEM_COUNT:
+            fps = min(fps, self.profile["large_scene_fps"])
+        return int(1000 / fps) * self._budget_penalty
+
+    def _is_idle(self) -> bool:
+        return (time.monotonic() - self._last_activity) * 1000 > self.profile["idle_timeout_ms"]
+
+    def _should_run(self) -> bool:
+        if not self._subscribers or not self._app_active or self._minimized:
+            return False
+        has_transient = any(not ambient for _, _, ambient in self._subscribers.values())
+        return has_transient or not self._is_idle()
+
+    def _reschedule(self):
+        if not self._should_run():
+            self._timer.stop()
+            self._last_tick = None
+            return
+        interval = self._frame_interval_ms()
+        if not self._timer.isActive():
+            self._last_tick = time.monotonic()
+            self._timer.start(interval)
+        elif self._timer.interval() != interval:
+            self._timer.setInterval(interval)
+
+    def _tick(self):
+        now = time.monotonic()
+        dt_ms = (now - self._last_tick) * 1000 if self._last_tick else self._timer.interval()
+        self._last_tick = now
+        idle = self._is_idle()
+
+        for callback, state in list(self._subscribers.items()):
+            interval_ms, accumulated, ambient = state
+            if ambient and idle:
+                continue
+            accumulated += dt_ms
+            if accumulated < interval_ms:
+                state[1] = accumulated
+                continue
+            state[1] = 0.0
+            try:
+                callback(accumulated)
+            except RuntimeError:
+                # C++-объект подписчика уже удален (например, после scene.clear())
+                self._subscribers.pop(callback, None)
+
+        self.last_tick_cost_ms = (time.monotonic() - now) * 1000
+        FrameProfiler.instance().record_tick_cost(self.last_tick_cost_ms)
+        self._apply_frame_budget()
+        self._reschedule()
+
+    def _apply_frame_budget(self):
+        """Снижает частоту кадров, если тики не укладываются в бюджет, и возвращает ее обратно."""
+        budget_ms = self._frame_interval_ms() / self._budget_penalty * self.profile["frame_budget"]
+        if self.last_tick_cost_ms > budget_ms and self._budget_penalty < MAX_BUDGET_PENALTY:
+            self._budget_penalty *= 2
+        elif self.last_tick_cost_ms < budget_ms / 2 and self._budget_penalty > 1:
+            self._budget_penalty //= 2
+
+    def _on_application_state_changed(self, state):
+        self._app_active = state == Qt.ApplicationActive
+        self._reschedule()
+
+    def eventFilter(self, obj, event):
+        event_type = event.type()
+        if event_type in _ACTIVITY_EVENTS:
+            self._last_activity = time.monotonic()
+            if not self._timer.isActive():
+                self._reschedule()
+        elif event_type == QEvent.WindowStateChange:
+            self._minimized = any(w.isMinimized() for w in QApplication.topLevelWidgets() if w.isVisible())
+            self._reschedule()
+        return False
@@ -0,0 +1,200 @@
+# views/background_engine.py
+
+import math
+from collections import OrderedDict
+
+import numpy as np
+from PySide6.QtCore import Qt, QRectF, QPointF
+from PySide6.QtGui import QColor, QPainter, QPen, QPixmap
+
+# --- ПАРАМЕТРЫ ЗВЕЗДНОГО ПОЛЯ ---
+STAR_COUNT = 2000
+STAR_FIELD_HALF = 6000                # звезды живут в квадрате [-6000, 6000]
+STAR_FIELD_SIZE = 2 * STAR_FIELD_HALF
+STAR_LAYERS = 3                       # скорости звезд квантуются в слои параллакса
+STAR_TILE_SIZE = 500                  # сторона тайла звезд в координатах сцены
+STAR_TILE_MARGIN = 3                  # запас под радиус звезды на границе тайла
+
+# --- ПАРАМЕТРЫ СЕТКИ ---
+GRID_SIZE = 50
+GRID_TILE_SIZE = 4 * GRID_SIZE
+
+# Масштабы тайлов - степени двойки; звезды выше 1:1 не детализируем
+MIN_ZOOM_BUCKET = -3
+MAX_STAR_ZOOM_BUCKET = 0
+MAX_GRID_ZOOM_BUCKET = 2
+
+# Общий бюджет памяти под отрисованные тайлы
+TILE_CACHE_BUDGET_BYTES = 96 * 1024 * 1024
+
+
+class StarfieldBackground:
+    """
+    Фон диаграммы: звездное поле и бегущая сетка.
+    Состояние звезд хранится в массивах NumPy, а сами звезды и сетка заранее
+    отрисовываются в тайлы под конкретный уровень масштаба. При перерисовке
+    на экран выводятся только видимые тайлы, поэтому стоимость кадра не
+    зависит от количества звезд.
+    """
+
+    def __init__(self, background_color: QColor, grid_color: QColor, seed: int = None):
+        self.background_color = background_color
+        self.grid_color = grid_color
+
+        rng = np.random.default_rng(seed)
+        self.xs = rng.integers(-STAR_FIELD_HALF, STAR_FIELD_HALF, STAR_COUNT, endpoint=True).astype(np.float64)
+        self.ys = rng.integers(-STAR_FIELD_HALF, STAR_FIELD_HALF, STAR_COUNT, endpoint=True).astype(np.float64)
+        self.speeds = rng.uniform(0.2, 1.5, STAR_COUNT)
+        self.sizes = rng.integers(1, 3, STAR_COUNT, endpoint=True)
+        self.opacities = rng.integers(50, 150, STAR_COUNT, endpoint=True)
+
+        # Каждая звезда попадает в слой со своей скоростью; сдвиг слоя общий для всех его звезд,
+        # поэтому содержимое тайлов слоя не меняется со временем
+        edges = np.linspace(self.speeds.min(), self.speeds.max(), STAR_LAYERS + 1)
+        self.layers = np.clip(np.digitize(self.speeds, edges) - 1, 0, STAR_LAYERS - 1)
+        self.layer_speeds = np.array([
+            self.speeds[self.layers == layer].mean() if np.any(self.layers == layer) else 0.0
+            for layer in range(STAR_LAYERS)
+        ])
+        self.layer_offsets = np.zeros(STAR_LAYERS)
+        self.grid_offset = 0.0
+
+        self._tiles = OrderedDict()
+        self._tiles_bytes = 0
+
+    # --- АНИМАЦИЯ ---
+
+    def advance(self, steps: float = 1.0):
+        """Сдвигает все слои звезд и сетку на steps базовых шагов анимации."""
+        self.layer_offsets = (self.layer_offsets + self.layer_speeds * steps) % STAR_FIELD_SIZE
+        self.grid_offset = (self.grid_offset + 0.5 * steps) % GRID_SIZE
+
+    def star_positions(self) -> (np.ndarray, np.ndarray):
+        """Текущие координаты всех звезд (для отладки и экспорта)."""
+        offsets = self.layer_offsets[self.layers]
+        xs = (self.xs + offsets + STAR_FIELD_HALF) % STAR_FIELD_SIZE - STAR_FIELD_HALF
+        ys = (self.ys + offsets + STAR_FIELD_HALF) % STAR_FIELD_SIZE - STAR_FIELD_HALF
+        return xs, ys
+
+    # --- ОТРИСОВКА ---
+
+    def draw(self, painter: QPainter, rect: QRectF):
+        painter.fillRect(rect, self.background_color)
+        view_scale = painter.worldTransform().m11()
+        self._draw_stars(painter, rect, self._zoom_bucket(view_scale, MAX_STAR_ZOOM_BUCKET))
+        self._draw_grid(painter, rect, self._zoom_bucket(view_scale, MAX_GRID_ZOOM_BUCKET))
+
+    @staticmethod
+    def _zoom_bucket(view_scale: float, max_bucket: int) -> float:
+        if view_scale <= 0:
+            return 1.0
+        bucket = round(math.log2(view_scale))
+        return 2.0 ** max(MIN_ZOOM_BUCKET, min(max_bucket, bucket))
+
+    def _draw_stars(self, painter: QPainter, rect: QRectF, device_scale: float):
+        field = QRectF(-STAR_FIELD_HALF, -STAR_FIELD_HALF, STAR_FIELD_SIZE, STAR_FIELD_SIZE)
+        visible = rect.intersected(field)
+        if visible.isEmpty():
+            return
+        tiles_per_side = STAR_FIELD_SIZE // STAR_TILE_SIZE
+
+        painter.save()
+        painter.setClipRect(visible)
+        for layer in range(STAR_LAYERS):
+            offset = self.layer_offsets[layer]
+            # Переводим видимую область в координаты слоя (без учета сдвига)
+            left = visible.left() - offset + STAR_FIELD_HALF
+            top = visible.top() - offset + STAR_FIELD_HALF
+            first_col = math.floor(left / STAR_TILE_SIZE)
+            last_col = math.floor((left + visible.width()) / STAR_TILE_SIZE)
+            first_row = math.floor(top / STAR_TILE_SIZE)
+            last_row = math.floor((top + visible.height()) / STAR_TILE_SIZE)
+            for row in range(first_row, last_row + 1):
+                for col in range(first_col, last_col + 1):
+                    tile = self._star_tile(layer, col % tiles_per_side, row % tiles_per_side, device_scale)
+                    x = col * STAR_TILE_SIZE - STAR_FIELD_HALF + offset - STAR_TILE_MARGIN
+                    y = row * STAR_TILE_SIZE - STAR_FIELD_HALF + offset - STAR_TILE_MARGIN
+                    size = STAR_TILE_SIZE + 2 * STAR_TILE_MARGIN
+                    painter.drawPixmap(QRectF(x, y, size, size), tile, QRectF(tile.rect()))
+        painter.restore()
+
+    def _draw_grid(self, painter: QPainter, rect: QRectF, device_scale: float):
+        tile = self._grid_tile(device_scale)
+        tile_px = tile.width()
+        painter.save()
+        # Работаем в пикселях тайла, чтобы drawTiledPixmap не масштабировал его повторно
+        painter.scale(1 / device_scale, 1 / device_scale)
+        target = QRectF(rect.left() * device_scale, rect.top() * device_scale,
+                        rect.width() * device_scale, rect.height() * device_scale)
+        origin = QPointF(((rect.left() - self.grid_offset) * device_scale) % tile_px,
+                         ((rect.top() - self.grid_offset) * device_scale) % tile_px)
+        painter.drawTiledPixmap(target, tile, origin)
+        painter.restore()
+
+    # --- КЭШ ТАЙЛОВ ---
+
+    def _star_tile(self, layer: int, col: int, row: int, device_scale: float) -> QPixmap:
+        key = ("stars", layer, col, row, device_scale)
+        tile = self._cached_tile(key)
+        if tile is not None:
+            return tile
+
+        tile_left = col * STAR_TILE_SIZE - STAR_FIELD_HALF
+        tile_top = row * STAR_TILE_SIZE - STAR_FIELD_HALF
+        # Векторно выбираем звезды слоя, попадающие в тайл (с учетом заворачивания поля)
+        rel_x = (self.xs - tile_left + STAR_TILE_MARGIN) % STAR_FIELD_SIZE
+        rel_y = (self.ys - tile_top + STAR_TILE_MARGIN) % STAR_FIELD_SIZE
+        limit = STAR_TILE_SIZE + 2 * STAR_TILE_MARGIN
+        mask = (self.layers == layer) & (rel_x < limit) & (rel_y < limit)
+
+        size_px = max(1, int(round((STAR_TILE_SIZE + 2 * STAR_TILE_MARGIN) * device_scale)))
+        tile = QPixmap(size_px, size_px)
+        tile.fill(Qt.transparent)
+        if np.any(mask):
+            painter = QPainter(tile)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.scale(device_scale, device_scale)
+            painter.setPen(Qt.NoPen)
+            for x, y, size, opacity in zip(rel_x[mask], rel_y[mask], self.sizes[mask], self.opacities[mask]):
+                painter.setBrush(QColor(255, 255, 255, int(opacity)))
+                painter.drawEllipse(QPointF(float(x), float(y)), float(size), float(size))
+            painter.end()
+        self._store_tile(key, tile)
+        return tile
+
+    def _grid_tile(self, device_scale: float) -> QPixmap:
+        key = ("grid", device_scale)
+        tile = self._cached_tile(key)
+        if tile is not None:
+            return tile
+
+        size_px = int(GRID_TILE_SIZE * device_scale)
+        step_px = GRID_SIZE * device_scale
+        tile = QPixmap(size_px, size_px)
+        tile.fill(Qt.transparent)
+        painter = QPainter(tile)
+        painter.setPen(QPen(self.grid_color, 1))
+        for i in range(GRID_TILE_SIZE // GRID_SIZE):
+            pos = int(i * step_px)
+            painter.drawLine(pos, 0, pos, size_px)
+            painter.drawLine(0, pos, size_px, pos)
+        painter.end()
+        self._store_tile(key, tile)
+        return tile
+
+    def _cached_tile(self, key) -> QPixmap | None:
+        tile = self._tiles.get(key)
+        if tile is not None:
+            self._tiles.move_to_end(key)
+        return tile
+
+    def _store_tile(self, key, tile: QPixmap):
+        self._tiles[key] = tile
+        self._tiles_bytes += tile.width() * tile.height() * 4
+        while self._tiles_bytes > TILE_CACHE_BUDGET_BYTES and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self._tiles_bytes -= evicted.width() * evicted.height() * 4
+
+    def clear_cache(self):
+        self._tiles.clear()
+        self._tiles_bytes = 0
@@ -0,0 +1,157 @@
+# views/batch_import_dialog.py
+
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                               QTableWidget, QTableWidgetItem, QProgressBar, QHeaderView)
+
+from controllers.project_controller import ProjectController
+from models.user import Connection
+from utils.sql_instrumentation import ACTION_IMPORT
+from utils.task_runner import TaskRunner, MAX_TASK_THREADS
+
+# Сколько БД импортируется одновременно; один поток пула остается остальным задачам окна
+MAX_PARALLEL_IMPORTS = max(1, MAX_TASK_THREADS - 1)
+
+IMPORT_COLUMNS = ["База данных", "Ход импорта", "Результат"]
+
+STATUS_QUEUED = "В очереди"
+STATUS_RUNNING = "Импорт..."
+STATUS_DONE = "Импортирована"
+STATUS_CANCELLED = "Отменен"
+
+
+class BatchImportDialog(QDialog):
+    """
+    Импорт нескольких БД одного сервера. Каждая БД становится отдельным проектом и
+    импортируется отдельной задачей (свое подключение к MySQL и своя транзакция),
+    одновременно - не больше MAX_PARALLEL_IMPORTS. Ошибка одной БД не мешает остальным;
+    по окончании показывается сводка.
+    """
+
+    def __init__(self, user_id: int, connection: Connection, db_names: list[str], parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Импорт баз данных")
+        self.setMinimumSize(620, 420)
+
+        self.user_id = user_id
+        self.connection = connection
+        self.project_controller = ProjectController()
+        self.task_runner = TaskRunner.instance()
+
+        self.pending = list(db_names)
+        self.running = {}       # имя БД -> TaskHandle
+        self.results = {}       # имя БД -> (успех, сообщение)
+        self.cancelling = False
+
+        layout = QVBoxLayout(self)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        self.table = QTableWidget(len(db_names), len(IMPORT_COLUMNS))
+        self.table.setHorizontalHeaderLabels(IMPORT_COLUMNS)
+        self.table.horizontalHeader().setSectionResizeMode(2, QHeaderView.Stretch)
+        self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.rows = {}
+        for row, name in enumerate(db_names):
+            self.rows[name] = row
+            self.table.setItem(row, 0, QTableWidgetItem(name))
+            bar = QProgressBar()
+            bar.setRange(0, 1)
+            bar.setValue(0)
+            self.table.setCellWidget(row, 1, bar)
+            self.table.setItem(row, 2, QTableWidgetItem(STATUS_QUEUED))
+        self.table.resizeColumnToContents(0)
+        layout.addWidget(self.table)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        self.action_button = QPushButton("Отмена")
+        self.action_button.clicked.connect(self.handle_action_button)
+        buttons.addWidget(self.action_button)
+        layout.addLayout(buttons)
+
+        self._start_next()
+
+    @property
+    def imported_count(self) -> int:
+        return sum(1 for ok, _ in self.results.values() if ok)
+
+    def _start_next(self):
+        while self.pending and len(self.running) < MAX_PARALLEL_IMPORTS and not self.cancelling:
+            name = self.pending.pop(0)
+            self.running[name] = self.task_runner.submit(
+                self.project_controller.import_project_from_db, self.user_id, self.connection, name,
+                action=ACTION_IMPORT,
+                on_result=lambda result, n=name: self._finish(n, result[0] is not None, result[1]),
+                on_error=lambda error, n=name: self._finish(n, False, error),
+                on_progress=lambda done, total, message, n=name: self._on_progress(n, done, total, message),
+                on_cancel=lambda n=name: self._finish(n, False, STATUS_CANCELLED))
+            self._set_status(name, STATUS_RUNNING)
+        self._update_status_label()
+        if not self.running:
+            self._show_summary()
+
+    def _on_progress(self, name: str, done: int, total: int, message: str):
+        bar = self.table.cellWidget(self.rows[name], 1)
+        bar.setMaximum(total)
+        bar.setValue(done)
+        self._set_status(name, message)
+
+    def _finish(self, name: str, ok: bool, message: str):
+        if self.running.pop(name, None) is None:
+            return
+        self.results[name] = (ok, message)
+        bar = self.table.cellWidget(self.rows[name], 1)
+        if ok:
+            bar.setMaximum(max(bar.maximum(), 1))
+            bar.setValue(bar.maximum())
+        self._set_status(name, STATUS_DONE if ok else message)
+        self._start_next()
+
+    def _set_status(self, name: str, text: str):
+        item = self.table.item(self.rows[name], 2)
+        item.setText(text.splitlines()[0] if text else "")
+        item.setToolTip(text)
+
+    def _update_status_label(self):
+        total = len(self.rows)
+        self.status_label.setText(
+            f"Завершено {len(self.results)} из {total}, выполняется: {len(self.running)}")
+
+    def _show_summary(self):
+        failed = [name for name, (ok, message) in self.results.items()
+                  if not ok and message != STATUS_CANCELLED]
+        cancelled = len(self.rows) - self.imported_count - len(failed)
+        summary = f"Импортировано {self.imported_count} из {len(self.rows)}."
+        if failed:
+            summary += f" С ошибками: {', '.join(failed)}."
+        if cancelled:
+            summary += f" Отменено: {cancelled}."
+        self.status_label.setText(summary)
+        self.action_button.setText("Закрыть")
+        self.action_button.setEnabled(True)
+
+    def handle_action_button(self):
+        if self.running or self.pending:
+            self._cancel()
+        else:
+            self.accept()
+
+    def _cancel(self):
+        """Оставшиеся в очереди БД не запускаются, выполняющиеся импорты откатываются."""
+        self.cancelling = True
+        self.action_button.setEnabled(False)
+        for name in self.pending:
+            self.results[name] = (False, STATUS_CANCELLED)
+            self._set_status(name, STATUS_CANCELLED)
+        self.pending.clear()
+        for task in self.running.values():
+            task.cancel()
+        self._start_next()
+
+    def reject(self):
+        # Пока идут импорты, закрытие окна означает отмену
+        if self.running or self.pending:
+            self._cancel()
+            return
+        super().reject()
@@ -0,0 +1,56 @@
+# views/connection_index.py
+
+from collections import defaultdict
+
+
+class ConnectionIndex:
+    """
+    Индекс линий связей диаграммы.
+    Позволяет находить линии по relationship_id, таблице или колонке
+    без обхода всех элементов сцены.
+    """
+
+    def __init__(self):
+        self._by_relationship = {}
+        self._by_table = defaultdict(set)
+        self._by_column = defaultdict(set)
+
+    def add(self, line):
+        if line.relationship_id is not None:
+            self._by_relationship[line.relationship_id] = line
+        for table_id in (line.start_table_id, line.end_table_id):
+            self._by_table[table_id].add(line)
+        for column_id in (line.start_column_id, line.end_column_id):
+            self._by_column[column_id].add(line)
+
+    def remove(self, line):
+        if self._by_relationship.get(line.relationship_id) is line:
+            del self._by_relationship[line.relationship_id]
+        for index, key in ((self._by_table, line.start_table_id), (self._by_table, line.end_table_id),
+                           (self._by_column, line.start_column_id), (self._by_column, line.end_column_id)):
+            lines = index.get(key)
+            if lines is None:
+                continue
+            lines.discard(line)
+            if not lines:
+                del index[key]
+
+    def get(self, relationship_id: int):
+        return self._by_relationship.get(relationship_id)
+
+    def for_table(self, table_id: int) -> set:
+        return set(self._by_table.get(table_id, ()))
+
+    def for_column(self, column_id: int) -> set:
+        return set(self._by_column.get(column_id, ()))
+
+    def clear(self):
+        self._by_relationship.clear()
+        self._by_table.clear()
+        self._by_column.clear()
+
+    def __iter__(self):
+        return iter(list(self._by_relationship.values()))
+
+    def __len__(self):
+        return len(self._by_relationship)
@@ -1,6 +1,6 @@
 # views/database_selection_dialog.py
 
-from PySide6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QComboBox,
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QListWidget, QListWidgetItem,
                                QPushButton, QHBoxLayout, QWidget, QFrame)
 from PySide6.QtCore import Qt
 from .custom_title_bar import CustomTitleBar
@@ -41,19 +41,35 @@ class DatabaseSelectionDialog(QDialog):
         content_layout.setContentsMargins(20, 20, 20, 20)
         content_layout.setSpacing(15)
 
-        lbl = QLabel("Выберите базу данных для импорта:")
+        lbl = QLabel("Отметьте базы данных для импорта (каждая станет отдельным проектом):")
+        lbl.setWordWrap(True)
         lbl.setStyleSheet("color: #bac2de; font-size: 14px;")
         content_layout.addWidget(lbl)
 
-        self.combo_box = QComboBox()
-        self.combo_box.addItems(items)
-        # Стили уже подтянутся из main.py, но можно уточнить высоту
-        self.combo_box.setMinimumHeight(35)
-        content_layout.addWidget(self.combo_box)
+        self.list_widget = QListWidget()
+        self.list_widget.setStyleSheet("""
+            QListWidget {
+                background-color: rgba(30, 30, 46, 0.6);
+                border: 1px solid #313244;
+                border-radius: 5px;
+            }
+        """)
+        for name in items:
+            item = QListWidgetItem(name, self.list_widget)
+            item.setFlags(item.flags() | Qt.ItemIsUserCheckable)
+            item.setCheckState(Qt.Unchecked)
+        if self.list_widget.count():
+            self.list_widget.item(0).setCheckState(Qt.Checked)
+        self.list_widget.itemChanged.connect(self._update_ok_button)
+        content_layout.addWidget(self.list_widget)
 
         # 3. Кнопки
         buttons_layout = QHBoxLayout()
 
+        self.select_all_btn = QPushButton("Выбрать все")
+        self.select_all_btn.clicked.connect(self._toggle_all)
+        buttons_layout.addWidget(self.select_all_btn)
+
         self.cancel_btn = QPushButton("Отмена")
         self.cancel_btn.clicked.connect(self.reject)
 
@@ -70,7 +86,24 @@ class DatabaseSelectionDialog(QDialog):
         root_layout.addWidget(content_widget)
         main_layout.addWidget(self.root_frame)
 
-        self.resize(400, 200)
+        self.resize(420, 420)
+        self._update_ok_button()
+
+    def _toggle_all(self):
+        items = [self.list_widget.item(i) for i in range(self.list_widget.count())]
+        state = Qt.Unchecked if all(item.checkState() == Qt.Checked for item in items) else Qt.Checked
+        for item in items:
+            item.setCheckState(state)
+
+    def _update_ok_button(self, *_):
+        count = len(self.get_selected_dbs())
+        self.ok_btn.setEnabled(count > 0)
+        self.ok_btn.setText(f"Импортировать ({count})" if count > 1 else "Импортировать")
+
+    def get_selected_dbs(self) -> list[str]:
+        return [self.list_widget.item(i).text() for i in range(self.list_widget.count())
+                if self.list_widget.item(i).checkState() == Qt.Checked]
 
     def get_selected_db(self):
-        return self.combo_box.currentText()
\ No newline at end of file
+        selected = self.get_selected_dbs()
+        return selected[0] if selected else None
\ No newline at end of file
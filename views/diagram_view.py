@@ -1,22 +1,38 @@
 # views/diagram_view.py
 
+import itertools
+import math
 import random
+import time
 from typing import Dict
 
 from PySide6.QtWidgets import (
     QGraphicsView, QGraphicsScene, QGraphicsRectItem,
     QGraphicsTextItem, QMenu, QGraphicsPathItem,
     QGraphicsEllipseItem, QMessageBox, QInputDialog, QGraphicsItem, QDialog,
-    QMainWindow, QColorDialog, QGraphicsDropShadowEffect
+    QMainWindow, QColorDialog
 )
 from PySide6.QtCore import Qt, QRectF, QPointF, QSettings, Signal, QTimer
 from PySide6.QtGui import (
     QBrush, QColor, QPen, QPainter, QPainterPath,
-    QFontMetrics, QImage, QLinearGradient, QFont, QPixmap, QMouseEvent
+    QFontMetrics, QImage, QLinearGradient, QFont, QPixmap, QMouseEvent, QPixmapCache
 )
 
 from .table_editor_dialog import TableEditorDialog
+from .animation_clock import AnimationClock
+from .background_engine import StarfieldBackground
+from .connection_index import ConnectionIndex
+from .edge_batch import EdgeBatchLayer
+from .glow_cache import GlowCache, glow_padding
+from .text_cache import TextLayoutCache
+from .frame_profiler import FrameProfiler, profiled_paint
+from .virtual_scene import (
+    TableRecord, EdgeRecord, SpatialGrid, VirtualTablesLayer, build_connection_path,
+    HEADER_HEIGHT, ROW_HEIGHT, FOOTER_HEIGHT
+)
 from controllers.table_controller import TableController
+from utils.write_behind import WriteBehindQueue
+from utils.sql_instrumentation import ui_action, ACTION_TABLE_EDIT
 
 # --- ЦВЕТОВАЯ ПАЛИТРА (CYBERPUNK / SCI-FI) ---
 COLOR_BG_DARK = QColor(20, 20, 25)
@@ -27,6 +43,45 @@ COLOR_ACCENT_PINK = QColor(245, 194, 231)
 COLOR_TEXT_MAIN = QColor(255, 255, 255)
 COLOR_TEXT_DIM = QColor(180, 180, 200)
 
+# --- УРОВЕНЬ ДЕТАЛИЗАЦИИ (LOD) ---
+# Масштаб, ниже которого таблицы рисуются упрощенно (только заголовок и счетчик колонок)
+DEFAULT_LOD_SCALE_THRESHOLD = 0.5
+
+# --- ВИРТУАЛИЗАЦИЯ СЦЕНЫ ---
+# С какого количества таблиц включается виртуальный режим
+VIRTUALIZATION_MIN_TABLES = 100
+# Запас вокруг видимой области (в долях ее размера): материализуем с меньшим, удаляем с большим
+VIRTUAL_MATERIALIZE_MARGIN = 0.5
+VIRTUAL_RELEASE_MARGIN = 1.0
+VIRTUAL_UPDATE_DELAY_MS = 30
+MAX_TABLE_ITEM_POOL = 64
+
+# --- ПАКЕТНАЯ ОТРИСОВКА СВЯЗЕЙ ---
+# Режимы: 'auto' - пакетный слой включается на плотных диаграммах, 'items' - всегда отдельные линии,
+# 'batched' - всегда пакетный слой
+DEFAULT_EDGE_RENDER_MODE = 'auto'
+BATCHED_EDGES_MIN = 300
+
+# --- СВЕЧЕНИЕ (готовые спрайты из GlowCache) ---
+TABLE_GLOW_BLUR = 20
+TABLE_GLOW_COLOR = QColor(0, 0, 0, 100)
+TABLE_SELECTED_GLOW_COLOR = QColor(255, 0, 255, 150)
+PORT_GLOW_BLUR = 10
+LINE_GLOW_WIDTH = 10
+
+# --- КЭШ ОТРИСОВКИ ТАБЛИЦ ---
+# Серийные номера отрисовок TableItem: ключ кэша не повторяется даже у элемента,
+# созданного Python по адресу уже удаленного
+_render_serials = itertools.count()
+# Общий лимит QPixmapCache (КБ); готовые изображения таблиц вытесняются по LRU
+DEFAULT_RENDER_CACHE_LIMIT_KB = 64 * 1024
+# Масштабы, под которые рендерится кэш, - степени двойки в этих пределах
+MIN_RENDER_ZOOM_BUCKET = -2
+MAX_RENDER_ZOOM_BUCKET = 2
+
+# Базовый шаг анимации сцены, под который подобраны скорости звезд, сетки и пунктира
+ANIMATION_STEP_MS = 10
+
 
 # ==============================================================================
 # ЭФФЕКТ "BREACH PROTOCOL" (DECODE TEXT)
@@ -46,8 +101,8 @@ class DecipherTextItem(QGraphicsTextItem):
         # Набор символов для "шума"
         self._glitch_chars = "01XZ#@$%&*<>?[]_DATA_ERR"
 
-        self._timer = QTimer()
-        self._timer.timeout.connect(self._update_text_animation)
+        # Кадры анимации выдают общие часы, а не собственный таймер
+        self._is_animating = False
 
         # Запускаем анимацию сразу при создании
         self.animate_text(text)
@@ -59,16 +114,18 @@ class DecipherTextItem(QGraphicsTextItem):
         # Адаптивная длительность: чем длиннее слово, тем дольше расшифровка
         self._max_steps = min(30, max(15, len(new_text) * 2))
 
-        if not self._timer.isActive():
-            self._timer.start(40)  # 40мс на кадр
+        if not self._is_animating:
+            self._is_animating = True
+            AnimationClock.instance().subscribe(self._update_text_animation, interval_ms=40)  # 40мс на кадр
 
-    def _update_text_animation(self):
+    def _update_text_animation(self, dt_ms=None):
         self._current_step += 1
         progress = self._current_step / self._max_steps
 
         if progress >= 1.0:
             super().setPlainText(self._target_text)
-            self._timer.stop()
+            self._is_animating = False
+            AnimationClock.instance().unsubscribe(self._update_text_animation)
             return
 
         # Сколько символов уже "расшифровано"
@@ -88,11 +145,25 @@ class DecipherTextItem(QGraphicsTextItem):
         # Перехватываем стандартный метод установки текста
         self.animate_text(text)
 
+    def set_text_immediately(self, text: str):
+        """Устанавливает текст без анимации (для переиспользуемых элементов)."""
+        self._target_text = text
+        if self._is_animating:
+            self._is_animating = False
+            AnimationClock.instance().unsubscribe(self._update_text_animation)
+        super().setPlainText(text)
+
 
 # ==============================================================================
 # КЛАССЫ ЭЛЕМЕНТОВ ДИАГРАММЫ
 # ==============================================================================
 
+def column_data_from_model(col, is_fk: bool = False) -> dict:
+    """Переводит ORM-колонку в словарь, с которым работают TableRecord и ColumnItem."""
+    return {'id': col.column_id, 'name': col.column_name, 'type': col.data_type,
+            'pk': col.is_primary_key, 'nn': not col.is_nullable, 'fk': is_fk}
+
+
 class PortItem(QGraphicsEllipseItem):
     def __init__(self, parent_column, side='left'):
         super().__init__(-5, -5, 10, 10, parent_column)
@@ -109,12 +180,21 @@ class PortItem(QGraphicsEllipseItem):
         self.setVisible(False)
         self.update_position()
 
-        # Свечение порта
-        glow = QGraphicsDropShadowEffect()
-        glow.setBlurRadius(10)
-        glow.setColor(self.default_color)
-        glow.setOffset(0, 0)
-        self.setGraphicsEffect(glow)
+        # Свечение порта рисуется готовым спрайтом того же цвета, что и сам порт
+        self.glow_color = self.default_color
+
+    def boundingRect(self) -> QRectF:
+        pad = glow_padding(PORT_GLOW_BLUR)
+        return self.rect().adjusted(-pad, -pad, pad, pad)
+
+    @profiled_paint("PortItem")
+    def paint(self, painter, option, widget=None):
+        r = self.rect()
+        GlowCache.instance().draw_dot_glow(painter, r.center(), r.width() / 2, PORT_GLOW_BLUR, self.glow_color)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.brush())
+        painter.drawEllipse(r)
 
     def update_position(self):
         r = self.column.rect()
@@ -126,31 +206,43 @@ class PortItem(QGraphicsEllipseItem):
 
     def hoverEnterEvent(self, event):
         self.setBrush(QBrush(self.highlight_color))
-        self.graphicsEffect().setColor(self.highlight_color)
+        self.glow_color = self.highlight_color
         self.setRect(-6, -6, 12, 12)
         super().hoverEnterEvent(event)
 
     def hoverLeaveEvent(self, event):
         if not self.column.is_highlighted:
             self.setBrush(QBrush(self.default_color))
-            self.graphicsEffect().setColor(self.default_color)
+            self.glow_color = self.default_color
         self.setRect(-5, -5, 10, 10)
         super().hoverLeaveEvent(event)
 
     def set_highlighted(self, highlighted: bool):
         if highlighted:
             self.setBrush(QBrush(self.highlight_color))
-            self.graphicsEffect().setColor(self.highlight_color)
+            self.glow_color = self.highlight_color
             self.setRect(-7, -7, 14, 14)
         else:
             self.setBrush(QBrush(self.default_color))
-            self.graphicsEffect().setColor(self.default_color)
+            self.glow_color = self.default_color
             self.setRect(-5, -5, 10, 10)
 
 
 class ColumnItem(QGraphicsRectItem):
     MAX_NAME_WIDTH = 130
     MAX_TYPE_WIDTH = 120
+    NAME_X = 14
+    TYPE_X = 154
+    PK_COLOR = QColor("#fab387")
+    FK_COLOR = QColor("#a6e3a1")
+    _font: QFont = None
+
+    @classmethod
+    def text_font(cls) -> QFont:
+        # Шрифт общий для всех колонок; создается после QApplication
+        if cls._font is None:
+            cls._font = QFont("Consolas", 9)
+        return cls._font
 
     def __init__(self, name, parent_table, column_id=None, column_info=None, width=300, height=28):
         super().__init__(QRectF(6, 0, width - 12, height), parent_table)
@@ -159,7 +251,7 @@ class ColumnItem(QGraphicsRectItem):
         self.raw_name = name
         self.data_type = column_info.get('type', 'varchar') if column_info else "varchar"
         self.is_pk = column_info.get('pk', False) if column_info else False
-        self.is_fk = False
+        self.is_fk = column_info.get('fk', False) if column_info else False
         self.is_nn = column_info.get('nn', True) if column_info else True
         self.is_highlighted = False
 
@@ -167,44 +259,64 @@ class ColumnItem(QGraphicsRectItem):
         self.setPen(Qt.NoPen)
         self.setZValue(1)
 
-        self.name_item = QGraphicsTextItem("", self)
-        self.name_item.setDefaultTextColor(COLOR_TEXT_MAIN)
-        self.name_item.setPos(10, 4)
-        self.name_item.setFont(QFont("Consolas", 9))
-
-        self.type_item = QGraphicsTextItem("", self)
-        self.type_item.setDefaultTextColor(COLOR_TEXT_DIM)
-        self.type_item.setPos(150, 4)
-        self.type_item.setFont(QFont("Consolas", 9))
+        # Текст рисуется в paint() из общего кэша раскладки, без дочерних QGraphicsTextItem
+        self._name_parts = []
+        self._type_text = None
 
         self.left_port = PortItem(self, 'left')
         self.right_port = PortItem(self, 'right')
-        self._update_and_elide_text()
+        self._update_text_layout()
 
-    def _update_and_elide_text(self):
-        pk_color = "#fab387"
-        fk_color = "#a6e3a1"
+    def _update_text_layout(self):
+        cache = TextLayoutCache.instance()
+        font = self.text_font()
 
-        name_html = ""
-        if self.is_pk: name_html += f"<span style='color:{pk_color};'>🔑 </span>"
-        if self.is_fk: name_html += f"<span style='color:{fk_color};'>🔒 </span>"
-        name_html += self.raw_name
+        parts = []
+        if self.is_pk: parts.append((self.PK_COLOR, cache.get(font, "🔑 ")))
+        if self.is_fk: parts.append((self.FK_COLOR, cache.get(font, "🔒 ")))
+        parts.append((COLOR_TEXT_MAIN, cache.get(font, self.raw_name, self.MAX_NAME_WIDTH)))
+        self._name_parts = parts
 
-        font_metrics_name = QFontMetrics(self.name_item.font())
-        elided_name = font_metrics_name.elidedText(self.raw_name, Qt.ElideRight, self.MAX_NAME_WIDTH)
+        suffix = "" if self.is_nn else " [null]"
+        self._type_text = cache.get(font, f"{self.data_type}{suffix}", self.MAX_TYPE_WIDTH)
+        self.update()
 
-        final_html = name_html.replace(self.raw_name, elided_name)
-        self.name_item.setHtml(final_html)
+    @profiled_paint("ColumnItem")
+    def paint(self, painter, option, widget=None):
+        super().paint(painter, option, widget)
+        painter.setFont(self.text_font())
+        r = self.rect()
 
-        suffix = "" if self.is_nn else " [null]"
-        display_type = f"{self.data_type}{suffix}"
-        font_metrics_type = QFontMetrics(self.type_item.font())
-        elided_type = font_metrics_type.elidedText(display_type, Qt.ElideRight, self.MAX_TYPE_WIDTH)
-        self.type_item.setPlainText(elided_type)
+        x = self.NAME_X
+        for color, static_text in self._name_parts:
+            size = static_text.size()
+            painter.setPen(color)
+            painter.drawStaticText(QPointF(x, r.top() + (r.height() - size.height()) / 2), static_text)
+            x += size.width()
+
+        size = self._type_text.size()
+        painter.setPen(COLOR_TEXT_DIM)
+        painter.drawStaticText(QPointF(self.TYPE_X, r.top() + (r.height() - size.height()) / 2), self._type_text)
+
+    def set_data(self, column_info: dict):
+        """Переназначает колонке данные (используется при переиспользовании элементов)."""
+        self.column_id = column_info['id']
+        self.raw_name = column_info['name']
+        self.data_type = column_info.get('type', 'varchar')
+        self.is_pk = column_info.get('pk', False)
+        self.is_fk = column_info.get('fk', False)
+        self.is_nn = column_info.get('nn', True)
+        self.set_highlighted(False)
+        self._update_text_layout()
+
+    def matches(self, column_info: dict) -> bool:
+        return (self.raw_name == column_info['name'] and self.data_type == column_info.get('type', 'varchar')
+                and self.is_pk == column_info.get('pk', False) and self.is_fk == column_info.get('fk', False)
+                and self.is_nn == column_info.get('nn', True))
 
     def update_data_type(self, new_type: str):
         self.data_type = new_type
-        self._update_and_elide_text()
+        self._update_text_layout()
 
     def set_highlighted(self, highlighted: bool):
         self.is_highlighted = highlighted
@@ -221,8 +333,14 @@ class TableItem(QGraphicsRectItem):
         self.diagram_object_id = diagram_object_id
         self.table_id = table_id
         self.diagram_controller = controller
-        self.width, self.row_height = width, 28
+        self.width, self.row_height = width, ROW_HEIGHT
         self.columns = []
+        self.record: TableRecord = None
+        self.simplified = False
+        # Кэш отрисовки: серийный номер меняется при реальных изменениях (имя, колонки, цвет, выделение)
+        self.render_cache_enabled = True
+        self._render_serial = next(_render_serials)
+        self._render_keys = set()
         self.setPos(x, y)
         self.setFlags(
             QGraphicsItem.ItemIsMovable | QGraphicsItem.ItemIsSelectable | QGraphicsItem.ItemSendsGeometryChanges)
@@ -231,12 +349,6 @@ class TableItem(QGraphicsRectItem):
         self.custom_header_color = QColor(color) if color else COLOR_ACCENT_CYAN
         self.body_color = COLOR_NODE_BODY
 
-        self.glow = QGraphicsDropShadowEffect()
-        self.glow.setBlurRadius(20)
-        self.glow.setColor(QColor(0, 0, 0, 100))
-        self.glow.setOffset(0, 0)
-        self.setGraphicsEffect(self.glow)
-
         # === ИСПОЛЬЗУЕМ DECIPHER TEXT ДЛЯ ЗАГОЛОВКА ===
         self.text = DecipherTextItem(name, self)
         self.text.setDefaultTextColor(QColor(10, 10, 20))
@@ -245,10 +357,113 @@ class TableItem(QGraphicsRectItem):
         self.text.setFont(font)
         self.text.setPos(10, 4)
 
+    def set_simplified(self, simplified: bool):
+        """Переключает упрощенный режим отрисовки (LOD) при сильном отдалении."""
+        if self.simplified == simplified:
+            return
+        self.simplified = simplified
+        # Колонки вместе с портами и текстом просто прячем, чтобы Qt их не обходил
+        for col in self.columns:
+            col.setVisible(not simplified)
+        self.text.setVisible(not simplified)
+        self.invalidate_render_cache()
+
+    def _paint_simplified(self, painter):
+        r = self.rect()
+        header_height = 30
+
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(self.body_color)
+        painter.drawRect(r)
+
+        header_rect = QRectF(r.left(), r.top(), r.width(), header_height)
+        painter.setBrush(self.custom_header_color)
+        painter.drawRect(header_rect)
+
+        # Полоса-счетчик колонок вместо самих колонок
+        if self.columns:
+            bar_rect = QRectF(r.left() + 10, r.top() + header_height + 5,
+                              r.width() - 20, r.height() - header_height - 10)
+            bar_color = QColor(self.custom_header_color)
+            bar_color.setAlpha(60)
+            painter.setBrush(bar_color)
+            painter.drawRect(bar_rect)
+
+        font = QFont("Segoe UI", 14, QFont.Bold)
+        painter.setFont(font)
+        painter.setPen(QColor(10, 10, 20))
+        name = QFontMetrics(font).elidedText(self.text._target_text, Qt.ElideRight, int(r.width() - 20))
+        painter.drawText(header_rect.adjusted(10, 0, -10, 0), Qt.AlignVCenter | Qt.AlignLeft, name)
+
+        if self.isSelected():
+            painter.setBrush(Qt.NoBrush)
+            painter.setPen(QPen(COLOR_ACCENT_PINK, 4))
+            painter.drawRect(r)
+
+    def boundingRect(self) -> QRectF:
+        # Свечение выходит за контур таблицы
+        pad = glow_padding(TABLE_GLOW_BLUR)
+        return self.rect().adjusted(-pad, -pad, pad, pad)
+
+    def release_render_cache(self):
+        """Удаляет готовые изображения элемента из QPixmapCache (элемент уходит со сцены)."""
+        for key in self._render_keys:
+            QPixmapCache.remove(key)
+        self._render_keys.clear()
+
+    def invalidate_render_cache(self):
+        self.release_render_cache()
+        self._render_serial = next(_render_serials)
+        self.update()
+
+    @staticmethod
+    def _render_zoom_bucket(view_scale: float) -> float:
+        if view_scale <= 0:
+            return 1.0
+        bucket = round(math.log2(view_scale))
+        return 2.0 ** max(MIN_RENDER_ZOOM_BUCKET, min(MAX_RENDER_ZOOM_BUCKET, bucket))
+
+    @profiled_paint("TableItem")
     def paint(self, painter, option, widget=None):
+        if not self.render_cache_enabled:
+            self._paint_node(painter)
+            return
+
+        # Готовое изображение узла рендерится под ступень масштаба и живет в общем QPixmapCache
+        bucket = self._render_zoom_bucket(painter.worldTransform().m11())
+        dpr = painter.device().devicePixelRatioF() if painter.device() else 1.0
+        key = f"table-node:{self._render_serial}:{bucket}:{dpr}"
+        bounds = self.boundingRect()
+        pixmap = QPixmap()
+        if not QPixmapCache.find(key, pixmap):
+            scale = bucket * dpr
+            pixmap = QPixmap(max(1, math.ceil(bounds.width() * scale)), max(1, math.ceil(bounds.height() * scale)))
+            pixmap.fill(Qt.transparent)
+            pix_painter = QPainter(pixmap)
+            pix_painter.setRenderHints(painter.renderHints())
+            pix_painter.scale(scale, scale)
+            pix_painter.translate(-bounds.topLeft())
+            self._paint_node(pix_painter)
+            pix_painter.end()
+            pixmap.setDevicePixelRatio(dpr)
+            # Изображение прежней ступени масштаба больше не понадобится - освобождаем его сразу
+            self.release_render_cache()
+            if QPixmapCache.insert(key, pixmap):
+                self._render_keys.add(key)
+        painter.drawPixmap(bounds, pixmap, QRectF(pixmap.rect()))
+
+    def _paint_node(self, painter):
+        if self.simplified:
+            self._paint_simplified(painter)
+            return
+
         r = self.rect()
         radius = 12
 
+        # 0. Свечение/тень
+        glow_color = TABLE_SELECTED_GLOW_COLOR if self.isSelected() else TABLE_GLOW_COLOR
+        GlowCache.instance().draw_rect_glow(painter, r, radius, TABLE_GLOW_BLUR, glow_color)
+
         # 1. Тело
         body_path = QPainterPath()
         body_path.addRoundedRect(r, radius, radius)
@@ -279,62 +494,117 @@ class TableItem(QGraphicsRectItem):
         border_pen = QPen(self.custom_header_color, 1)
         if self.isSelected():
             border_pen = QPen(COLOR_ACCENT_PINK, 2)
-            self.glow.setColor(QColor(255, 0, 255, 150))
         else:
             border_pen = QPen(QColor(255, 255, 255, 40), 1)
-            self.glow.setColor(QColor(0, 0, 0, 100))
 
         painter.setBrush(Qt.NoBrush)
         painter.setPen(border_pen)
         painter.drawRoundedRect(r, radius, radius)
 
+    def bind_record(self, record: TableRecord):
+        """Привязывает элемент (новый или взятый из пула) к легкой записи таблицы."""
+        self.record = record
+        self.diagram_object_id = record.diagram_object_id
+        self.table_id = record.table_id
+        self.custom_header_color = QColor(record.color) if record.color else COLOR_ACCENT_CYAN
+        self.setPos(record.x, record.y)
+        if self.text._target_text != record.name:
+            self.text.set_text_immediately(record.name)
+        self.set_columns(record.columns)
+        self.invalidate_render_cache()
+
     def setColor(self, color: QColor):
         if color.isValid():
             self.custom_header_color = color
-            self.update()
-            self.diagram_controller.update_table_color(self.diagram_object_id, color.name())
+            if self.record:
+                self.record.color = color.name()
+            self.invalidate_render_cache()
+            if self.scene():
+                self.scene().views()[0].write_queue.update_color(self.diagram_object_id, color.name())
 
     def mouseDoubleClickEvent(self, event):
         super().mouseDoubleClickEvent(event)
-        dialog = TableEditorDialog(self.table_id, self.scene().views()[0])
-        if dialog.exec() == QDialog.Accepted:
-            self.update_layout()
-            table_ctrl = TableController()
-            fresh_table = table_ctrl.get_table_details(self.table_id)
-            if fresh_table:
-                # Триггерим Breach Protocol анимацию при изменении имени
-                self.text.setPlainText(fresh_table.table_name)
-            view = self.scene().views()[0]
-            if hasattr(view, 'redraw_all_relationships'):
-                view.redraw_all_relationships()
+        # Редактор читает колонки из БД - сначала дописываем отложенные правки
+        self.scene().views()[0].write_queue.flush(wait=True)
+        with ui_action(ACTION_TABLE_EDIT):
+            dialog = TableEditorDialog(self.table_id, self.scene().views()[0])
+            if dialog.exec() == QDialog.Accepted:
+                view = self.scene().views()[0]
+                diff = dialog.column_diff
+                if diff is not None:
+                    self.apply_column_diff(diff)
+                else:
+                    self.update_layout()
+                if dialog.saved_name is not None:
+                    self.text.setPlainText(dialog.saved_name)
+                    if self.record:
+                        self.record.name = dialog.saved_name
+                    self.invalidate_render_cache()
+                rel_ids = list(view.edges_by_table.get(self.table_id, ()))
+                deleted = set(diff['deleted']) if diff is not None else set()
+                if deleted and any(view.edge_records[rel_id].start_column_id in deleted
+                                   or view.edge_records[rel_id].end_column_id in deleted
+                                   for rel_id in rel_ids):
+                    # Удаленная колонка была концом связи - связи в БД изменились
+                    view.redraw_all_relationships()
+                else:
+                    # Набор связей прежний, сдвинулись только порты колонок этой таблицы
+                    view._refresh_edge_geometry(rel_ids)
+                    for line in view.connections.for_table(self.table_id):
+                        line.update_position()
         event.accept()
 
-    def add_column(self, name: str, column_id: int, column_info: dict = None):
-        col = ColumnItem(name, self, column_id, column_info, self.width)
-        self.columns.append(col)
-        self.scene().views()[0].add_column_to_map(col)
+    def set_columns(self, columns_data: list[dict]):
+        """
+        Приводит дочерние ColumnItem к списку columns_data, переиспользуя уже созданные элементы.
+        columns_data - словари {'id', 'name', 'type', 'pk', 'nn', 'fk'}.
+        """
+        view = self.scene().views()[0]
+        # Колонки с тем же id остаются своими элементами и обновляются, только если изменились;
+        # элементы удаленных колонок переиспользуются под новые
+        by_id = {col.column_id: col for col in self.columns}
+        wanted_ids = {info['id'] for info in columns_data}
+        spare = [col for col in self.columns if col.column_id not in wanted_ids]
+        columns = []
+        for i, info in enumerate(columns_data):
+            col = by_id.get(info['id'])
+            if col is None:
+                if spare:
+                    col = spare.pop()
+                    view.remove_column_from_map(col)
+                    col.set_data(info)
+                else:
+                    col = ColumnItem(info['name'], self, info['id'], info, self.width)
+                    col.setVisible(not self.simplified)
+                view.add_column_to_map(col)
+            elif not col.matches(info):
+                col.set_data(info)
+            y = HEADER_HEIGHT + i * self.row_height
+            if col.y() != y:
+                col.setY(y)
+            columns.append(col)
+        for col in spare:
+            view.remove_column_from_map(col)
+            self.scene().removeItem(col)
+        self.columns = columns
+
+        height = HEADER_HEIGHT + len(self.columns) * self.row_height + FOOTER_HEIGHT
+        if self.rect().height() != height:
+            self.setRect(0, 0, self.width, height)
+            self.invalidate_render_cache()
+        if self.record:
+            self.record.set_columns(columns_data)
+
+    def apply_column_diff(self, diff: dict):
+        """Применяет результат TableController.sync_columns_for_table без повторного чтения колонок."""
+        fk_ids = {c['id'] for c in self.record.columns if c.get('fk')} if self.record else set()
+        self.set_columns([dict(col, fk=col['id'] in fk_ids) for col in diff['columns']])
 
     def update_layout(self):
-        for item in self.childItems():
-            if isinstance(item, ColumnItem):
-                self.scene().views()[0].remove_column_from_map(item)
-                self.scene().removeItem(item)
-        self.columns.clear()
         table_ctrl = TableController()
-        fresh_columns = table_ctrl.get_columns_for_table(self.table_id)
-        for col_data in fresh_columns:
-            info = {'type': col_data.data_type, 'pk': col_data.is_primary_key, 'nn': not col_data.is_nullable}
-            self.add_column(col_data.column_name, col_data.column_id, info)
-        height = 30 + len(self.columns) * self.row_height + 10
-        self.setRect(0, 0, self.width, height)
-        for i, col in enumerate(self.columns):
-            col.setY(30 + i * self.row_height)
-
-    def mouseReleaseEvent(self, event):
-        super().mouseReleaseEvent(event)
-        if event.button() == Qt.LeftButton and event.scenePos() != event.lastScenePos():
-            pos = self.pos()
-            self.diagram_controller.update_table_position(self.diagram_object_id, int(pos.x()), int(pos.y()))
+        fk_ids = {c['id'] for c in self.record.columns if c.get('fk')} if self.record else set()
+        self.set_columns([column_data_from_model(col, col.column_id in fk_ids)
+                          for col in table_ctrl.get_columns_for_table(self.table_id)])
 
     def hoverEnterEvent(self, event):
         for col in self.columns:
@@ -349,12 +619,10 @@ class TableItem(QGraphicsRectItem):
         super().hoverLeaveEvent(event)
 
     def itemChange(self, change, value):
-        if change == QGraphicsItem.ItemPositionHasChanged:
-            for column in self.columns:
-                for port in [column.left_port, column.right_port]:
-                    if hasattr(port, 'connections'):
-                        for connection in port.connections:
-                            connection.update_position()
+        if change == QGraphicsItem.ItemPositionHasChanged and self.scene():
+            self.scene().views()[0].update_connections_for_table(self)
+        elif change == QGraphicsItem.ItemSelectedHasChanged:
+            self.invalidate_render_cache()
         return super().itemChange(change, value)
 
 
@@ -362,6 +630,11 @@ class ConnectionLine(QGraphicsPathItem):
     def __init__(self, start_port, end_port, relationship_id=None):
         super().__init__()
         self.start_port, self.end_port, self.relationship_id = start_port, end_port, relationship_id
+        # Ключи для ConnectionIndex
+        self.start_column_id = start_port.column.column_id
+        self.end_column_id = end_port.column.column_id
+        self.start_table_id = start_port.column.parent_table.table_id
+        self.end_table_id = end_port.column.parent_table.table_id
 
         self.dash_offset = 0
 
@@ -377,53 +650,50 @@ class ConnectionLine(QGraphicsPathItem):
         self.setFlag(QGraphicsItem.ItemIsSelectable, True)
         self.setZValue(-1)
 
-        self.glow = QGraphicsDropShadowEffect()
-        self.glow.setBlurRadius(10)
-        self.glow.setColor(COLOR_ACCENT_CYAN)
-        self.glow.setEnabled(False)
-        self.setGraphicsEffect(self.glow)
-
-        for port in [start_port, end_port]:
-            if not hasattr(port, 'connections'):
-                port.connections = []
-            port.connections.append(self)
+        # Свечение выделенной линии - широкие полупрозрачные штрихи под основным
+        self.glow_enabled = False
         self.update_position()
 
-    def advance_phase(self):
-        self.dash_offset -= 1
+    def advance_phase(self, steps: float = 1.0):
+        self.dash_offset -= steps
         if self.isSelected():
-            self.dash_offset -= 2
+            self.dash_offset -= 2 * steps
 
+    def boundingRect(self) -> QRectF:
+        pad = LINE_GLOW_WIDTH / 2
+        return super().boundingRect().adjusted(-pad, -pad, pad, pad)
+
+    @profiled_paint("ConnectionLine")
     def paint(self, painter, option, widget=None):
         painter.setRenderHint(QPainter.Antialiasing)
+        if self.glow_enabled:
+            painter.setBrush(Qt.NoBrush)
+            glow_color = QColor(COLOR_ACCENT_CYAN)
+            for width, alpha in ((LINE_GLOW_WIDTH, 40), (LINE_GLOW_WIDTH * 0.6, 70)):
+                glow_color.setAlpha(alpha)
+                painter.setPen(QPen(glow_color, width, Qt.SolidLine, Qt.RoundCap, Qt.RoundJoin))
+                painter.drawPath(self.path())
         current_pen = self.pen()
         current_pen.setDashOffset(self.dash_offset)
         painter.setPen(current_pen)
         painter.drawPath(self.path())
 
     def update_position(self):
-        path = QPainterPath()
-        start_p = self.start_port.scenePos()
-        end_p = self.end_port.scenePos()
-        path.moveTo(start_p)
-        dx = end_p.x() - start_p.x()
-        offset = min(abs(dx) * 0.5, 100.0)
-        if abs(dx) < 50: offset = 50
-        start_offset = offset if self.start_port.side == 'right' else -offset
-        end_offset = -offset if self.end_port.side == 'left' else offset
-        control1 = QPointF(start_p.x() + start_offset, start_p.y())
-        control2 = QPointF(end_p.x() + end_offset, end_p.y())
-        path.cubicTo(control1, control2, end_p)
-        self.setPath(path)
+        self.setPath(build_connection_path(self.start_port.scenePos(), self.start_port.side,
+                                           self.end_port.scenePos(), self.end_port.side))
 
     def itemChange(self, change, value):
         if change == QGraphicsItem.ItemSelectedChange:
             self.set_highlighted(value)
+            if not value and self.scene():
+                # В пакетном режиме снятая с выделения линия возвращается в общий слой
+                self.scene().views()[0].schedule_edge_demotion(self.relationship_id)
         return super().itemChange(change, value)
 
     def set_highlighted(self, highlighted: bool):
         self.setPen(self.highlight_pen if highlighted else self.default_pen)
-        self.glow.setEnabled(highlighted)
+        self.glow_enabled = highlighted
+        self.update()
         self.start_port.set_highlighted(highlighted)
         self.start_port.column.set_highlighted(highlighted)
         self.end_port.set_highlighted(highlighted)
@@ -450,31 +720,56 @@ class DiagramView(QGraphicsView):
         self._previous_drag_mode = QGraphicsView.RubberBandDrag
 
         self.controller = None
+        self.write_queue: WriteBehindQueue = None
         self.current_diagram = None
         self.main_window: QMainWindow = None
         self.setAcceptDrops(True)
         self.table_items: Dict[int, TableItem] = {}
         self.column_map: Dict[int, ColumnItem] = {}
+        self.connections = ConnectionIndex()
         self.first_port: PortItem = None
         self.default_table_color = self.load_default_color()
 
+        # --- ВИРТУАЛИЗАЦИЯ ---
+        # Легкие записи хранятся для всех таблиц и связей, а TableItem - только для видимых
+        self.table_records: Dict[int, TableRecord] = {}
+        self.edge_records: Dict[int, EdgeRecord] = {}
+        self.edges_by_table: Dict[int, set] = {}
+        self.spatial_index = SpatialGrid()
+        self.virtualization_enabled = self.load_virtualization_enabled()
+        self._table_item_pool: list[TableItem] = []
+        self.virtual_layer = VirtualTablesLayer(self)
+        self.scene.addItem(self.virtual_layer)
+        self._virtual_update_timer = QTimer(self)
+        self._virtual_update_timer.setSingleShot(True)
+        self._virtual_update_timer.timeout.connect(self.update_materialized_tables)
+
+        # --- ПАКЕТНЫЕ СВЯЗИ ---
+        # В пакетном режиме живые ConnectionLine создаются только для выделенных связей
+        self.edge_render_mode = self.load_edge_render_mode()
+        self.batched_edges = False
+        self.promoted_edges: set[int] = set()
+        self.edge_layer = EdgeBatchLayer(self)
+        self.scene.addItem(self.edge_layer)
+
+        # --- КЭШ ОТРИСОВКИ ---
+        self.render_cache_enabled = self.load_render_cache_enabled()
+        QPixmapCache.setCacheLimit(self.load_render_cache_limit_kb())
+
+        # --- УРОВЕНЬ ДЕТАЛИЗАЦИИ ---
+        self.lod_threshold = self.load_lod_threshold()
+        self.is_simplified = False
+
         # --- АНИМАЦИЯ И ЧАСТИЦЫ ---
-        self.animation_timer = QTimer(self)
-        self.animation_timer.timeout.connect(self.animate_scene)
-        self.animation_timer.start(10)
-
-        self.grid_offset = QPointF(0, 0)
-
-        # --- ЗВЕЗДЫ ---
-        self.stars = []
-        for _ in range(2000):
-            self.stars.append([
-                random.randint(-6000, 6000),
-                random.randint(-6000, 6000),
-                random.uniform(0.2, 1.5),
-                random.randint(1, 3),
-                random.randint(50, 150)
-            ])
+        # Общие часы сами снижают частоту и засыпают при простое/сворачивании окна
+        self.clock = AnimationClock.instance()
+        self.clock.subscribe(self.animate_scene, ambient=True)
+
+        # --- ЗВЕЗДЫ И СЕТКА ---
+        self.background = StarfieldBackground(COLOR_BG_DARK, COLOR_GRID_LINE)
+
+        # --- ПРОФАЙЛЕР КАДРОВ ---
+        self.profiler = FrameProfiler.instance()
 
         # --- GLITCH EFFECT ---
         self.is_glitching = False
@@ -483,18 +778,17 @@ class DiagramView(QGraphicsView):
         self.glitch_counter = 0
         self.glitch_pixmap: QPixmap = None
 
-    def animate_scene(self):
-        self.grid_offset += QPointF(0.5, 0.5)
+    def animate_scene(self, dt_ms: float = ANIMATION_STEP_MS):
+        # Скорости исходно подобраны под шаг 10 мс, поэтому масштабируем их по фактическому dt
+        steps = dt_ms / ANIMATION_STEP_MS
 
-        for star in self.stars:
-            star[0] += star[2]
-            star[1] += star[2]
-            if star[0] > 6000: star[0] = -6000
-            if star[1] > 6000: star[1] = -6000
+        if self.clock.animate_background:
+            self.background.advance(steps)
 
-        for item in self.scene.items():
-            if isinstance(item, ConnectionLine):
-                item.advance_phase()
+        for line in self.connections:
+            line.advance_phase(steps)
+        if self.batched_edges:
+            self.edge_layer.advance_phase(steps)
 
         self.viewport().update()
 
@@ -503,6 +797,40 @@ class DiagramView(QGraphicsView):
         color_name = settings.value("default_table_color", COLOR_ACCENT_CYAN.name())
         return QColor(color_name)
 
+    def load_lod_threshold(self) -> float:
+        settings = QSettings("MyCompany", "VisualDBDesigner")
+        return float(settings.value("lod_scale_threshold", DEFAULT_LOD_SCALE_THRESHOLD))
+
+    def load_virtualization_enabled(self) -> bool:
+        settings = QSettings("MyCompany", "VisualDBDesigner")
+        return settings.value("virtual_scene_enabled", True, type=bool)
+
+    def load_render_cache_enabled(self) -> bool:
+        settings = QSettings("MyCompany", "VisualDBDesigner")
+        return settings.value("table_render_cache", True, type=bool)
+
+    def load_render_cache_limit_kb(self) -> int:
+        settings = QSettings("MyCompany", "VisualDBDesigner")
+        return int(settings.value("render_cache_limit_kb", DEFAULT_RENDER_CACHE_LIMIT_KB))
+
+    def load_edge_render_mode(self) -> str:
+        settings = QSettings("MyCompany", "VisualDBDesigner")
+        mode = settings.value("edge_render_mode", DEFAULT_EDGE_RENDER_MODE)
+        return mode if mode in ('auto', 'items', 'batched') else DEFAULT_EDGE_RENDER_MODE
+
+    @property
+    def virtualization_active(self) -> bool:
+        return self.virtualization_enabled and len(self.table_records) >= VIRTUALIZATION_MIN_TABLES
+
+    def update_level_of_detail(self):
+        """Включает/выключает упрощенную отрисовку таблиц в зависимости от текущего масштаба."""
+        simplified = self.transform().m11() < self.lod_threshold
+        if simplified == self.is_simplified:
+            return
+        self.is_simplified = simplified
+        for table_item in self.table_items.values():
+            table_item.set_simplified(simplified)
+
     def save_default_color(self, color: QColor):
         settings = QSettings("MyCompany", "VisualDBDesigner")
         settings.setValue("default_table_color", color.name())
@@ -511,12 +839,12 @@ class DiagramView(QGraphicsView):
                                 f"Цвет {color.name()} установлен как цвет по умолчанию для новых таблиц.")
 
     def save_project_state(self, silent=True):
-        if not self.controller or not self.table_items: return
-        for table_item in self.table_items.values():
-            pos = table_item.pos()
-            self.controller.update_table_position(table_item.diagram_object_id, int(pos.x()), int(pos.y()))
+        if not self.controller or not self.table_records: return
+        # Позиции и цвета уже стоят в очереди отложенной записи - дописываем их сейчас
         if self.current_diagram:
-            self.controller.update_project_timestamp(self.current_diagram.project_id)
+            self.write_queue.touch_project(self.current_diagram.project_id)
+        if not self.write_queue.flush(wait=True):
+            return
         if not silent:
             if self.main_window:
                 self.main_window.statusBar().showMessage("SYSTEM SAVED. DATA ENCRYPTED.", 3000)
@@ -571,6 +899,10 @@ class DiagramView(QGraphicsView):
             if self.first_port:
                 self.first_port.set_highlighted(False)
                 self.first_port = None
+            if self.batched_edges:
+                rel_id = self.edge_layer.hit_test(self.mapToScene(event.pos()))
+                if rel_id is not None:
+                    self.promote_edge(rel_id)
         elif isinstance(item, PortItem):
             if not self.first_port:
                 self.first_port = item
@@ -593,6 +925,9 @@ class DiagramView(QGraphicsView):
             return
 
         super().mouseReleaseEvent(event)
+        # Перетаскивание закончилось - связи таблиц возвращаются в слитые пути
+        if self.batched_edges:
+            self.edge_layer.cool_down()
 
     def dragEnterEvent(self, event):
         if event.mimeData().hasText():
@@ -612,7 +947,7 @@ class DiagramView(QGraphicsView):
             if data_str.startswith("table_id:"):
                 try:
                     table_id = int(data_str.split(":")[1])
-                    if table_id in self.table_items:
+                    if table_id in self.table_records:
                         QMessageBox.information(self, "Внимание", "Эта таблица уже находится на диаграмме.")
                         return
                     drop_pos = self.mapToScene(event.position().toPoint())
@@ -632,66 +967,274 @@ class DiagramView(QGraphicsView):
             event.ignore()
 
     def clear_diagram(self):
+        for item in list(self.table_items.values()) + self._table_item_pool:
+            item.release_render_cache()
         self.scene.clear()
         self.table_items.clear()
         self.column_map.clear()
+        self.connections.clear()
+        self.table_records.clear()
+        self.edge_records.clear()
+        self.edges_by_table.clear()
+        self.spatial_index.clear()
+        self._table_item_pool.clear()
+        self.promoted_edges.clear()
         self.first_port = None
+        # scene.clear() удалил и виртуальный слой, и слой связей
+        self.virtual_layer = VirtualTablesLayer(self)
+        self.scene.addItem(self.virtual_layer)
+        self.edge_layer = EdgeBatchLayer(self)
+        self.scene.addItem(self.edge_layer)
 
     def set_main_window(self, main_window: QMainWindow):
         self.main_window = main_window
 
     def set_controller(self, controller):
         self.controller = controller
+        if self.write_queue is not None:
+            self.write_queue.shutdown()
+        self.write_queue = WriteBehindQueue(controller, parent=self)
 
     def add_column_to_map(self, col):
         self.column_map[col.column_id] = col
 
     def remove_column_from_map(self, col):
-        if col.column_id in self.column_map:
+        # Запись могла уже перейти к элементу, заново материализовавшему ту же таблицу
+        if self.column_map.get(col.column_id) is col:
             del self.column_map[col.column_id]
 
-    def load_diagram_data(self, diagram, diagram_objects, relationships):
+    def load_diagram_data(self, diagram, snapshot: dict):
+        """Строит диаграмму из снимка DiagramController.get_diagram_snapshot, не обращаясь к БД."""
         self.clear_diagram()
         self.current_diagram = diagram
-        for d_obj in diagram_objects:
-            table = d_obj.table
-            item = TableItem(
-                name=table.table_name, x=d_obj.pos_x, y=d_obj.pos_y,
-                diagram_object_id=d_obj.object_id, table_id=table.table_id,
-                controller=self.controller, color=d_obj.color
-            )
-            self.scene.addItem(item)
-            self.table_items[table.table_id] = item
-            item.update_layout()
+        relationships = snapshot['relationships']
+        self.batched_edges = (self.edge_render_mode == 'batched' or
+                              (self.edge_render_mode == 'auto' and len(relationships) >= BATCHED_EDGES_MIN))
+        for table in snapshot['tables']:
+            self.add_table_record(TableRecord(
+                table['object_id'], table['table_id'], table['name'], table['x'], table['y'],
+                color=table['color'], columns=table['columns']
+            ))
+        # Сначала материализуем видимые таблицы, чтобы связи сразу получили живые линии
+        self.update_materialized_tables()
         self.draw_relationships(relationships)
-
-    def draw_relationships(self, relationships):
+        self.clock.set_scene_size(len(self.scene.items()))
+
+    # --- ВИРТУАЛЬНАЯ СЦЕНА ---
+
+    def add_table_record(self, record: TableRecord):
+        self.table_records[record.table_id] = record
+        self.spatial_index.insert(record.table_id, record.rect())
+
+    def remove_table_record(self, table_id: int):
+        """Убирает таблицу с диаграммы вместе с ее элементами, линиями и записями связей."""
+        if table_id in self.table_items:
+            self.dematerialize_table(table_id, recycle=False)
+        self.table_records.pop(table_id, None)
+        self.spatial_index.remove(table_id)
+        removed = self.edges_by_table.pop(table_id, set())
+        for rel_id in removed:
+            self.remove_edge_record(rel_id)
+
+    def materialize_table(self, record: TableRecord) -> TableItem:
+        """Создает (или берет из пула) полноценный TableItem для записи и рисует его живые связи."""
+        if self._table_item_pool:
+            item = self._table_item_pool.pop()
+        else:
+            item = TableItem(record.name, record.x, record.y, record.diagram_object_id, record.table_id,
+                             self.controller, color=record.color)
+        self.scene.addItem(item)
+        self.table_items[record.table_id] = item
+        item.render_cache_enabled = self.render_cache_enabled
+        item.bind_record(record)
+        item.set_simplified(self.is_simplified)
+
+        rel_ids = self.edges_by_table.get(record.table_id, ())
+        for rel_id in rel_ids:
+            self._add_line_for_edge(self.edge_records[rel_id])
+        self._refresh_edge_geometry(rel_ids)
+        return item
+
+    def dematerialize_table(self, table_id: int, recycle: bool = True):
+        item = self.table_items.pop(table_id, None)
+        if item is None:
+            return
+        for line in self.connections.for_table(table_id):
+            self.remove_connection_line(line)
+        # Колонки удаляются вместе с элементом: элемент из пула не должен нести колонки чужой таблицы
+        for col in item.columns:
+            self.remove_column_from_map(col)
+            self.scene.removeItem(col)
+        item.columns = []
+        if self.first_port and self.first_port.column.parent_table is item:
+            self.first_port = None
+        self.scene.removeItem(item)
+        item.release_render_cache()
+        if recycle and len(self._table_item_pool) < MAX_TABLE_ITEM_POOL:
+            self._table_item_pool.append(item)
+        self._refresh_edge_geometry(self.edges_by_table.get(table_id, ()))
+
+    def _schedule_virtual_update(self):
+        if self.virtualization_active and not self._virtual_update_timer.isActive():
+            self._virtual_update_timer.start(VIRTUAL_UPDATE_DELAY_MS)
+
+    def update_materialized_tables(self):
+        """Материализует таблицы рядом с видимой областью и освобождает дальние."""
+        if not self.virtualization_active:
+            wanted = keep = set(self.table_records)
+        else:
+            visible = self.mapToScene(self.viewport().rect()).boundingRect()
+            size = max(visible.width(), visible.height())
+            m_in, m_out = size * VIRTUAL_MATERIALIZE_MARGIN, size * VIRTUAL_RELEASE_MARGIN
+            wanted = self.spatial_index.query(visible.adjusted(-m_in, -m_in, m_in, m_in))
+            keep = self.spatial_index.query(visible.adjusted(-m_out, -m_out, m_out, m_out))
+
+        grabber = self.scene.mouseGrabberItem()
+        for table_id, item in list(self.table_items.items()):
+            if table_id not in keep and not item.isSelected() and item is not grabber:
+                self.dematerialize_table(table_id)
+        for table_id in wanted:
+            if table_id not in self.table_items:
+                self.materialize_table(self.table_records[table_id])
+
+    def materialize_all_tables(self):
+        for table_id, record in self.table_records.items():
+            if table_id not in self.table_items:
+                self.materialize_table(record)
+
+    def scrollContentsBy(self, dx, dy):
+        super().scrollContentsBy(dx, dy)
+        self._schedule_virtual_update()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._schedule_virtual_update()
+
+    # --- СВЯЗИ ---
+
+    def add_edge_record(self, edge: EdgeRecord):
+        self.edge_records[edge.relationship_id] = edge
+        for table_id in (edge.start_table_id, edge.end_table_id):
+            self.edges_by_table.setdefault(table_id, set()).add(edge.relationship_id)
+        # Конечная колонка связи - внешний ключ
+        self.set_column_fk(edge.end_table_id, edge.end_column_id, True)
+
+    def set_column_fk(self, table_id: int, column_id: int, is_fk: bool):
+        """Обновляет признак FK колонки и в записи таблицы, и в живом ColumnItem (если он есть)."""
+        record = self.table_records.get(table_id)
+        if record:
+            for col in record.columns:
+                if col['id'] == column_id:
+                    col['fk'] = is_fk
+        col_item = self.column_map.get(column_id)
+        if col_item and col_item.is_fk != is_fk:
+            col_item.is_fk = is_fk
+            col_item._update_text_layout()
+
+    def remove_edge_record(self, relationship_id: int):
+        edge = self.edge_records.pop(relationship_id, None)
+        if edge is None:
+            return
+        for table_id in (edge.start_table_id, edge.end_table_id):
+            rel_ids = self.edges_by_table.get(table_id)
+            if rel_ids:
+                rel_ids.discard(relationship_id)
+        line = self.connections.get(relationship_id)
+        if line:
+            self.remove_connection_line(line)
+        # Записи уже нет - слои убирают ее путь из геометрии и индекса попаданий
+        self._refresh_edge_geometry([relationship_id])
+
+    def _refresh_edge_geometry(self, relationship_ids):
+        """Пересчитывает пути связей в слоях, рисующих их по сохраненной геометрии."""
+        relationship_ids = list(relationship_ids)
+        self.virtual_layer.refresh_edges(relationship_ids)
+        if self.batched_edges:
+            self.edge_layer.refresh_edges(relationship_ids)
+
+    def _add_line_for_edge(self, edge: EdgeRecord):
+        if self.connections.get(edge.relationship_id):
+            return
+        if self.batched_edges and edge.relationship_id not in self.promoted_edges:
+            return
+        start_col_item = self.column_map.get(edge.start_column_id)
+        end_col_item = self.column_map.get(edge.end_column_id)
+        if start_col_item and end_col_item:
+            start_port = start_col_item.left_port if edge.start_side == 'left' else start_col_item.right_port
+            end_port = end_col_item.right_port if edge.end_side == 'right' else end_col_item.left_port
+            self.add_connection_line(ConnectionLine(start_port, end_port, edge.relationship_id))
+
+    def draw_relationships(self, relationships: list[dict]):
+        """relationships - словари из DiagramController.get_relationships_snapshot."""
         for rel in relationships:
-            if not rel.relationship_columns: continue
-            rel_col = rel.relationship_columns[0]
-            start_col_item = self.column_map.get(rel_col.start_column_id)
-            end_col_item = self.column_map.get(rel_col.end_column_id)
-            if start_col_item and end_col_item:
-                start_port = start_col_item.left_port if rel_col.start_port_side == 'left' else start_col_item.right_port
-                end_port = end_col_item.right_port if rel_col.end_port_side == 'right' else end_col_item.left_port
-                self.scene.addItem(ConnectionLine(start_port, end_port, rel.relationship_id))
-                end_col_item.is_fk = True
-                end_col_item._update_and_elide_text()
+            if rel['start_table_id'] not in self.table_records or rel['end_table_id'] not in self.table_records:
+                continue
+            edge = EdgeRecord(rel['id'], rel['start_table_id'], rel['start_column_id'], rel['start_side'],
+                              rel['end_table_id'], rel['end_column_id'], rel['end_side'])
+            self.add_edge_record(edge)
+            self._add_line_for_edge(edge)
+        self.virtual_layer.rebuild()
+        if self.batched_edges:
+            self.edge_layer.rebuild()
+
+    def add_connection_line(self, line: ConnectionLine):
+        self.scene.addItem(line)
+        self.connections.add(line)
+
+    def remove_connection_line(self, line: ConnectionLine):
+        self.connections.remove(line)
+        if line.scene() is self.scene:
+            self.scene.removeItem(line)
+        if line.relationship_id in self.promoted_edges:
+            self.promoted_edges.discard(line.relationship_id)
+            self.edge_layer.set_excluded(line.relationship_id, False)
+
+    def promote_edge(self, relationship_id: int):
+        """Выносит связь из пакетного слоя в отдельную выделенную ConnectionLine."""
+        edge = self.edge_records.get(relationship_id)
+        if edge is None:
+            return
+        self.promoted_edges.add(relationship_id)
+        self._add_line_for_edge(edge)
+        line = self.connections.get(relationship_id)
+        if line is None:
+            # Концы связи не материализованы - оставляем ее в слое
+            self.promoted_edges.discard(relationship_id)
+            return
+        self.edge_layer.set_excluded(relationship_id, True)
+        line.setSelected(True)
+
+    def schedule_edge_demotion(self, relationship_id: int):
+        if relationship_id in self.promoted_edges:
+            # Удалять элемент прямо из его itemChange нельзя
+            QTimer.singleShot(0, lambda: self.demote_edge(relationship_id))
+
+    def demote_edge(self, relationship_id: int):
+        line = self.connections.get(relationship_id)
+        if line is not None and relationship_id in self.promoted_edges and not line.isSelected():
+            self.remove_connection_line(line)
 
     def redraw_all_relationships(self):
-        items_to_remove = [item for item in self.scene.items() if isinstance(item, ConnectionLine)]
-        for item in items_to_remove:
-            self.scene.removeItem(item)
+        for rel_id in list(self.edge_records):
+            self.remove_edge_record(rel_id)
         if self.controller and self.current_diagram:
-            relationships = self.controller.get_relationships_for_project(self.current_diagram.project_id)
+            relationships = self.controller.get_relationships_snapshot(self.current_diagram.project_id)
             self.draw_relationships(relationships)
 
     def update_connections_for_table(self, table_item: TableItem):
-        for column in table_item.columns:
-            for port in [column.left_port, column.right_port]:
-                if hasattr(port, 'connections'):
-                    for connection in port.connections:
-                        connection.update_position()
+        record = table_item.record
+        if record:
+            pos = table_item.pos()
+            if (record.x, record.y) != (pos.x(), pos.y()):
+                record.x, record.y = pos.x(), pos.y()
+                self.spatial_index.update(record.table_id, record.rect())
+                self.write_queue.update_position(record.diagram_object_id, record.x, record.y)
+                rel_ids = self.edges_by_table.get(record.table_id, ())
+                if self.batched_edges:
+                    self.edge_layer.mark_hot(rel_ids)
+                self._refresh_edge_geometry(rel_ids)
+        for line in self.connections.for_table(table_item.table_id):
+            line.update_position()
 
     def create_relationship(self, start_port: PortItem, end_port: PortItem):
         start_col = start_port.column
@@ -708,15 +1251,17 @@ class DiagramView(QGraphicsView):
             msg_box.setStandardButtons(QMessageBox.Yes | QMessageBox.No)
             msg_box.setDefaultButton(QMessageBox.Yes)
             if msg_box.exec() != QMessageBox.Yes: return
-            self.controller.update_column_data_type(end_col.column_id, start_col.data_type)
+            self.write_queue.update_column_type(end_col.column_id, start_col.data_type)
             end_col.update_data_type(start_col.data_type)
 
         new_rel = self.controller.add_relationship(
             self.current_diagram.project_id, start_col.column_id, end_col.column_id, start_port.side, end_port.side)
         if new_rel:
-            self.scene.addItem(ConnectionLine(start_port, end_port, new_rel.relationship_id))
-            end_col.is_fk = True
-            end_col._update_and_elide_text()
+            edge = EdgeRecord(new_rel.relationship_id, start_col.parent_table.table_id, start_col.column_id,
+                              start_port.side, end_col.parent_table.table_id, end_col.column_id, end_port.side)
+            self.add_edge_record(edge)
+            self._add_line_for_edge(edge)
+            self._refresh_edge_geometry([edge.relationship_id])
 
     def contextMenuEvent(self, event):
         menu = QMenu(self)
@@ -762,24 +1307,30 @@ class DiagramView(QGraphicsView):
             table.setColor(new_color)
 
     def add_new_table(self, x, y):
-        name = f"New_Table_{len(self.table_items) + 1}"
+        name = f"New_Table_{len(self.table_records) + 1}"
         d_obj = self.controller.add_new_table_to_diagram(self.current_diagram.diagram_id,
                                                          self.current_diagram.project_id, name, int(x), int(y))
         if d_obj:
-            item = TableItem(
-                d_obj.table.table_name, d_obj.pos_x, d_obj.pos_y,
-                d_obj.object_id, d_obj.table.table_id, self.controller,
-                color=self.default_table_color.name()
+            record = TableRecord(
+                d_obj.object_id, d_obj.table.table_id, d_obj.table.table_name, d_obj.pos_x, d_obj.pos_y,
+                color=self.default_table_color.name(),
+                columns=[column_data_from_model(col) for col in d_obj.table.columns]
             )
+            self.add_table_record(record)
+            item = self.materialize_table(record)
             item.setColor(self.default_table_color)
-            self.scene.addItem(item)
-            self.table_items[d_obj.table.table_id] = item
-            item.update_layout()
             self.project_structure_changed.emit()
 
     def export_as_image(self, file_path: str) -> bool:
         try:
-            rect = self.scene.itemsBoundingRect()
+            if not self.table_records:
+                return False
+            # Для экспорта временно материализуем все таблицы, виртуальный слой не нужен
+            self.materialize_all_tables()
+            self.virtual_layer.setVisible(False)
+            rect = QRectF()
+            for record in self.table_records.values():
+                rect = rect.united(record.rect())
             rect.adjust(-50, -50, 50, 50)
             image = QImage(rect.size().toSize(), QImage.Format_ARGB32)
             image.fill(COLOR_BG_DARK)
@@ -791,27 +1342,30 @@ class DiagramView(QGraphicsView):
         except Exception as e:
             print(f"Ошибка при экспорте изображения: {e}")
             return False
+        finally:
+            self.virtual_layer.setVisible(True)
+            self.update_materialized_tables()
 
     def delete_selected_tables(self):
         items = [it for it in self.scene.selectedItems() if isinstance(it, TableItem)]
         if not items: return
         msg = f'Вы действительно хотите УДАЛИТЬ {len(items)} таблицу(ы)?'
         if QMessageBox.question(self, 'Удаление', msg) == QMessageBox.Yes:
-            structure_changed = False
+            # Отложенные правки удаляемых объектов писать уже некуда
             for item in items:
-                if hasattr(self.controller, 'delete_table_completely'):
-                    success = self.controller.delete_table_completely(item.table_id)
-                else:
-                    self.controller.delete_table_from_diagram(item.diagram_object_id)
-                    success = True
-                if success:
-                    self.scene.removeItem(item)
-                    if item.table_id in self.table_items:
-                        del self.table_items[item.table_id]
-                    structure_changed = True
-            if structure_changed:
+                self.write_queue.discard_object(item.diagram_object_id)
+            self.write_queue.flush(wait=True)
+            result = self.controller.delete_tables_completely([item.table_id for item in items])
+            if result is None:
+                QMessageBox.critical(self, 'Ошибка', 'Не удалось удалить таблицы.')
+                return
+            # Связи удаленных таблиц удалены в БД вместе с ними - убираем только их линии
+            for table_id in result['table_ids']:
+                self.remove_table_record(table_id)
+            for table_id, column_id in result['cleared_fk_columns']:
+                self.set_column_fk(table_id, column_id, False)
+            if result['table_ids']:
                 self.project_structure_changed.emit()
-                self.redraw_all_relationships()
 
     def delete_selected_lines(self):
         items = [it for it in self.scene.selectedItems() if isinstance(it, ConnectionLine)]
@@ -820,45 +1374,41 @@ class DiagramView(QGraphicsView):
             for item in items:
                 end_column = item.end_port.column
                 self.controller.delete_relationship(item.relationship_id)
-                self.scene.removeItem(item)
+                self.remove_edge_record(item.relationship_id)
                 is_still_fk = self.controller.is_column_foreign_key(end_column.column_id)
-                if end_column.is_fk != is_still_fk:
-                    end_column.is_fk = is_still_fk
-                    end_column._update_and_elide_text()
+                self.set_column_fk(item.end_table_id, end_column.column_id, is_still_fk)
+
+    def set_profiler_hud_visible(self, visible: bool):
+        self.profiler.set_enabled(visible)
+        self.viewport().update()
+
+    def paintEvent(self, event):
+        self.profiler.begin_frame()
+        super().paintEvent(event)
+        self.profiler.end_frame()
 
     def drawBackground(self, painter, rect):
-        painter.fillRect(rect, COLOR_BG_DARK)
-        # Рисуем звезды
-        for x, y, speed, size, opacity in self.stars:
-            if rect.left() <= x <= rect.right() and rect.top() <= y <= rect.bottom():
-                painter.setPen(Qt.NoPen)
-                painter.setBrush(QColor(255, 255, 255, opacity))
-                painter.drawEllipse(QPointF(x, y), size, size)
-
-        # Рисуем сетку
-        grid_size = 50
-        left = int(rect.left()) - (int(rect.left()) % grid_size)
-        top = int(rect.top()) - (int(rect.top()) % grid_size)
-        offset_x = self.grid_offset.x() % grid_size
-        offset_y = self.grid_offset.y() % grid_size
-        pen = QPen(COLOR_GRID_LINE, 1)
-        pen.setCosmetic(True)
-        painter.setPen(pen)
-        lines = []
-        x = left + offset_x - grid_size
-        while x < rect.right():
-            lines.append(QPointF(x, rect.top()))
-            lines.append(QPointF(x, rect.bottom()))
-            x += grid_size
-        y = top + offset_y - grid_size
-        while y < rect.bottom():
-            lines.append(QPointF(rect.left(), y))
-            lines.append(QPointF(rect.right(), y))
-            y += grid_size
-        painter.drawLines(lines)
+        if not self.profiler.enabled:
+            self.background.draw(painter, rect)
+            return
+        start = time.perf_counter()
+        self.background.draw(painter, rect)
+        self.profiler.add_paint_time("background", (time.perf_counter() - start) * 1000)
+
+    def _draw_profiler_hud(self, painter):
+        visible_rect = self.mapToScene(self.viewport().rect()).boundingRect()
+        self.profiler.set_item_counts(len(self.scene.items(visible_rect)), len(self.scene.items()))
+        self.profiler.extra["tables materialized"] = f"{len(self.table_items)} / {len(self.table_records)}"
+        self.profiler.extra["edges as items"] = f"{len(self.connections)} / {len(self.edge_records)}"
+        painter.save()
+        painter.resetTransform()
+        self.profiler.draw_hud(painter, QRectF(self.viewport().rect()))
+        painter.restore()
 
     def drawForeground(self, painter, rect):
         super().drawForeground(painter, rect)
+        if self.profiler.enabled:
+            self._draw_profiler_hud(painter)
         if not self.is_glitching or not self.glitch_pixmap:
             return
         scene_rect = self.mapToScene(self.viewport().rect()).boundingRect()
@@ -893,6 +1443,8 @@ class DiagramView(QGraphicsView):
             delta = event.angleDelta().y()
             zoom = 1.15 if delta > 0 else 1 / 1.15
             self.scale(zoom, zoom)
+            self.update_level_of_detail()
+            self._schedule_virtual_update()
         else:
             super().wheelEvent(event)
 
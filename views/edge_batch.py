@@ -0,0 +1,171 @@
+# views/edge_batch.py
+
+import math
+
+from PySide6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+from PySide6.QtCore import Qt, QRectF, QPointF
+from PySide6.QtGui import QColor, QPen, QPainterPath, QPainterPathStroker, QPainter
+
+from .frame_profiler import profiled_paint
+from .virtual_scene import SpatialGrid, build_edge_path
+
+# Размер ячейки, по которой сливаются пути: невидимые ячейки целиком пропускаются при отрисовке
+EDGE_CHUNK_SIZE = 2000
+# Допуск попадания мышью по линии (в координатах сцены)
+EDGE_HIT_TOLERANCE = 6
+
+
+class EdgeBatchLayer(QGraphicsItem):
+    """
+    Один элемент сцены, рисующий все невыделенные связи.
+    Пути связей сливаются в общие QPainterPath по стилю пера и по ячейкам сцены;
+    связи перемещаемых таблиц рисуются отдельно, пока перетаскивание не закончится.
+    Выделенные связи исключаются из слоя и показываются обычными ConnectionLine.
+    """
+
+    def __init__(self, view):
+        super().__init__()
+        self.view = view
+        self.setZValue(-1)
+        self.setAcceptedMouseButtons(Qt.NoButton)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+        default_pen = QPen(QColor(100, 100, 120), 2)
+        default_pen.setStyle(Qt.DashLine)
+        default_pen.setDashPattern([10, 10])
+        self.pens = {'default': default_pen}
+
+        self.dash_offset = 0
+        self._paths = {}        # relationship_id -> QPainterPath
+        self._styles = {}       # relationship_id -> ключ пера
+        self._excluded = set()  # выделенные (вынесенные в отдельные элементы) связи
+        self._hot = set()       # связи перетаскиваемых таблиц
+        self._chunks = {}       # (стиль, ячейка) -> [QPainterPath, QRectF]
+        self._dirty = True
+        self._hit_index = SpatialGrid(EDGE_CHUNK_SIZE // 4)
+
+    def boundingRect(self) -> QRectF:
+        return self.view.sceneRect()
+
+    def shape(self) -> QPainterPath:
+        # Попадание мышью обрабатывается через hit_test, а не средствами сцены
+        return QPainterPath()
+
+    # --- ГЕОМЕТРИЯ ---
+
+    def refresh_edges(self, relationship_ids):
+        for rel_id in relationship_ids:
+            edge = self.view.edge_records.get(rel_id)
+            path = build_edge_path(edge, self.view.table_records) if edge else None
+            if path is None:
+                self._paths.pop(rel_id, None)
+                self._styles.pop(rel_id, None)
+                self._excluded.discard(rel_id)
+                self._hot.discard(rel_id)
+                self._hit_index.remove(rel_id)
+            else:
+                self._paths[rel_id] = path
+                self._styles.setdefault(rel_id, 'default')
+                self._hit_index.update(rel_id, path.controlPointRect())
+            if rel_id not in self._hot:
+                self._dirty = True
+        self.update()
+
+    def rebuild(self):
+        self._paths.clear()
+        self._styles.clear()
+        self._hot.clear()
+        self._hit_index.clear()
+        self.refresh_edges(list(self.view.edge_records))
+
+    def clear(self):
+        self._paths.clear()
+        self._styles.clear()
+        self._excluded.clear()
+        self._hot.clear()
+        self._chunks.clear()
+        self._hit_index.clear()
+        self.update()
+
+    # --- СОСТОЯНИЕ СВЯЗЕЙ ---
+
+    def set_excluded(self, relationship_id: int, excluded: bool):
+        if excluded:
+            self._excluded.add(relationship_id)
+        else:
+            self._excluded.discard(relationship_id)
+        self._dirty = True
+        self.update()
+
+    def mark_hot(self, relationship_ids):
+        """Выносит связи из слитых путей на время перетаскивания, чтобы не пересобирать их каждый кадр."""
+        new_hot = set(relationship_ids) - self._hot
+        if new_hot:
+            self._hot |= new_hot
+            self._dirty = True
+
+    def cool_down(self):
+        if self._hot:
+            self._hot.clear()
+            self._dirty = True
+            self.update()
+
+    def advance_phase(self, steps: float = 1.0):
+        self.dash_offset -= steps
+
+    # --- СЛИЯНИЕ И ОТРИСОВКА ---
+
+    def _rebuild_chunks(self):
+        self._chunks.clear()
+        for rel_id, path in self._paths.items():
+            if rel_id in self._excluded or rel_id in self._hot:
+                continue
+            start = path.elementAt(0)
+            cell = (math.floor(start.x / EDGE_CHUNK_SIZE), math.floor(start.y / EDGE_CHUNK_SIZE))
+            key = (self._styles[rel_id], cell)
+            chunk = self._chunks.get(key)
+            if chunk is None:
+                self._chunks[key] = [QPainterPath(path), path.controlPointRect()]
+            else:
+                chunk[0].addPath(path)
+                chunk[1] = chunk[1].united(path.controlPointRect())
+        self._dirty = False
+
+    @profiled_paint("EdgeBatchLayer")
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
+        if self._dirty:
+            self._rebuild_chunks()
+        exposed = option.exposedRect
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setBrush(Qt.NoBrush)
+
+        pens = {}
+        for style, base_pen in self.pens.items():
+            pen = QPen(base_pen)
+            pen.setDashOffset(self.dash_offset)
+            pens[style] = pen
+
+        for (style, _), (path, bounds) in self._chunks.items():
+            if bounds.intersects(exposed):
+                painter.setPen(pens[style])
+                painter.drawPath(path)
+
+        for rel_id in self._hot:
+            path = self._paths.get(rel_id)
+            if path is not None and rel_id not in self._excluded:
+                painter.setPen(pens[self._styles[rel_id]])
+                painter.drawPath(path)
+
+    # --- ПОПАДАНИЕ МЫШЬЮ ---
+
+    def hit_test(self, scene_pos: QPointF, tolerance: float = EDGE_HIT_TOLERANCE) -> int | None:
+        """Возвращает relationship_id связи под точкой или None."""
+        area = QRectF(scene_pos.x() - tolerance, scene_pos.y() - tolerance, 2 * tolerance, 2 * tolerance)
+        stroker = QPainterPathStroker()
+        stroker.setWidth(2 * tolerance)
+        for rel_id in self._hit_index.query(area):
+            if rel_id in self._excluded:
+                continue
+            if stroker.createStroke(self._paths[rel_id]).contains(scene_pos):
+                return rel_id
+        return None
@@ -0,0 +1,197 @@
+# views/frame_profiler.py
+
+import functools
+import json
+import time
+from collections import defaultdict, deque
+
+from PySide6.QtCore import Qt, QRectF
+from PySide6.QtGui import QColor, QFont, QPainter
+
+# Сколько последних кадров учитывается в статистике
+PROFILER_WINDOW = 240
+
+HUD_FONT_SIZE = 9
+HUD_BG_COLOR = QColor(10, 10, 20, 200)
+HUD_TEXT_COLOR = QColor(166, 227, 161)
+
+
+def _percentile(values: list, percent: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class FrameProfiler:
+    """
+    Счетчики времени кадров DiagramView.
+    Кадр - один paintEvent вьюпорта; внутри него paint() элементов, помеченных
+    profiled_paint, суммируются по категориям. Пока профайлер выключен, обертки
+    сводятся к одной проверке флага.
+    """
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "FrameProfiler":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, window: int = PROFILER_WINDOW):
+        self.enabled = False
+        self.frame_times = deque(maxlen=window)      # длительность отрисовки кадра, мс
+        self.frame_starts = deque(maxlen=window)     # моменты начала кадров, с
+        self.paint_times = defaultdict(lambda: deque(maxlen=window))
+        self.paint_calls = defaultdict(lambda: deque(maxlen=window))
+        self.tick_costs = deque(maxlen=window)
+        self.visible_items = 0
+        self.total_items = 0
+        self.extra = {}
+        self._frame_start = None
+        self._current_times = defaultdict(float)
+        self._current_calls = defaultdict(int)
+
+    def set_enabled(self, enabled: bool):
+        self.enabled = enabled
+        if not enabled:
+            self.reset()
+
+    def reset(self):
+        self.frame_times.clear()
+        self.frame_starts.clear()
+        self.paint_times.clear()
+        self.paint_calls.clear()
+        self.tick_costs.clear()
+        self.extra.clear()
+
+    # --- ЗАМЕРЫ ---
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        self._frame_start = time.perf_counter()
+        self._current_times.clear()
+        self._current_calls.clear()
+
+    def end_frame(self):
+        if not self.enabled or self._frame_start is None:
+            return
+        self.frame_times.append((time.perf_counter() - self._frame_start) * 1000)
+        self.frame_starts.append(self._frame_start)
+        categories = set(self.paint_times) | set(self._current_times)
+        for category in categories:
+            self.paint_times[category].append(self._current_times.get(category, 0.0))
+            self.paint_calls[category].append(self._current_calls.get(category, 0))
+        self._frame_start = None
+
+    def add_paint_time(self, category: str, elapsed_ms: float):
+        self._current_times[category] += elapsed_ms
+        self._current_calls[category] += 1
+
+    def record_tick_cost(self, cost_ms: float):
+        if self.enabled:
+            self.tick_costs.append(cost_ms)
+
+    def set_item_counts(self, visible: int, total: int):
+        self.visible_items, self.total_items = visible, total
+
+    # --- СТАТИСТИКА ---
+
+    def fps(self) -> float:
+        if len(self.frame_starts) < 2:
+            return 0.0
+        span = self.frame_starts[-1] - self.frame_starts[0]
+        return (len(self.frame_starts) - 1) / span if span > 0 else 0.0
+
+    def snapshot(self) -> dict:
+        frames = list(self.frame_times)
+        paint = {}
+        for category, times in self.paint_times.items():
+            times = list(times)
+            calls = list(self.paint_calls[category])
+            paint[category] = {
+                "avg_ms": sum(times) / len(times) if times else 0.0,
+                "p95_ms": _percentile(times, 95),
+                "avg_calls": sum(calls) / len(calls) if calls else 0.0,
+            }
+        ticks = list(self.tick_costs)
+        return {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "frames": len(frames),
+            "fps": self.fps(),
+            "frame_ms": {
+                "avg": sum(frames) / len(frames) if frames else 0.0,
+                "p50": _percentile(frames, 50),
+                "p95": _percentile(frames, 95),
+                "p99": _percentile(frames, 99),
+                "max": max(frames) if frames else 0.0,
+            },
+            "paint": paint,
+            "items": {"visible": self.visible_items, "total": self.total_items},
+            "animation_tick_ms": {
+                "avg": sum(ticks) / len(ticks) if ticks else 0.0,
+                "p95": _percentile(ticks, 95),
+            },
+            **self.extra,
+        }
+
+    def dump_json(self, file_path: str):
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+
+    # --- HUD ---
+
+    def draw_hud(self, painter: QPainter, viewport_rect: QRectF):
+        """Рисует панель со статистикой в координатах вьюпорта."""
+        data = self.snapshot()
+        frame = data["frame_ms"]
+        lines = [
+            f"FPS {data['fps']:.1f}",
+            f"frame ms  avg {frame['avg']:.2f}  p50 {frame['p50']:.2f}  "
+            f"p95 {frame['p95']:.2f}  p99 {frame['p99']:.2f}",
+            f"items  visible {data['items']['visible']} / total {data['items']['total']}",
+            f"anim tick ms  avg {data['animation_tick_ms']['avg']:.2f}  "
+            f"p95 {data['animation_tick_ms']['p95']:.2f}",
+        ]
+        for key, value in self.extra.items():
+            lines.append(f"{key}  {value}")
+        for category, stats in sorted(data["paint"].items(), key=lambda kv: -kv[1]["avg_ms"]):
+            lines.append(f"{category:<18} {stats['avg_ms']:7.2f} ms  x{stats['avg_calls']:.0f}")
+
+        painter.save()
+        font = QFont("Consolas", HUD_FONT_SIZE)
+        painter.setFont(font)
+        line_height = painter.fontMetrics().height()
+        width = max(painter.fontMetrics().horizontalAdvance(line) for line in lines) + 20
+        panel = QRectF(viewport_rect.left() + 10, viewport_rect.top() + 10, width, line_height * len(lines) + 14)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(HUD_BG_COLOR)
+        painter.drawRect(panel)
+        painter.setPen(HUD_TEXT_COLOR)
+        for i, line in enumerate(lines):
+            painter.drawText(QRectF(panel.left() + 10, panel.top() + 7 + i * line_height, width, line_height),
+                             Qt.AlignLeft | Qt.AlignVCenter, line)
+        painter.restore()
+
+
+def profiled_paint(category: str):
+    """Декоратор для paint(): учитывает время отрисовки элемента в категории category."""
+
+    def decorator(paint):
+        @functools.wraps(paint)
+        def wrapper(self, *args, **kwargs):
+            profiler = FrameProfiler.instance()
+            if not profiler.enabled:
+                return paint(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return paint(self, *args, **kwargs)
+            finally:
+                profiler.add_paint_time(category, (time.perf_counter() - start) * 1000)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,151 @@
+# views/glow_cache.py
+
+import math
+from collections import OrderedDict
+
+from PySide6.QtWidgets import QGraphicsScene, QGraphicsPixmapItem, QGraphicsBlurEffect
+from PySide6.QtCore import Qt, QRectF, QPointF
+from PySide6.QtGui import QColor, QImage, QPainter, QPixmap
+
+# Бюджет памяти под готовые спрайты свечения
+GLOW_CACHE_BUDGET_BYTES = 16 * 1024 * 1024
+
+
+def glow_padding(blur_radius: float) -> int:
+    """На сколько свечение выходит за контур фигуры."""
+    return int(math.ceil(blur_radius))
+
+
+class GlowCache:
+    """
+    Кэш заранее размытых спрайтов свечения/тени.
+    Вместо QGraphicsDropShadowEffect, который размывает элемент в отдельном буфере
+    при каждой перерисовке, размытие выполняется один раз на ключ (форма, размер, цвет),
+    а элементы рисуют готовый спрайт сами. Для прямоугольников спрайт - nine-patch,
+    который растягивается на любой размер без повторного размытия.
+    """
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "GlowCache":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, budget_bytes: int = GLOW_CACHE_BUDGET_BYTES):
+        self.budget_bytes = budget_bytes
+        self._sprites = OrderedDict()
+        self._bytes = 0
+
+    # --- ОТРИСОВКА ---
+
+    def draw_rect_glow(self, painter: QPainter, rect: QRectF, corner_radius: float, blur_radius: float,
+                       color: QColor):
+        """Рисует свечение скругленного прямоугольника rect (как тень со смещением 0)."""
+        pad = glow_padding(blur_radius)
+        sprite, margin = self._rect_sprite(int(corner_radius), pad, color)
+        target = rect.adjusted(-pad, -pad, pad, pad)
+        # На маленьких фигурах поля nine-patch не должны перекрываться
+        mx = min(float(margin), target.width() / 2)
+        my = min(float(margin), target.height() / 2)
+        size = float(sprite.width())
+        xs_src = (0.0, float(margin), size - margin, size)
+        ys_src = (0.0, float(margin), size - margin, size)
+        xs_dst = (target.left(), target.left() + mx, target.right() - mx, target.right())
+        ys_dst = (target.top(), target.top() + my, target.bottom() - my, target.bottom())
+        for row in range(3):
+            for col in range(3):
+                dst = QRectF(QPointF(xs_dst[col], ys_dst[row]), QPointF(xs_dst[col + 1], ys_dst[row + 1]))
+                if dst.width() <= 0 or dst.height() <= 0:
+                    continue
+                src = QRectF(QPointF(xs_src[col], ys_src[row]), QPointF(xs_src[col + 1], ys_src[row + 1]))
+                painter.drawPixmap(dst, sprite, src)
+
+    def draw_dot_glow(self, painter: QPainter, center: QPointF, radius: float, blur_radius: float, color: QColor):
+        """Рисует свечение круга радиуса radius с центром center."""
+        pad = glow_padding(blur_radius)
+        sprite = self._dot_sprite(int(round(radius)), pad, color)
+        half = sprite.width() / 2
+        painter.drawPixmap(QRectF(center.x() - half, center.y() - half, sprite.width(), sprite.height()),
+                           sprite, QRectF(sprite.rect()))
+
+    # --- ПОСТРОЕНИЕ СПРАЙТОВ ---
+
+    def _rect_sprite(self, corner_radius: int, pad: int, color: QColor) -> (QPixmap, int):
+        # Средняя полоса спрайта должна быть дальше pad от скругления, чтобы размытие на ней было постоянным
+        margin = corner_radius + 2 * pad
+        key = ("rect", corner_radius, pad, color.rgba())
+        sprite = self._cached(key)
+        if sprite is None:
+            size = 2 * margin + 1
+            mask = self._mask_image(size)
+            painter = QPainter(mask)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(Qt.black)
+            painter.drawRoundedRect(QRectF(pad, pad, size - 2 * pad, size - 2 * pad), corner_radius, corner_radius)
+            painter.end()
+            sprite = self._store(key, self._blur_and_colorize(mask, pad, color))
+        return sprite, margin
+
+    def _dot_sprite(self, radius: int, pad: int, color: QColor) -> QPixmap:
+        key = ("dot", radius, pad, color.rgba())
+        sprite = self._cached(key)
+        if sprite is None:
+            size = 2 * (radius + pad)
+            mask = self._mask_image(size)
+            painter = QPainter(mask)
+            painter.setRenderHint(QPainter.Antialiasing)
+            painter.setPen(Qt.NoPen)
+            painter.setBrush(Qt.black)
+            painter.drawEllipse(QPointF(size / 2, size / 2), radius, radius)
+            painter.end()
+            sprite = self._store(key, self._blur_and_colorize(mask, pad, color))
+        return sprite
+
+    @staticmethod
+    def _mask_image(size: int) -> QImage:
+        image = QImage(size, size, QImage.Format_ARGB32_Premultiplied)
+        image.fill(Qt.transparent)
+        return image
+
+    @staticmethod
+    def _blur_and_colorize(mask: QImage, blur_radius: int, color: QColor) -> QPixmap:
+        # Размываем тем же алгоритмом Qt, что и QGraphicsDropShadowEffect, но однократно
+        scene = QGraphicsScene()
+        item = QGraphicsPixmapItem(QPixmap.fromImage(mask))
+        blur = QGraphicsBlurEffect()
+        blur.setBlurRadius(blur_radius)
+        item.setGraphicsEffect(blur)
+        scene.addItem(item)
+
+        blurred = QImage(mask.size(), QImage.Format_ARGB32_Premultiplied)
+        blurred.fill(Qt.transparent)
+        painter = QPainter(blurred)
+        scene.render(painter, QRectF(blurred.rect()), QRectF(mask.rect()))
+        # Как и у тени: форма берется из альфы, цвет (вместе с его прозрачностью) - из color
+        painter.setCompositionMode(QPainter.CompositionMode_SourceIn)
+        painter.fillRect(blurred.rect(), color)
+        painter.end()
+        return QPixmap.fromImage(blurred)
+
+    # --- LRU ---
+
+    def _cached(self, key) -> QPixmap | None:
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self._sprites.move_to_end(key)
+        return sprite
+
+    def _store(self, key, sprite: QPixmap) -> QPixmap:
+        self._sprites[key] = sprite
+        self._bytes += sprite.width() * sprite.height() * 4
+        while self._bytes > self.budget_bytes and len(self._sprites) > 1:
+            _, evicted = self._sprites.popitem(last=False)
+            self._bytes -= evicted.width() * evicted.height() * 4
+        return sprite
+
+    def clear(self):
+        self._sprites.clear()
+        self._bytes = 0
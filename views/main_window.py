@@ -3,21 +3,28 @@
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QStatusBar,
     QPushButton, QComboBox, QListWidget, QListWidgetItem, QLabel,
-    QInputDialog, QFileDialog, QFrame, QMenuBar
+    QInputDialog, QFileDialog, QFrame, QMenuBar, QProgressDialog
     # Убрал QMessageBox из импорта PySide6
 )
 from PySide6.QtCore import Qt, Signal, QSize, QMimeData
-from PySide6.QtGui import QIcon, QAction, QDrag
+from PySide6.QtGui import QIcon, QAction, QActionGroup, QDrag
 
 # ... остальные импорты ...
 from views.diagram_view import DiagramView, MinimapView
+from views.animation_clock import AnimationClock, ANIMATION_PROFILES
 from models.user import User
 from models.project import Project
+from models.diagram import LAYOUT_MODE_ROWS, LAYOUT_MODE_DOCUMENT
+from models.base import session_scope, pool_metrics, SessionScopeFailed
 from controllers.diagram_controller import DiagramController
 from controllers.project_controller import ProjectController
 from utils.exporters import MySqlExporter
 from utils.validators import ProjectValidator
+from utils.task_runner import TaskRunner
+from utils.mysql_pool import mysql_connections
+from utils.sql_instrumentation import ui_action, ACTION_DIAGRAM_LOAD, ACTION_EXPORT, ACTION_REFRESH_SOURCE
 from .custom_title_bar import CustomTitleBar
+from .query_stats_dialog import QueryStatsDialog
 import resources_rc
 
 # --- ИМПОРТ НАШЕГО НОВОГО КЛАССА ---
@@ -51,6 +58,9 @@ class MainWindow(QMainWindow):
         self.current_user, self.current_project = user, project
         self.diagram_controller = DiagramController()
         self.project_controller = ProjectController()
+        self.task_runner = TaskRunner.instance()
+        self._tables_list_task = None
+        self.refresh_progress = None
         self.current_diagram = None
         main_widget = QWidget()
         self.setCentralWidget(main_widget)
@@ -106,6 +116,7 @@ class MainWindow(QMainWindow):
         self.diagram_view = DiagramView(view_container)
         self.diagram_view.set_controller(self.diagram_controller)
         self.diagram_view.set_main_window(self)
+        self.diagram_view.write_queue.flush_failed.connect(self.handle_write_failed)
         self.save_button = QPushButton("СОХРАНИТЬ", view_container)
         self.save_button.setProperty("role", "primary")
         self.save_button.setFixedSize(QSize(130, 40))
@@ -144,13 +155,183 @@ class MainWindow(QMainWindow):
         export_jpg_action = QAction("Экспорт в JPG...", self)
         export_jpg_action.triggered.connect(lambda: self.handle_export_image('jpg'))
         export_menu.addAction(export_jpg_action)
+        file_menu.addSeparator()
+        self.refresh_source_action = QAction("Обновить из источника...", self)
+        self.refresh_source_action.setEnabled(bool(self.current_project and self.current_project.source_connection_id))
+        self.refresh_source_action.triggered.connect(self.handle_refresh_from_source)
+        file_menu.addAction(self.refresh_source_action)
+
+        view_menu = self.menu_bar.addMenu("Вид")
+        animation_menu = view_menu.addMenu("Профиль анимации")
+        clock = AnimationClock.instance()
+        profile_group = QActionGroup(self)
+        for profile_name, profile in ANIMATION_PROFILES.items():
+            profile_action = QAction(profile["title"], self, checkable=True)
+            profile_action.setChecked(profile_name == clock.profile_name)
+            profile_action.triggered.connect(lambda checked, name=profile_name: clock.set_profile(name))
+            profile_group.addAction(profile_action)
+            animation_menu.addAction(profile_action)
+
+        view_menu.addSeparator()
+        self.layout_document_action = QAction("Хранить раскладку одним документом", self, checkable=True)
+        self.layout_document_action.toggled.connect(self.handle_layout_mode_toggled)
+        view_menu.addAction(self.layout_document_action)
+
+        debug_menu = self.menu_bar.addMenu("Отладка")
+        hud_action = QAction("HUD производительности", self, checkable=True)
+        hud_action.setShortcut("F3")
+        # diagram_view создается позже меню
+        hud_action.toggled.connect(lambda checked: self.diagram_view.set_profiler_hud_visible(checked))
+        debug_menu.addAction(hud_action)
+        dump_action = QAction("Сохранить счетчики кадров в JSON...", self)
+        dump_action.triggered.connect(self.handle_dump_frame_stats)
+        debug_menu.addAction(dump_action)
+        sql_stats_action = QAction("Статистика SQL-запросов...", self)
+        sql_stats_action.triggered.connect(self.handle_show_query_stats)
+        debug_menu.addAction(sql_stats_action)
+        pool_action = QAction("Статистика пула соединений", self)
+        pool_action.triggered.connect(self.handle_show_pool_metrics)
+        debug_menu.addAction(pool_action)
+
+    def handle_layout_mode_toggled(self, checked: bool):
+        if not self.current_diagram: return
+        mode = LAYOUT_MODE_DOCUMENT if checked else LAYOUT_MODE_ROWS
+        self.diagram_view.write_queue.flush(wait=True)
+        if self.diagram_controller.set_layout_mode(self.current_diagram.diagram_id, mode):
+            self.current_diagram.layout_mode = mode
+            self.statusBar().showMessage("Режим хранения раскладки изменен.", 3000)
+        else:
+            StyledMessageBox.critical(self, "Ошибка", "Не удалось изменить режим хранения раскладки.")
+            self._sync_layout_mode_action()
+
+    def _sync_layout_mode_action(self):
+        self.layout_document_action.blockSignals(True)
+        self.layout_document_action.setEnabled(self.current_diagram is not None)
+        self.layout_document_action.setChecked(
+            self.current_diagram is not None and self.current_diagram.layout_mode == LAYOUT_MODE_DOCUMENT)
+        self.layout_document_action.blockSignals(False)
+
+    def handle_write_failed(self, error: str):
+        self.statusBar().showMessage(f"Не удалось сохранить изменения диаграммы: {error}", 10000)
+
+    def closeEvent(self, event):
+        # Дописываем отложенные правки диаграммы до закрытия окна
+        if not self.diagram_view.write_queue.shutdown():
+            StyledMessageBox.warning(self, "Сохранение",
+                                     "Часть изменений диаграммы не удалось сохранить в базе данных.")
+        super().closeEvent(event)
+
+    def handle_dump_frame_stats(self):
+        profiler = self.diagram_view.profiler
+        if not profiler.enabled or not profiler.frame_times:
+            StyledMessageBox.information(self, "Профайлер",
+                                         "Включите HUD производительности и подвигайте диаграмму, чтобы набрать кадры.")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Сохранить счетчики кадров", "frame_stats.json",
+                                                   "JSON Files (*.json)")
+        if file_path:
+            try:
+                profiler.dump_json(file_path)
+                self.statusBar().showMessage(f"Счетчики кадров сохранены: {file_path}", 3000)
+            except OSError as e:
+                StyledMessageBox.critical(self, "Ошибка", f"Не удалось сохранить файл:\n{e}")
+
+    def handle_refresh_from_source(self):
+        self.diagram_view.write_queue.flush(wait=True)
+        self.refresh_source_action.setEnabled(False)
+        task = self.task_runner.submit(
+            self.project_controller.refresh_project_from_source, self.current_project.project_id,
+            action=ACTION_REFRESH_SOURCE,
+            on_result=self._on_refresh_finished,
+            on_error=self._on_refresh_failed,
+            on_progress=self._on_refresh_progress,
+            on_cancel=self._on_refresh_cancelled)
+        self.refresh_progress = QProgressDialog("Обновление из источника...", "Отмена", 0, 0, self)
+        self.refresh_progress.setWindowTitle("Обновление")
+        self.refresh_progress.setWindowModality(Qt.WindowModal)
+        self.refresh_progress.setMinimumDuration(300)
+        self.refresh_progress.canceled.connect(task.cancel)
+        self.refresh_progress.setValue(0)
+
+    def _on_refresh_progress(self, done: int, total: int, message: str):
+        if self.refresh_progress:
+            self.refresh_progress.setMaximum(total)
+            self.refresh_progress.setValue(done)
+            self.refresh_progress.setLabelText(message)
+
+    def _close_refresh_progress(self):
+        self.refresh_source_action.setEnabled(True)
+        if self.refresh_progress:
+            self.refresh_progress.canceled.disconnect()
+            self.refresh_progress.close()
+            self.refresh_progress = None
+
+    def _on_refresh_finished(self, result):
+        self._close_refresh_progress()
+        summary, message = result
+        if summary is None:
+            StyledMessageBox.critical(self, "Ошибка", message)
+            return
+        StyledMessageBox.information(
+            self, "Обновление из источника",
+            f"{message}\n\nНовых таблиц: {summary['added']}\nИзменившихся: {summary['changed']}\n"
+            f"Удаленных: {summary['removed']}\nБез изменений: {summary['unchanged']}"
+            + (f"\n\nНе обновлены (таблицы проекта с именами таблиц источника): "
+               f"{', '.join(summary['conflicts'])}" if summary['conflicts'] else ""))
+        if summary['added'] or summary['changed'] or summary['removed']:
+            self.load_project_data()
+
+    def _on_refresh_cancelled(self):
+        self._close_refresh_progress()
+        self.statusBar().showMessage("Обновление из источника отменено.", 3000)
+
+    def _on_refresh_failed(self, error: str):
+        self._close_refresh_progress()
+        StyledMessageBox.critical(self, "Ошибка", error)
+
+    def handle_show_query_stats(self):
+        QueryStatsDialog(self).exec()
+
+    def handle_show_pool_metrics(self):
+        metrics = pool_metrics()
+        avg_hold = metrics['total_hold_ms'] / metrics['checkins'] if metrics['checkins'] else 0.0
+        text = (f"Новых соединений: {metrics['connects']}\n"
+                f"Выдач из пула: {metrics['checkouts']}\n"
+                f"Выдано сейчас: {metrics['checked_out']} (максимум {metrics['max_checked_out']})\n"
+                f"Среднее время удержания: {avg_hold:.1f} мс\n\n"
+                f"{metrics['pool_status']}")
+        mysql = mysql_connections().stats
+        text += (f"\n\nMySQL-источники: открыто {mysql['opened']}, "
+                 f"переиспользовано {mysql['reused']}, закрыто {mysql['closed']}")
+        StyledMessageBox.information(self, "Пул соединений", text)
 
     # --- ОБНОВЛЕННЫЙ МЕТОД ЭКСПОРТА С STYLED MESSAGE BOX ---
     def handle_export_sql(self):
-        validator = ProjectValidator(self.current_project.project_id)
-        is_valid = validator.validate()
+        self.diagram_view.write_queue.flush(wait=True)
+        # Валидация и выборка всего проекта идут в пуле потоков, окно остается отзывчивым
+        self.statusBar().showMessage("Проверка проекта перед экспортом...")
+        self.task_runner.submit(self._load_export_data, self.current_project.project_id,
+                                action=ACTION_EXPORT,
+                                on_result=self._on_export_data_loaded,
+                                on_error=self._on_export_failed)
 
-        if not is_valid:
+    def _load_export_data(self, project_id: int):
+        """Выполняется вне GUI-потока: только контроллеры, без обращений к виджетам."""
+        # Валидация и выборка делят одну сессию и одно соединение из пула
+        with session_scope():
+            validator = ProjectValidator(project_id)
+            is_valid = validator.validate()
+            if not is_valid:
+                return validator, None, None
+            all_tables = self.project_controller.get_all_tables_for_project(project_id)
+            relationships = self.diagram_controller.get_relationships_for_project(project_id)
+        return validator, all_tables, relationships
+
+    def _on_export_data_loaded(self, result):
+        self.update_status_bar()
+        validator, all_tables, relationships = result
+
+        if validator.errors:
             error_text = "Невозможно экспортировать проект из-за ошибок:\n\n"
             error_text += "\n".join([f"• {err}" for err in validator.errors])
             # ЗАМЕНА QMessageBox на StyledMessageBox
@@ -165,9 +346,6 @@ class MainWindow(QMainWindow):
             if not StyledMessageBox.question(self, "Предупреждение", warn_text):
                 return
 
-        all_tables = self.project_controller.get_all_tables_for_project(self.current_project.project_id)
-        relationships = self.diagram_controller.get_relationships_for_project(self.current_project.project_id)
-
         if not all_tables:
             # ЗАМЕНА QMessageBox
             StyledMessageBox.information(self, "Экспорт", "В проекте нет таблиц для экспорта.")
@@ -177,16 +355,28 @@ class MainWindow(QMainWindow):
         file_path, _ = QFileDialog.getSaveFileName(self, "Сохранить SQL-скрипт", default_name, "SQL Files (*.sql)")
 
         if file_path:
-            try:
-                exporter = MySqlExporter(all_tables, relationships)
-                sql_script = exporter.generate_script()
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(sql_script)
-                # ЗАМЕНА QMessageBox
-                StyledMessageBox.information(self, "Успех", f"SQL-скрипт успешно сохранен в:\n{file_path}")
-            except Exception as e:
-                # ЗАМЕНА QMessageBox
-                StyledMessageBox.critical(self, "Ошибка", f"Не удалось сгенерировать или сохранить скрипт:\n{e}")
+            self.statusBar().showMessage("Генерация SQL-скрипта...")
+            self.task_runner.submit(self._write_sql_script, all_tables, relationships, file_path,
+                                    on_result=self._on_sql_script_written,
+                                    on_error=self._on_export_failed)
+
+    @staticmethod
+    def _write_sql_script(all_tables, relationships, file_path: str) -> str:
+        exporter = MySqlExporter(all_tables, relationships)
+        sql_script = exporter.generate_script()
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(sql_script)
+        return file_path
+
+    def _on_sql_script_written(self, file_path: str):
+        self.update_status_bar()
+        # ЗАМЕНА QMessageBox
+        StyledMessageBox.information(self, "Успех", f"SQL-скрипт успешно сохранен в:\n{file_path}")
+
+    def _on_export_failed(self, error: str):
+        self.update_status_bar()
+        # ЗАМЕНА QMessageBox
+        StyledMessageBox.critical(self, "Ошибка", f"Не удалось сгенерировать или сохранить скрипт:\n{error}")
 
     def handle_export_image(self, img_format: str):
         if not self.current_diagram:
@@ -229,10 +419,16 @@ class MainWindow(QMainWindow):
     def update_diagrams_list(self):
         self.diagram_combo.blockSignals(True)
         self.diagram_combo.clear()
-        diagrams = self.diagram_controller.get_diagrams_for_project(self.current_project.project_id)
-        if not diagrams:
-            diagram = self.diagram_controller.create_diagram(self.current_project.project_id, "Main Diagram")
-            if diagram: diagrams.append(diagram)
+        try:
+            with session_scope():
+                diagrams = self.diagram_controller.get_diagrams_for_project(self.current_project.project_id)
+                if not diagrams:
+                    diagram = self.diagram_controller.create_diagram(self.current_project.project_id,
+                                                                     "Main Diagram")
+                    if diagram: diagrams.append(diagram)
+        except SessionScopeFailed as e:
+            self.statusBar().showMessage(str(e), 10000)
+            diagrams = []
         for i, diagram in enumerate(diagrams):
             self.diagram_combo.addItem(diagram.diagram_name, userData=diagram)
             if self.current_diagram and self.current_diagram.diagram_id == diagram.diagram_id:
@@ -243,8 +439,17 @@ class MainWindow(QMainWindow):
         self.diagram_combo.blockSignals(False)
 
     def update_project_tables_list(self):
+        # Более поздний запрос отменяет еще не доставленный результат предыдущего
+        if self._tables_list_task:
+            self._tables_list_task.cancel()
+        self._tables_list_task = self.task_runner.submit(
+            self.project_controller.get_all_tables_for_project, self.current_project.project_id,
+            on_result=self._fill_project_tables_list,
+            on_error=lambda error: self.statusBar().showMessage(f"Не удалось загрузить список таблиц: {error}", 5000))
+
+    def _fill_project_tables_list(self, all_tables):
+        self._tables_list_task = None
         self.tables_list_widget.clear()
-        all_tables = self.project_controller.get_all_tables_for_project(self.current_project.project_id)
         for table in all_tables:
             item = QListWidgetItem(table.table_name)
             item.setData(Qt.UserRole, table)
@@ -254,9 +459,13 @@ class MainWindow(QMainWindow):
         if not self.current_diagram:
             self.diagram_view.clear_diagram()
             return
-        diagram_objects = self.diagram_controller.get_diagram_details(self.current_diagram.diagram_id)
-        relationships = self.diagram_controller.get_relationships_for_project(self.current_project.project_id)
-        self.diagram_view.load_diagram_data(self.current_diagram, diagram_objects, relationships)
+        # Диаграмма перечитывается из БД - отложенные правки должны быть уже там
+        self.diagram_view.write_queue.flush(wait=True)
+        self._sync_layout_mode_action()
+        with ui_action(ACTION_DIAGRAM_LOAD):
+            snapshot = self.diagram_controller.get_diagram_snapshot(self.current_diagram.diagram_id,
+                                                                    self.current_project.project_id)
+            self.diagram_view.load_diagram_data(self.current_diagram, snapshot)
 
     def handle_diagram_switch(self, index):
         diagram = self.diagram_combo.itemData(index)
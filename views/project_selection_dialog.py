@@ -2,15 +2,18 @@
 
 from PySide6.QtWidgets import (QDialog, QWidget, QVBoxLayout, QHBoxLayout,
                                QPushButton, QListWidget, QLabel, QInputDialog,
-                               QMessageBox, QListWidgetItem, QFrame)
+                               QMessageBox, QListWidgetItem, QFrame, QProgressDialog)
 from PySide6.QtCore import Qt, Signal, QSize
 from controllers.project_controller import ProjectController
 from models.user import User
 from .connection_manager_dialog import ConnectionManagerDialog
 from utils.schema_inspector import list_databases_on_server
+from utils.sql_instrumentation import ACTION_IMPORT
+from utils.task_runner import TaskRunner
 from .custom_title_bar import CustomTitleBar
 # --- ИМПОРТ НОВОГО ДИАЛОГА ---
 from .database_selection_dialog import DatabaseSelectionDialog
+from .batch_import_dialog import BatchImportDialog
 
 
 class ProjectListItemWidget(QWidget):
@@ -43,6 +46,9 @@ class ProjectSelectionDialog(QDialog):
         self.current_user = user
         self.project_controller = ProjectController()
         self.selected_project = None
+        self.task_runner = TaskRunner.instance()
+        self.import_button = None
+        self.progress_dialog: QProgressDialog = None
 
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(10, 10, 10, 10)
@@ -80,6 +86,7 @@ class ProjectSelectionDialog(QDialog):
 
         import_project_button = QPushButton("Импортировать проект...")
         import_project_button.setCursor(Qt.PointingHandCursor)
+        self.import_button = import_project_button
 
         buttons_layout.addWidget(new_project_button)
         buttons_layout.addWidget(import_project_button)
@@ -147,7 +154,38 @@ class ProjectSelectionDialog(QDialog):
         connection = manager_dialog.selected_connection
         if not connection: return
 
-        databases, error = list_databases_on_server(connection)
+        # Список БД запрашиваем в фоне, чтобы окно не замирало на медленной сети
+        self.import_button.setEnabled(False)
+        task = self.task_runner.submit(
+            list_databases_on_server, connection,
+            on_result=lambda result: self._on_databases_listed(connection, result),
+            on_error=self._on_import_task_failed,
+            on_cancel=self._on_listing_cancelled)
+        self._show_progress("Подключение к серверу...", task)
+
+    def _on_listing_cancelled(self):
+        self._close_progress()
+        self.import_button.setEnabled(True)
+
+    def _show_progress(self, text: str, task, maximum: int = 0):
+        self._close_progress()
+        self.progress_dialog = QProgressDialog(text, "Отмена", 0, maximum, self)
+        self.progress_dialog.setWindowTitle("Импорт")
+        self.progress_dialog.setWindowModality(Qt.WindowModal)
+        self.progress_dialog.setMinimumDuration(300)
+        self.progress_dialog.canceled.connect(task.cancel)
+        self.progress_dialog.setValue(0)
+
+    def _close_progress(self):
+        if self.progress_dialog:
+            self.progress_dialog.canceled.disconnect()
+            self.progress_dialog.close()
+            self.progress_dialog = None
+
+    def _on_databases_listed(self, connection, result):
+        self._close_progress()
+        self.import_button.setEnabled(True)
+        databases, error = result
         if error:
             QMessageBox.critical(self, "Ошибка", f"Не удалось получить список БД:\n{error}")
             return
@@ -158,17 +196,49 @@ class ProjectSelectionDialog(QDialog):
         # --- ИСПОЛЬЗУЕМ НОВЫЙ ДИАЛОГ ВМЕСТО QInputDialog ---
         db_selection_dialog = DatabaseSelectionDialog(databases, self)
         if db_selection_dialog.exec() == QDialog.Accepted:
-            db_name = db_selection_dialog.get_selected_db()
-            if db_name:
-                QMessageBox.information(self, "Импорт", f"Начинаем импорт схемы '{db_name}'...")
-                project, message = self.project_controller.import_project_from_db(
-                    self.current_user.user_id, connection, db_name
-                )
-                if project:
-                    QMessageBox.information(self, "Успех", message)
-                    self.load_projects()
-                else:
-                    QMessageBox.critical(self, "Ошибка импорта", message)
+            db_names = db_selection_dialog.get_selected_dbs()
+            if len(db_names) > 1:
+                # Несколько БД - параллельный импорт, каждая в свой проект
+                BatchImportDialog(self.current_user.user_id, connection, db_names, self).exec()
+                self.load_projects()
+            elif db_names:
+                db_name = db_names[0]
+                self.import_button.setEnabled(False)
+                task = self.task_runner.submit(
+                    self.project_controller.import_project_from_db,
+                    self.current_user.user_id, connection, db_name,
+                    action=ACTION_IMPORT,
+                    on_result=self._on_import_finished,
+                    on_error=self._on_import_task_failed,
+                    on_progress=self._on_import_progress,
+                    on_cancel=self._on_import_cancelled)
+                self._show_progress(f"Импорт схемы '{db_name}'...", task, maximum=4)
+
+    def _on_import_progress(self, done: int, total: int, message: str):
+        if self.progress_dialog:
+            self.progress_dialog.setMaximum(total)
+            self.progress_dialog.setValue(done)
+            self.progress_dialog.setLabelText(message)
+
+    def _on_import_finished(self, result):
+        self._close_progress()
+        self.import_button.setEnabled(True)
+        project, message = result
+        if project:
+            QMessageBox.information(self, "Успех", message)
+            self.load_projects()
+        else:
+            QMessageBox.critical(self, "Ошибка импорта", message)
+
+    def _on_import_cancelled(self):
+        self._close_progress()
+        self.import_button.setEnabled(True)
+        QMessageBox.information(self, "Импорт", "Импорт отменен.")
+
+    def _on_import_task_failed(self, error: str):
+        self._close_progress()
+        self.import_button.setEnabled(True)
+        QMessageBox.critical(self, "Ошибка", error)
 
     def handle_open_project(self, item: QListWidgetItem):
         project = item.data(Qt.UserRole)
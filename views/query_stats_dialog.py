@@ -0,0 +1,69 @@
+# views/query_stats_dialog.py
+
+from PySide6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                               QTableWidget, QTableWidgetItem, QPlainTextEdit, QHeaderView)
+from PySide6.QtCore import Qt
+
+from utils.sql_instrumentation import QueryStats, SLOW_LOG_PATH, SLOW_QUERY_MS, N_PLUS_ONE_THRESHOLD
+
+STATS_COLUMNS = ["Действие", "Запусков", "Запросов", "Макс. за запуск", "Всего, мс", "Макс., мс", "Медленных"]
+
+
+class QueryStatsDialog(QDialog):
+    """Сводка SQL-запросов по действиям пользователя и найденные N+1."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Статистика SQL-запросов")
+        self.setMinimumSize(760, 480)
+
+        layout = QVBoxLayout(self)
+        self.stats_table = QTableWidget(0, len(STATS_COLUMNS))
+        self.stats_table.setHorizontalHeaderLabels(STATS_COLUMNS)
+        self.stats_table.horizontalHeader().setSectionResizeMode(0, QHeaderView.Stretch)
+        self.stats_table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.stats_table.verticalHeader().setVisible(False)
+        layout.addWidget(self.stats_table, 2)
+
+        layout.addWidget(QLabel(f"Повторы одного запроса (> {N_PLUS_ONE_THRESHOLD} за действие):"))
+        self.n_plus_one_text = QPlainTextEdit()
+        self.n_plus_one_text.setReadOnly(True)
+        layout.addWidget(self.n_plus_one_text, 1)
+
+        layout.addWidget(QLabel(f"Запросы дольше {SLOW_QUERY_MS:.0f} мс пишутся в {SLOW_LOG_PATH}"))
+
+        buttons = QHBoxLayout()
+        refresh_button = QPushButton("Обновить")
+        reset_button = QPushButton("Сбросить")
+        close_button = QPushButton("Закрыть")
+        buttons.addWidget(refresh_button)
+        buttons.addWidget(reset_button)
+        buttons.addStretch()
+        buttons.addWidget(close_button)
+        layout.addLayout(buttons)
+
+        refresh_button.clicked.connect(self.refresh)
+        reset_button.clicked.connect(self.handle_reset)
+        close_button.clicked.connect(self.accept)
+        self.refresh()
+
+    def refresh(self):
+        data = QueryStats.instance().snapshot()
+        actions = sorted(data["actions"].items(), key=lambda kv: -kv[1]["total_ms"])
+        self.stats_table.setRowCount(len(actions))
+        for row, (name, entry) in enumerate(actions):
+            values = [name, entry["runs"], entry["queries"], entry["max_queries_per_run"],
+                      f"{entry['total_ms']:.1f}", f"{entry['max_ms']:.1f}", entry["slow"]]
+            for col, value in enumerate(values):
+                item = QTableWidgetItem(str(value))
+                if col > 0:
+                    item.setTextAlignment(Qt.AlignRight | Qt.AlignVCenter)
+                self.stats_table.setItem(row, col, item)
+
+        lines = [f"{w['timestamp']}  [{w['action']}]  x{w['count']}  {w['shape']}"
+                 for w in reversed(data["n_plus_one"])]
+        self.n_plus_one_text.setPlainText("\n".join(lines) if lines else "Не обнаружено")
+
+    def handle_reset(self):
+        QueryStats.instance().reset()
+        self.refresh()
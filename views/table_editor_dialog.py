@@ -9,7 +9,7 @@ from PySide6.QtWidgets import (
 from PySide6.QtCore import Qt
 from controllers.table_controller import TableController
 from .index_editor_dialog import IndexEditorDialog
-from models.table import DbIndex
+from models.table import DbIndex, column_sort_key
 from .custom_title_bar import CustomTitleBar
 
 # --- ИМПОРТ НАШЕГО ДИЗАЙНЕРСКОГО ОКНА СООБЩЕНИЙ ---
@@ -26,6 +26,8 @@ class TableEditorDialog(QDialog):
 
         self.table_id = table_id
         self.controller = TableController()
+        self.column_diff = None  # результат sync_columns_for_table после сохранения
+        self.saved_name = None  # имя таблицы, записанное при сохранении
 
         main_layout = QVBoxLayout(self)
         main_layout.setContentsMargins(10, 10, 10, 10)
@@ -171,7 +173,7 @@ class TableEditorDialog(QDialog):
         self.notes_text_edit.setText(table_data.notes or "")
 
     def _load_columns(self, columns):
-        columns.sort(key=lambda c: c.column_id)
+        columns.sort(key=column_sort_key)
         self.cols_table.setRowCount(len(columns))
         for row, col in enumerate(columns):
             self.cols_table.setVerticalHeaderItem(row, QTableWidgetItem(str(col.column_id)))
@@ -238,7 +240,10 @@ class TableEditorDialog(QDialog):
                 "uq": uq_widget_layout.itemAt(0).widget().isChecked(),
                 "default": self.cols_table.item(row, 5).text()
             })
-        self.controller.sync_columns_for_table(self.table_id, columns_data)
+        self.column_diff = self.controller.sync_columns_for_table(self.table_id, columns_data)
+        if self.column_diff is None:
+            StyledMessageBox.critical(self, "Ошибка", "Не удалось сохранить колонки таблицы.")
+            return False
         return True
 
     def _save_notes(self):
@@ -251,6 +256,7 @@ class TableEditorDialog(QDialog):
             StyledMessageBox.warning(self, "Ошибка", "Имя таблицы не может быть пустым.")
             return False
         self.controller.update_table_name(self.table_id, new_name)
+        self.saved_name = new_name
         return True
 
     def _load_indexes(self, indexes):
@@ -0,0 +1,59 @@
+# views/text_cache.py
+
+from collections import OrderedDict
+
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QFont, QFontMetrics, QStaticText, QTransform
+
+# Сколько готовых строк держим в памяти (одна запись - одна строка для одного шрифта и ширины)
+TEXT_CACHE_MAX_ENTRIES = 50000
+
+
+class TextLayoutCache:
+    """
+    Общий кэш раскладки коротких строк (имена и типы колонок).
+    По ключу (шрифт, текст, максимальная ширина, режим обрезки) хранит уже обрезанный
+    и разложенный QStaticText, поэтому элементы рисуют текст сами, без документов
+    QGraphicsTextItem и повторного разбора HTML.
+    """
+
+    _instance = None
+
+    @classmethod
+    def instance(cls) -> "TextLayoutCache":
+        if cls._instance is None:
+            cls._instance = cls()
+        return cls._instance
+
+    def __init__(self, max_entries: int = TEXT_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._metrics = {}
+
+    def get(self, font: QFont, text: str, max_width: int = 0, elide_mode=Qt.ElideRight) -> QStaticText:
+        """Возвращает разложенный текст; max_width=0 - без обрезки."""
+        font_key = font.key()
+        key = (font_key, text, max_width, elide_mode)
+        static_text = self._entries.get(key)
+        if static_text is not None:
+            self._entries.move_to_end(key)
+            return static_text
+
+        if max_width > 0:
+            metrics = self._metrics.get(font_key)
+            if metrics is None:
+                metrics = self._metrics[font_key] = QFontMetrics(font)
+            text = metrics.elidedText(text, elide_mode, max_width)
+        static_text = QStaticText(text)
+        static_text.setTextFormat(Qt.PlainText)
+        static_text.setPerformanceHint(QStaticText.AggressiveCaching)
+        static_text.prepare(QTransform(), font)
+
+        self._entries[key] = static_text
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return static_text
+
+    def clear(self):
+        self._entries.clear()
+        self._metrics.clear()
@@ -0,0 +1,216 @@
+# views/virtual_scene.py
+
+import math
+from collections import defaultdict
+
+from PySide6.QtWidgets import QGraphicsItem, QStyleOptionGraphicsItem
+from PySide6.QtCore import Qt, QRectF, QPointF
+from PySide6.QtGui import QColor, QPen, QPainterPath, QPainter
+
+from .frame_profiler import profiled_paint
+
+# --- ГЕОМЕТРИЯ ТАБЛИЦЫ (должна совпадать с TableItem/ColumnItem) ---
+TABLE_WIDTH = 300
+HEADER_HEIGHT = 30
+ROW_HEIGHT = 28
+FOOTER_HEIGHT = 10
+PORT_INSET = 6
+
+SPATIAL_CELL_SIZE = 1000
+
+
+def build_connection_path(start_p: QPointF, start_side: str, end_p: QPointF, end_side: str) -> QPainterPath:
+    """Кривая Безье между двумя портами - общая для живых линий и виртуального слоя."""
+    path = QPainterPath()
+    path.moveTo(start_p)
+    dx = end_p.x() - start_p.x()
+    offset = min(abs(dx) * 0.5, 100.0)
+    if abs(dx) < 50: offset = 50
+    start_offset = offset if start_side == 'right' else -offset
+    end_offset = -offset if end_side == 'left' else offset
+    control1 = QPointF(start_p.x() + start_offset, start_p.y())
+    control2 = QPointF(end_p.x() + end_offset, end_p.y())
+    path.cubicTo(control1, control2, end_p)
+    return path
+
+
+def build_edge_path(edge: "EdgeRecord", records: dict) -> QPainterPath | None:
+    """Путь связи по записям таблиц {table_id: TableRecord}; None, если таблицы или колонки нет."""
+    start, end = records.get(edge.start_table_id), records.get(edge.end_table_id)
+    if not start or not end:
+        return None
+    start_p = start.port_pos(edge.start_column_id, edge.start_side)
+    end_p = end.port_pos(edge.end_column_id, edge.end_side)
+    if start_p is None or end_p is None:
+        return None
+    return build_connection_path(start_p, edge.start_side, end_p, edge.end_side)
+
+
+class TableRecord:
+    """
+    Легкое описание таблицы на диаграмме (позиция, размер, имя, колонки).
+    Хранится для всех таблиц; полноценный TableItem создается только для видимых.
+    columns - список словарей {'id', 'name', 'type', 'pk', 'nn', 'fk'} в порядке отображения.
+    """
+    __slots__ = ('diagram_object_id', 'table_id', 'name', 'x', 'y', 'color', 'columns', 'width', '_rows')
+
+    def __init__(self, diagram_object_id, table_id, name, x, y, color=None, columns=None, width=TABLE_WIDTH):
+        self.diagram_object_id = diagram_object_id
+        self.table_id = table_id
+        self.name = name
+        self.x, self.y = x, y
+        self.color = color
+        self.width = width
+        self.set_columns(columns or [])
+
+    def set_columns(self, columns: list[dict]):
+        self.columns = columns
+        self._rows = {col['id']: i for i, col in enumerate(columns)}
+
+    def height(self) -> float:
+        return HEADER_HEIGHT + len(self.columns) * ROW_HEIGHT + FOOTER_HEIGHT
+
+    def rect(self) -> QRectF:
+        return QRectF(self.x, self.y, self.width, self.height())
+
+    def port_pos(self, column_id: int, side: str) -> QPointF | None:
+        row = self._rows.get(column_id)
+        if row is None:
+            return None
+        x = self.x + (PORT_INSET if side == 'left' else self.width - PORT_INSET)
+        y = self.y + HEADER_HEIGHT + row * ROW_HEIGHT + ROW_HEIGHT / 2
+        return QPointF(x, y)
+
+
+class EdgeRecord:
+    """Легкое описание связи между двумя колонками."""
+    __slots__ = ('relationship_id', 'start_table_id', 'start_column_id', 'start_side',
+                 'end_table_id', 'end_column_id', 'end_side')
+
+    def __init__(self, relationship_id, start_table_id, start_column_id, start_side,
+                 end_table_id, end_column_id, end_side):
+        self.relationship_id = relationship_id
+        self.start_table_id, self.start_column_id, self.start_side = start_table_id, start_column_id, start_side
+        self.end_table_id, self.end_column_id, self.end_side = end_table_id, end_column_id, end_side
+
+
+class SpatialGrid:
+    """Равномерная сетка ячеек для быстрого поиска таблиц в прямоугольнике."""
+
+    def __init__(self, cell_size: int = SPATIAL_CELL_SIZE):
+        self.cell_size = cell_size
+        self._cells = defaultdict(set)
+        self._keys = {}
+
+    def _cells_for(self, rect: QRectF):
+        c = self.cell_size
+        for cx in range(math.floor(rect.left() / c), math.floor(rect.right() / c) + 1):
+            for cy in range(math.floor(rect.top() / c), math.floor(rect.bottom() / c) + 1):
+                yield cx, cy
+
+    def insert(self, key, rect: QRectF):
+        cells = list(self._cells_for(rect))
+        self._keys[key] = (cells, QRectF(rect))
+        for cell in cells:
+            self._cells[cell].add(key)
+
+    def remove(self, key):
+        cells, _ = self._keys.pop(key, ((), None))
+        for cell in cells:
+            bucket = self._cells.get(cell)
+            if bucket:
+                bucket.discard(key)
+                if not bucket:
+                    del self._cells[cell]
+
+    def update(self, key, rect: QRectF):
+        self.remove(key)
+        self.insert(key, rect)
+
+    def query(self, rect: QRectF) -> set:
+        result = set()
+        for cell in self._cells_for(rect):
+            for key in self._cells.get(cell, ()):
+                if key not in result and self._keys[key][1].intersects(rect):
+                    result.add(key)
+        return result
+
+    def clear(self):
+        self._cells.clear()
+        self._keys.clear()
+
+
+class VirtualTablesLayer(QGraphicsItem):
+    """
+    Один элемент сцены, рисующий по сохраненной геометрии то, что не материализовано:
+    заглушки невидимых таблиц (для миникарты) и связи, у которых хотя бы один конец
+    не имеет живого TableItem. В попадании мышью не участвует.
+    """
+
+    def __init__(self, view):
+        super().__init__()
+        self.view = view
+        self._paths = {}
+        self.setZValue(-2)
+        self.setAcceptedMouseButtons(Qt.NoButton)
+        self.setFlag(QGraphicsItem.ItemUsesExtendedStyleOption, True)
+
+        self.edge_pen = QPen(QColor(100, 100, 120), 2)
+        self.edge_pen.setStyle(Qt.DashLine)
+        self.edge_pen.setDashPattern([10, 10])
+        self.body_color = QColor(30, 32, 40, 210)
+
+    def boundingRect(self) -> QRectF:
+        return self.view.sceneRect()
+
+    def shape(self) -> QPainterPath:
+        return QPainterPath()
+
+    def refresh_edges(self, relationship_ids):
+        """
+        Пересчитывает пути для указанных связей (только тех, что не нарисованы живыми линиями).
+        В пакетном режиме все связи рисует EdgeBatchLayer, и этот слой их пропускает.
+        """
+        materialized = self.view.table_items
+        for rel_id in relationship_ids:
+            edge = self.view.edge_records.get(rel_id)
+            if (edge is None or self.view.batched_edges or
+                    (edge.start_table_id in materialized and edge.end_table_id in materialized)):
+                self._paths.pop(rel_id, None)
+                continue
+            path = build_edge_path(edge, self.view.table_records)
+            if path is None:
+                self._paths.pop(rel_id, None)
+            else:
+                self._paths[rel_id] = path
+        self.update()
+
+    def rebuild(self):
+        self._paths.clear()
+        self.refresh_edges(list(self.view.edge_records))
+
+    def clear(self):
+        self._paths.clear()
+        self.update()
+
+    @profiled_paint("VirtualTablesLayer")
+    def paint(self, painter: QPainter, option: QStyleOptionGraphicsItem, widget=None):
+        exposed = option.exposedRect
+        materialized = self.view.table_items
+
+        painter.setPen(Qt.NoPen)
+        for table_id in self.view.spatial_index.query(exposed):
+            if table_id in materialized:
+                continue
+            record = self.view.table_records[table_id]
+            rect = record.rect()
+            painter.setBrush(self.body_color)
+            painter.drawRect(rect)
+            painter.setBrush(QColor(record.color) if record.color else QColor(137, 180, 250))
+            painter.drawRect(QRectF(rect.left(), rect.top(), rect.width(), HEADER_HEIGHT))
+
+        painter.setBrush(Qt.NoBrush)
+        painter.setPen(self.edge_pen)
+        for path in self._paths.values():
+            if path.controlPointRect().intersects(exposed):
+                painter.drawPath(path)